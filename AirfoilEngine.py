@@ -0,0 +1,95 @@
+# Vectorized NACA 4-digit engine for batch studies.
+#
+# Evaluates many (m, p, t) triples on one shared chordwise grid in a single
+# numpy pass. Output follows the CreateAirfoil layout: upper surface from TE to
+# LE, then lower surface from LE to TE, with y[:, 0] = y[:, -1] = 0.
+#
+# Runs headless (CPython + numpy), it is not imported by the wizard script.
+# Run this file directly to benchmark it against CreateAirfoil, which the
+# wizard imports from NacaProfile, and the scalar port Naca4Scalar:
+#     python AirfoilEngine.py [airfoils] [points]
+
+import sys
+import time
+import numpy as np
+
+from NacaProfile import CreateAirfoil, Naca4Digits, Naca4Scalar
+
+# Normalize a batch of Naca strings or (m,p,t) triples to a (n,3) float array.
+def Naca4Parameters(codes):
+    rows = []
+    for code in codes:
+        if isinstance(code, str):
+            rows.append(Naca4Digits(code))
+        else:
+            rows.append(tuple(code))
+    return np.asarray(rows, dtype=float).reshape(-1, 3)
+
+# Shared thickness shape, without the t/0.20 factor.
+def Naca4ThicknessShape(x):
+    return (0.29690 * np.sqrt(x) - 0.12600 * x - 0.35160 * np.power(x, 2) +
+    0.28430 * np.power(x, 3) - 0.10360 * np.power(x, 4))
+
+# Camber lines of all airfoils, shape (n_airfoils, n_points).
+def Naca4CamberBatch(m, p, x):
+    m = m[:, None]
+    p = p[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fwd = m / p**2 * (2 * p * x - np.power(x, 2))
+        aft = m / (1 - p)**2 * ((1 - 2 * p) + 2 * p * x - np.power(x, 2))
+    camber = np.where(x < p, fwd, aft)
+    cambered = (0 < p) & (p < 1) & (0 < m) & (m < 1)
+    return np.where(cambered, camber, 0.0)
+
+# Coordinates of a batch of airfoils on a shared ascending grid x.
+# Returns (x, y) with x of shape (2*n_points,) and y of shape
+# (n_airfoils, 2*n_points).
+def Naca4Batch(codes, x):
+    params = Naca4Parameters(codes)
+    x = np.asarray(x, dtype=float)
+    m = params[:, 0]
+    p = params[:, 1]
+    t = params[:, 2]
+
+    thickness = (t / 0.20)[:, None] * Naca4ThicknessShape(x)
+    camber = Naca4CamberBatch(m, p, x)
+
+    y = np.empty((len(params), 2 * len(x)))
+    y[:, :len(x)] = (camber + thickness)[:, ::-1]
+    y[:, len(x):] = camber - thickness
+    y[:, 0] = 0.0
+    y[:, -1] = 0.0
+    return (np.concatenate((x[::-1], x)), y)
+
+# Time CreateAirfoil of the wizard and the scalar reference against the batch
+# engine on the same codes.
+def Benchmark(airfoils=2000, points=201):
+    codes = []
+    for i in range(airfoils):
+        codes.append("%d%d%02d" % (i % 10, (i // 10) % 10, 6 + i % 19))
+    x = [i * (1.0 / points) for i in range(points + 1)]
+
+    start = time.time()
+    wizard = [CreateAirfoil(m, p, t, x)[1] for (m, p, t) in Naca4Parameters(codes)]
+    wizardTime = time.time() - start
+
+    start = time.time()
+    scalar = [Naca4Scalar(m, p, t, x)[1] for (m, p, t) in Naca4Parameters(codes)]
+    scalarTime = time.time() - start
+
+    start = time.time()
+    (xs, ys) = Naca4Batch(codes, x)
+    batchTime = time.time() - start
+
+    error = np.max(np.abs(ys - np.asarray(wizard)))
+    print("airfoils %d, points %d" % (airfoils, points + 1))
+    print("CreateAirfoil  %.4f s" % wizardTime)
+    print("scalar         %.4f s, max |dy| %.3e against CreateAirfoil" %
+          (scalarTime, np.max(np.abs(np.asarray(scalar) - np.asarray(wizard)))))
+    print("batch          %.4f s (x%.1f), max |dy| %.3e against CreateAirfoil" %
+          (batchTime, wizardTime / max(batchTime, 1e-12), error))
+    return (wizardTime, batchTime, error)
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    Benchmark(*args)
@@ -3,8 +3,9 @@
 # Issues to consider:
 # 1) If user has selected to create an airfoil without cutting the edge (CutTE = No), then the creation of a valid 
 #    rectangle domain(or enclosure) is not possible. As a result, the creation of a mesh will be problematic.
-# 2) On last step, Mechanical will be launching in order to generate a mesh. After the generation, the software will close 
-#    automatically. There might be the option to generate a mesh, without launching Mechanical.
+# 2) On last step, Mechanical will be launching in order to generate a mesh. It is kept open (see meshPool) so that
+#    the next mesh reuses it, and closed after 10 minutes unused, or dropped if a mesh runs for more than an hour.
+#    There might be the option to generate a mesh, without launching Mechanical.
 # 3) If user adds a new step, then an <onreset> function(is called when back button is pressed) for step "Mesh" should 
 #    be defined. This function will delete old mesh controls.
 # 4) In the function named CreateMesh, there are some commands as comments. With these commands, a sizing children of mesh
@@ -17,20 +18,112 @@ import System
 import sys
 import clr
 import os
-clr.AddReference("Ans.Utilities")
-from Ansys.Utilities import ApplicationConfiguration
+import json
+import shutil
+from timeit import default_timer
+clr.AddReference("System.Windows.Forms")
+from System.Windows.Forms import MessageBox, Control
 
-ansysDir = ApplicationConfiguration.DefaultConfiguration.AwpRootEnvironmentVariableValue
-scdmlib = os.path.join(ansysDir,"scdm","Scripting")
+# Make the helper modules shipped next to this script importable.
+extensionDir = ExtAPI.ExtensionManager.CurrentExtension.InstallDir
+if extensionDir not in sys.path:
+    sys.path.append(extensionDir)
 
-execfile(os.path.join(scdmlib, "LoadSCDMAPIModuleV18.py"))
-execfile(os.path.join(scdmlib, "LoadSCDMAPITypesV18.py"))
-execfile(os.path.join(scdmlib, "LoadSCDMAPIUtilitiesV18.py"))
-execfile(os.path.join(scdmlib, "UtilitiesOnLoadV18.py"))
+from NacaProfile import CreateAirfoil, Naca4Digits, Naca4Surfaces, Naca4Truncated, ProfileScalar, ProfileTruncated
+from ProfileSources import ProfileKind, ProfileSurfaces, SourceProblems
+from ChordSpacing import ChordwiseGrid, PointsSaved, UniformPointsFor
+from ProfileSpline import CachedSpline
+from Profiler import Profiler
+from GeometryCache import LRUCache
+from StagePipeline import StagePipeline
+from CadBackend import CadBackend, OPERATIONS
+from ApiLoader import ApiLoader
+from MeshSession import SessionPool, MechanicalSession
+from PreviewWorker import PreviewWorker
+from DesignPoints import DesignPointProject, RegisterCases
+from SweepRunner import SweepCases
+from TriMesh import MeshAirfoil
+from StructuredGrid import GridAirfoil
+from MeshSizing import AirfoilSizing, SizingCommands
+from FluentMesh import WriteFluentMesh
+from AirfoilStore import StoreWriter, StoreReader, CoordinateArrays, DomainArrays, MeshArrays
+from ArtifactCache import ArtifactCache, ArtifactKey, CacheTimeout
+import AirfoilStages
+import WingSections
+import AirfoilValidation
+
+# The SCDM API is loaded by the first callback that needs it.
+apiLoader = ApiLoader(globals())
+
+# Timing of the wizard callbacks and of the scripting API calls they make.
+# Set AIRFOIL_PROFILE to a directory to also get a trace and a flame graph there,
+# saved after each stage build and with the ShowAirfoil report.
+callTimer = Profiler(os.environ.get("AIRFOIL_PROFILE"))
+
+# Set AIRFOIL_EXPORT to a directory to export the coordinates, the domain and
+# the native meshes to Airfoil.afs there, for the solvers.
+exportDir = os.environ.get("AIRFOIL_EXPORT")
+
+# Set AIRFOIL_PROFILES to a directory or a .zip/.tar archive of .dat files to
+# use their profiles by name in the Naca Code and Sections inputs.
+profileLibrary = os.environ.get("AIRFOIL_PROFILES", "")
+
+# Set AIRFOIL_DESIGN_POINTS to a sweep definition (SweepRunner) to register its
+# cases as design points of the Fluid Flow system after the mesh, updated
+# AIRFOIL_DESIGN_POINT_WORKERS (4 by default) at a time.
+designPointSweep = os.environ.get("AIRFOIL_DESIGN_POINTS")
+designPointWorkers = int(os.environ.get("AIRFOIL_DESIGN_POINT_WORKERS", "4"))
+
+# Set AIRFOIL_CACHE to a directory to keep the native meshes there, keyed on
+# all wizard inputs, and copy the mesh of the same inputs from it instead of
+# meshing again. AIRFOIL_CACHE_SIZE bounds it in MB (1024 by default). Several
+# Workbench sessions and sweeps may share it.
+cacheDir = os.environ.get("AIRFOIL_CACHE")
+artifactCache = None
+if cacheDir:
+    artifactCache = ArtifactCache(cacheDir, int(os.environ.get("AIRFOIL_CACHE_SIZE", "1024")) << 20)
+
+# Generated coordinates and snapshots of the document, keyed on their inputs.
+coordinateCache = LRUCache(32)
+geometryCache = LRUCache(8)
+
+# Mechanical sessions kept open between meshes, per Workbench system.
+def OpenMechanical(systemName):
+    container = GetSystem(Name=systemName).GetContainer(ComponentName="Mesh")
+    return callTimer.InstrumentObject(MechanicalSession(container), ("Open", "Send", "Close"), "Mechanical.")
+
+# Idle and timed-out sessions are closed on the UI thread (see CreateMesh).
+meshPool = SessionPool(OpenMechanical, size=1, maxJobs=50, idleTimeout=600.0, runTimeout=3600.0)
+
+# Run functions on the UI thread, the thread it is created on, from the
+# preview worker.
+class UiDispatch(object):
+    def __init__(self):
+        self.control = Control()
+        handle = self.control.Handle
+
+    def __call__(self, function):
+        self.control.BeginInvoke(System.Action(function))
+
+# Previews are checked and their coordinates computed on a worker thread; only
+# the newest one is built, on the UI thread. Created by the first preview.
+previewWorker = None
+
+def Previews():
+    global previewWorker
+    if previewWorker is None:
+        previewWorker = PreviewWorker(UiDispatch(), delay=0.2)
+    return previewWorker
+
+# Drop the pending previews before the document is changed directly.
+def CancelPreviews():
+    if previewWorker is not None:
+        previewWorker.Cancel()
 
 geoSystem = None
 
 # Drop down menu to define cut trailing value.(If cut trailing is selected)
+@callTimer.Instrument
 def ShowCutValue(step,property):
     selection = step.Properties["Cut Trailing/CutTE"].ValueString
     if selection == "Yes":
@@ -38,7 +131,17 @@ def ShowCutValue(step,property):
     else:
 	    return False
 
+# Drop down menu to define spacing tolerance.(If adaptive spacing or a spline is selected)
+@callTimer.Instrument
+def ShowSpacingTolerance(step,property):
+    selection = step.Properties["Spacing/Mode"].ValueString
+    if selection == "Adaptive" or selection == "Spline":
+        return True
+    else:
+        return False
+
 # Drop down menu to define WingSpan value.(If 3D mode is selected)
+@callTimer.Instrument
 def ShowWingSpanValue(step,property):
     selection = step.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
     if selection != "2D":
@@ -47,6 +150,7 @@ def ShowWingSpanValue(step,property):
 	    return False
 
 # Drop down menu to define 2D domain.(If 2D mode is selected)
+@callTimer.Instrument
 def Show2dDomainValues(step,property):
     selection = step.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
     if selection == "2D":
@@ -55,6 +159,7 @@ def Show2dDomainValues(step,property):
 	    return False
 
 # Drop down menu to define 3D Enclosure.(If 3D mode is selected)
+@callTimer.Instrument
 def Show3dEnclosureValues(step,property):
     selection = step.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
     if selection != "2D":
@@ -63,22 +168,63 @@ def Show3dEnclosureValues(step,property):
 	    return False
 		
 # Check if Naca code is valid.
+@callTimer.Instrument
 def NacaValidation(step,property):
     Naca = step.Properties["Naca"].ValueString
-    j = 0
-    for i in Naca:
-	    j += 1
-    if j!= 4:
-        MessageBox.Show(" Invalid Naca code! Naca code must be 4 digits long, not " +j.ToString()+". ")
+    for problem in SourceProblems(Naca, profileLibrary):
+        MessageBox.Show(" " + problem + " ")
+
+# Boundary layer inputs of the structured mesher.
+@callTimer.Instrument
+def ShowBoundaryLayer(step,property):
+    selection = step.Properties["MeshControls/Mesher"].ValueString
+    if selection == "Structured":
+	    return True
     else:
-        if float(Naca[2]) == 0 and float(Naca[3]) == 0:
-	        MessageBox.Show(" Thickness is too small (minimum is 01)")
-        if float(Naca[2]) == 3 and float(Naca[3]) != 0:
-	        MessageBox.Show(" Thickness is too big (maximum is 30)")
-        if float(Naca[2]) > 3:
-            MessageBox.Show(" Thickness is too big (maximum is 30)")
+	    return False
+
+# Sizing of the Mechanical mesher.
+@callTimer.Instrument
+def ShowSizing(step,property):
+    selection = step.Properties["MeshControls/Mesher"].ValueString
+    if selection == "Mechanical":
+	    return True
+    else:
+	    return False
+
+# Cell budget of the adaptive sizing.
+@callTimer.Instrument
+def ShowCellBudget(step,property):
+    sizing = step.Properties["MeshControls/Sizing"].ValueString
+    if ShowSizing(step,property) and sizing == "Adaptive":
+	    return True
+    else:
+	    return False
+
+# Growth ratio of the structured mesher and of the adaptive sizing.
+@callTimer.Instrument
+def ShowGrowth(step,property):
+    if ShowBoundaryLayer(step,property) or ShowCellBudget(step,property):
+	    return True
+    else:
+	    return False
+
+# Check if the wing sections are valid.
+@callTimer.Instrument
+def SectionsValidation(step,property):
+    Sections = step.Properties["Sections"].ValueString
+    if Sections.strip() != "":
+        try:
+            stations = WingSections.ParseSections(Sections)
+        except ValueError as error:
+            MessageBox.Show(" Invalid wing sections! " + str(error))
+            return
+        for naca in sorted(set(station[1] for station in stations)):
+            for problem in SourceProblems(naca, profileLibrary):
+                MessageBox.Show(" Invalid wing sections! " + problem)
 
 # Check if Angle of Attack is valid.
+@callTimer.Instrument
 def AngleOfAttackValidation(step,property):
     Angle = step.Properties["Angle"].Value
     if Angle < 0.0 or Angle > 180.0:
@@ -91,586 +237,803 @@ def DeleteAllVisible():
         result = Delete.Execute(selection)
     return
 
-# Calculate airfoil thickness for NACA 4-digit series and returns x,y coords. 
-def CreateAirfoil(m,p,t,x):
-    y_upper = range(0,len(x),1) 
-    y_lower = range(0,len(x),1)
-    thickness  = range(0,len(x),1)
-    print("stage 1")
-    for i in range(0,len(x),1):
-        thickness[i] = t / 0.20 * (0.29690 * math.sqrt(x[i]) - 0.12600 * x[i] - 0.35160 *
-        math.pow(x[i], 2) + 0.28430 * math.pow(x[i], 3) - 0.10360 *
-        math.pow(x[i], 4))
-        
-    fwd_x = [i for i in x if i<p]
-    aft_x =[i for i in x if i>=p]
-    
-    if 0<p<1 and 0<m<1:
-        fwd_camber =  [0 for i in range(0,len(fwd_x),1)]
-        aft_camber =  [0 for i in range(0,len(aft_x),1)]
-        for i in range(0,len(fwd_x),1):
-            fwd_camber[i] = m / p**2 * (2 * p * fwd_x[i] - math.pow(fwd_x[i], 2))
-        for i in range(0,len(aft_x),1):
-            aft_camber[i] = m / (1 - p)**2 * ((1 - 2 * p) + 2 * p * aft_x[i] -math.pow(aft_x[i], 2))
-        
-        camber = fwd_camber + aft_camber
+# Create the chordwise grid selected on the Geometry step (as its
+# CoordinateKey gives it) and estimate how many points it saves compared to a
+# uniform grid of the same accuracy.
+def ChordwiseX(key, surfaces):
+    (Naca, Points, Mode, Tolerance, CutValue) = key
+
+    x = ChordwiseGrid(Mode, Points, surfaces, Tolerance)
+    return (x, PointsSaved(surfaces, x))
+
+# Check if the trailing edge is cut on the coordinates rather than by CAD.
+def AnalyticCut(step):
+    if ShowCutValue(step,"Cut Trailing/CutTE") == True:
+        return step.Properties["Cut Trailing/CutMethod"].ValueString == "Analytic"
+    return False
+
+# Inputs of the Geometry step that define the airfoil coordinates.
+def CoordinateKey(step):
+    CutValue = None
+    if AnalyticCut(step):
+        CutValue = step.Properties["Cut Trailing/CutValue"].Value
+    return (step.Properties["Naca"].ValueString,
+            step.Properties["Points"].Value,
+            step.Properties["Spacing/Mode"].ValueString,
+            step.Properties["Spacing/Tolerance"].Value,
+            CutValue)
+
+# Airfoil x,y coords and the points saved for the inputs of a CoordinateKey.
+# Other profiles than NACA 4-digit codes come from ProfileSources. A spline is
+# sampled, and saves the points a uniform grid of its accuracy needs beyond
+# its control points. Reads no step, so the preview worker can run it.
+def KeyCoordinates(key):
+    if key[2] == "Spline":
+        xCut = None
+        if key[4] is not None:
+            xCut = 1.0 - key[4]/100.0
+        spline = CachedSpline(key[0], profileLibrary, key[3], xCut)
+        (x, y) = spline.Coordinates(key[1])
+        surfaces = ProfileSurfaces(key[0], profileLibrary)[0]
+        return (x, y, max(0, UniformPointsFor(surfaces, spline.deviation) - spline.ControlCount()))
+    if ProfileKind(key[0]) == "naca4":
+        (max_camb, max_camb_loc, thick_perc) = Naca4Digits(key[0])
+        (x, saved) = ChordwiseX(key, lambda xi: Naca4Surfaces(max_camb, max_camb_loc, thick_perc, xi))
+        if key[4] is None:
+            (x, y) = CreateAirfoil(max_camb, max_camb_loc, thick_perc, x)
+        else:
+            (x, y) = Naca4Truncated(max_camb, max_camb_loc, thick_perc, x, 1.0 - key[4]/100.0)
     else:
-        camber = [0 for i in range(0,len(x),1)]
-     
-    y_upper = [camber[i]+thickness[i] for i in range(len(thickness))]
-    y_lower = [camber[i]-thickness[i] for i in range(len(thickness))]
-     
-    x_upper = x[::-1]
-    x_lower = x[0:]
+        (surfaces, closed) = ProfileSurfaces(key[0], profileLibrary)
+        (x, saved) = ChordwiseX(key, surfaces)
+        if key[4] is None:
+            (x, y) = ProfileScalar(surfaces, x, closed)
+        else:
+            (x, y) = ProfileTruncated(surfaces, x, 1.0 - key[4]/100.0)
+    return (x, y, saved)
 
-    y_upper = y_upper[::-1]
-    y_lower = y_lower[0:]
+# Airfoil x,y coords for the Geometry step inputs, computed once per input set.
+def AirfoilCoordinates(step):
+    key = CoordinateKey(step)
+    cached = coordinateCache.Get(key)
+    if cached is None:
+        cached = KeyCoordinates(key)
+        coordinateCache.Put(key, cached)
+    step.Properties["Spacing/PointsSaved"].Value = cached[2]
+    return (list(cached[0]), list(cached[1]))
 
-    x = x_upper + x_lower
-    y = y_upper + y_lower
+# Keep a copy of the document under key.
+def StoreGeometry(key):
+    geometryCache.Put(key, cad.Snapshot())
 
-    y [0] = 0.0
-    y[-1] = 0.0
-    return (x, y)
+# Replace the document content with the copy stored under key, if any.
+def RestoreGeometry(key):
+    cached = geometryCache.Get(key)
+    if cached is None:
+        return False
+    cad.Restore(cached)
+	
+	# Curves are excluded from physics after the airfoil stage.
+    if key[0] != "Airfoil":
+        cad.SuppressCurves()
+    return True
+
+# Check if the points should also be drawn as sketch points.
+def DrawSketchPoints(step):
+    selection = step.Properties["SketchPoints"].ValueString
+    if selection == "Yes":
+        return True
+    else:
+        return False
 
 # Create list of 2D Points with given x,y coords. 
+# Every SketchPoint is a separate API call, so they are only drawn on request.
 def Point2DList(x,y, draw):
     points = List[Point2D]()
+    for i in range(0,len(x),1):
+        points.Add(Point2D.Create(x[i], y[i]))
     
     if draw:
-        for i in range(0,len(x),1):
-            point = Point2D.Create(x[i], y[i])
-            points.Add(point)
-            SketchPoint.Create(point)
-    else:
-        for i in range(0,len(x),1):
-            point = Point2D.Create(x[i], y[i])
-            points.Add(point)
+        for point in points:
+            with callTimer.Time("SketchPoint.Create"):
+                SketchPoint.Create(point)
     return points
 
-# Cut the airfoil.
-def CutTrailingEdge(cutTEper):    
-    f = cutTEper/100.0
-    point = Point.Create(1-f*1.0,0.0,0.0)
-    direction = Direction.Create(1,0,0)
-	# Create a point.
-    DatumPlaneCreator.Create(point,direction) 
-    # Select the surface.
-    selection = Selection.CreateByNames("Surface")
-	# Select the plane.
-    datum = Selection.CreateByNames("Plane")
-	# Split body by plane.
-    result = SplitBody.ByCutter(Selection.CreateByNames("Surface"), Selection.CreateByNames("Plane")) 
-    # Select the smallest part.
-    selection = Selection.CreateByNames("Surface") 
-	# Remove the smallest part.
-    result = Combine.RemoveRegions(selection) 
-    return
+# SpaceClaim implementation of the CAD operations used by the wizard stages.
+class SpaceClaimBackend(CadBackend):
+    def __init__(self):
+        # Draw every point of the airfoil as a sketch point.
+        self.drawPoints = False
 
-# Update Airfoil, before Next button is pressed.
-def UpdateAirfoil(step,property):
-    # Get user inputs.
-    Naca = step.Properties["Naca"].ValueString 
-    Points = step.Properties["Points"].Value
-    Preview = step.Properties["Preview"].ValueString
-	
-	# If user has selected show option, show the airfoil.
-    if Preview == "Show":
+    # The airfoil (or wing) body.
+    def AirfoilSelection(self):
+        return Selection.Create(GetRootPart().Bodies[0])
+
+    def DeleteAll(self):
         DeleteAllVisible()
-	    
+
+    def SketchAirfoil(self, x, y):
 		# Set sketch mode.
         mode = InteractionMode.Sketch
         viewResult = ViewHelper.SetViewMode(mode)
         viewResult = ViewHelper.SetSketchPlane(Plane.PlaneXY)
 	    
-		# Convert user inputs to percentages.
-        max_camb = float(Naca[0])/100.0
-        max_camb_loc = float(Naca[1])/10.0
-        thick_perc = float(Naca[2:4])/100.0	
-	
-        nx = Points/1.0
-        dx = 1.0/nx
-	
-        x= range(0,Points+1,1)
-        for i in range(0,len(x),1):
-            x[i]=i*dx
-	    
-		# Create the points.
-        (x,y) = CreateAirfoil(max_camb, max_camb_loc,thick_perc,x)
 		# Save points in a list.
-        points = Point2DList(x,y,True)
+        with callTimer.Time("Point2DList"):
+            points = Point2DList(x,y,self.drawPoints)
 		
         # Create the curve.
-        curve = SketchNurbs.CreateFrom2DPoints(False, points)
+        with callTimer.Time("SketchNurbs.CreateFrom2DPoints"):
+            curve = SketchNurbs.CreateFrom2DPoints(False, points)
+        # Close an open (cut) profile with the trailing edge line.
+        if (x[0], y[0]) != (x[-1], y[-1]):
+            with callTimer.Time("SketchLine.Create"):
+                line = SketchLine.Create(points[len(x)-1], points[0])
+		# Set solid mode.
+        mode = InteractionMode.Solid
+        result = ViewHelper.SetViewMode(mode)
+
+    def SketchSpline(self, spline):
+		# Set sketch mode.
+        mode = InteractionMode.Sketch
+        viewResult = ViewHelper.SetViewMode(mode)
+        viewResult = ViewHelper.SetSketchPlane(Plane.PlaneXY)
+	    
+        # Create the curve from the knots and the control points of the spline.
+        (degree, knots, controls) = spline.Nurbs()
+        with callTimer.Time("NurbsCurve.Create"):
+            knots = System.Array[Knot]([Knot(value, count) for (value, count) in knots])
+            points = System.Array[ControlPoint]([ControlPoint(Point.Create(x, y, 0.0), 1.0) for (x, y) in controls])
+            curve = NurbsCurve.Create(NurbsData(degree + 1, False, False, knots), points)
+        with callTimer.Time("SketchCurve.Create"):
+            SketchCurve.Create(CurveSegment.Create(curve, Interval.Create(spline.start, spline.end)))
+        # Close an open (cut) profile with the trailing edge line.
+        if not spline.Closed():
+            with callTimer.Time("SketchLine.Create"):
+                line = SketchLine.Create(Point2D.Create(*controls[-1]), Point2D.Create(*controls[0]))
 		# Set solid mode.
         mode = InteractionMode.Solid
         result = ViewHelper.SetViewMode(mode)
-        
-		# If cut trailing has selected, do it.
-        if ShowCutValue(step,"Cut Trailing/CutTE") == True:
-		    # Get user input value.
-            CutValue = step.Properties["Cut Trailing/CutValue"].Value
-            CutTrailingEdge(CutValue)
-			
-	    # Select Surface1.
-        selection = Selection.CreateByNames("Surface1")
-		# Activate Surface1.
-        selection.SetActive()
+
+    def CutTrailingEdge(self, xCut):
+        point = Point.Create(xCut,0.0,0.0)
+        direction = Direction.Create(1,0,0)
+		# Create a plane.
+        with callTimer.Time("DatumPlaneCreator.Create"):
+            DatumPlaneCreator.Create(point,direction) 
+		# Split body by plane.
+        with callTimer.Time("SplitBody.ByCutter"):
+            result = SplitBody.ByCutter(Selection.CreateByNames("Surface"), Selection.CreateByNames("Plane")) 
+        # Select the smallest part.
+        selection = Selection.CreateByNames("Surface") 
+		# Remove the smallest part.
+        with callTimer.Time("Combine.RemoveRegions"):
+            result = Combine.RemoveRegions(selection) 
+
+    def SuppressCurves(self):
+        selection = Selection.Create(GetRootPart().Curves)
+        ViewHelper.SetSuppressForPhysics(selection, True)
+
+    def Scale(self, factor):
+        preserveHoles = False
+        result = Scale.Execute(self.AirfoilSelection(), Frame.Create(Point.Create(MM(0), MM(0), MM(0)),Direction.DirX,Direction.DirY), Vector.Create(factor,factor,factor), preserveHoles)
+
+    def Rotate(self, centerX, centerY, angle):
+        anchorPoint = Point.Create(M(centerX), M(centerY), M(0.0))
+        axis = Line.Create(anchorPoint, Direction.DirZ)
+        options = MoveOptions()
+        options.CreatePatterns = False
+        options.DetachFirst = False
+        options.MaintainOrientation = False
+        options.MaintainMirrorRelationships = True
+        options.MaintainConnectivity = True
+        options.MaintainOffsetRelationships = True
+        options.Copy = False
+        result = Move.Rotate(self.AirfoilSelection(), axis, DEG(angle), options)
+
+    def Transform(self, matrix):
+        ((a, b, tx), (c, d, ty)) = matrix
+        # Uniform scale about the origin, then the rotation and the translation
+        # as the mapping to a frame, applied to the body as one matrix.
+        frame = Frame.Create(Point.Create(M(tx), M(ty), M(0.0)), Direction.Create(a, c, 0.0), Direction.Create(b, d, 0.0))
+        transform = Matrix.CreateMapping(frame)*Matrix.CreateScale(math.hypot(a, c), Point.Origin)
+        with callTimer.Time("DesignBody.Transform"):
+            GetRootPart().Bodies[0].Transform(transform)
+
+    def Extrude(self, span):
+        myBody = GetRootPart().Bodies[0]
+        for myFace in myBody.Faces:
+            selection = Selection.Create(myFace)
+        options = ExtrudeFaceOptions()
+        options.KeepMirror = True
+        options.KeepLayoutSurfaces = False
+        options.KeepCompositeFaceRelationships = True
+        options.PullSymmetric = False
+        options.OffsetMode = OffsetMode.IgnoreRelationships
+        options.Copy = False
+        options.ForceDoAsExtrude = False
+        options.ExtrudeType = ExtrudeType.Add
+        result = ExtrudeFaces.Execute(selection, M(span), options)
+
+    def LoftWing(self, sections):
+        DeleteAllVisible()
+        part = GetRootPart()
+        profiles = []
+        # One planar face per section, without sketching, bounded by the
+        # section curve and, for an open (cut) section, the trailing edge line.
+        with callTimer.Time("Body.CreatePlanarBody"):
+            for section in sections:
+                points = List[Point]()
+                for (x, y, z) in section:
+                    points.Add(Point.Create(M(x), M(y), M(z)))
+                boundary = List[ITrimmedCurve]()
+                boundary.Add(CurveSegment.Create(NurbsCurve.CreateThroughPoints(False, points, 1e-6)))
+                if section[0] != section[-1]:
+                    boundary.Add(CurveSegment.Create(points[len(section)-1], points[0]))
+                plane = Plane.Create(Frame.Create(Point.Create(M(0.0), M(0.0), M(section[0][2])), Direction.DirX, Direction.DirY))
+                body = Body.CreatePlanarBody(plane, boundary)
+                profiles.append(DesignBody.Create(part, "Section%d" % (len(profiles) + 1), body))
+        # Loft through the section faces, from root to tip.
+        options = LoftOptions()
+        options.GeometryCommandOptions = GeometryCommandOptions()
+        with callTimer.Time("Loft.Create"):
+            result = Loft.Create(Selection.Create(*[profile.Faces[0] for profile in profiles]), None, options)
+        wing = list(result.CreatedBodies)
+        if not wing:
+            raise ValueError("The loft through the wing sections created no body")
+        # Remove the section faces the loft leaves, so that the wing is the
+        # only body.
+        leftover = [body for body in part.Bodies if body not in wing]
+        if leftover:
+            result = Delete.Execute(Selection.Create(*leftover))
+
+    def DomainRectangle(self, left, right, down, up):
+	    # Set Sketch Plane.
+        sectionPlane = Plane.PlaneXY
+        result = ViewHelper.SetSketchPlane(sectionPlane)
+
+        # Sketch Rectangle.
+        point1 = Point2D.Create(M(left),M(up))
+        point2 = Point2D.Create(M(right),M(up))
+        point3 = Point2D.Create(M(right),M(down))
+        result = SketchRectangle.Create(point1, point2, point3)
+
+        # Solidify Sketch.
+        mode = InteractionMode.Solid
+        result = ViewHelper.SetViewMode(mode)
+
+        # Delete the airfoil face, leaving its hole in the domain.
+        selection = Selection.Create(GetRootPart().Bodies[0].Faces[0])
+        result = Delete.Execute(selection)
+
+        # Solidify Sketch.
+        mode = InteractionMode.Solid
+        result = ViewHelper.SetViewMode(mode)
+
+    def Enclosure(self, left, right, down, up, front):
+		# Check if there is an old Enclosure and delete it.
+        if GetRootPart().Components.Count > 0:
+            selection = Selection.Create(GetRootPart().Components[0])
+            result = Delete.Execute(selection)
+			 
+        myBody = GetRootPart().Bodies[0]
+        selection = Selection.Create(myBody)
+        options = EnclosureOptions()
+        options.EnclosureType = EnclosureType.Box
+        options.EnclosureCushion = BoxEnclosureCushion(M(left),M(right),M(down),M(up),M(0),M(front))
+        options.CustomBody = None
+        options.CreateShareTopology = False
+        options.Frame = Frame.Create(Point.Create(MM(0), MM(0), MM(0)), Direction.DirX, Direction.DirY)
+        options.CushionProportion = PERCENT(25)
+        result = Enclosure.Create(selection, options)
+			 
+		# Delete the wing, leaving its imprint in the enclosure.
+        selection = Selection.Create(myBody)
+        result = Delete.Execute(selection)
+
+    def Faces(self):
+        return list(GetRootPart().Components[0].Content.Bodies[0].Faces)
+
+    def FaceFrame(self, face):
+        center = face.Shape.GetBoundingBox(Matrix.Identity).Center
+        normal = face.Shape.ProjectPoint(center).Normal
+        return ((center.X, center.Y, center.Z), (normal.X, normal.Y, normal.Z))
+
+    def CreateNamedSelection(self, faces, name=None):
+        result = NamedSelection.Create(Selection.Create(*faces), Selection.Empty())
+        if name is not None:
+            result = NamedSelection.Rename(result.CreatedNamedSelection.Name, name)
+
+    def DeleteNamedSelection(self, name):
+        result = NamedSelection.Delete(name)
+
+    def RenameNamedSelection(self, name, newName):
+        result = NamedSelection.Rename(name, newName)
+
+    # Copies of the bodies and curves of the root part.
+    def Snapshot(self):
+        part = GetRootPart()
+        bodies = [(body.Name, body.Shape.Copy()) for body in part.Bodies]
+        curves = [curve.Shape for curve in part.Curves]
+        return (bodies, curves)
+
+    def Restore(self, snapshot):
+        (bodies, curves) = snapshot
+        DeleteAllVisible()
+        part = GetRootPart()
+        for (name, shape) in bodies:
+            DesignBody.Create(part, name, shape.Copy())
+        for shape in curves:
+            DesignCurve.Create(part, shape)
+
+cad = callTimer.InstrumentObject(SpaceClaimBackend(), OPERATIONS, "cad.")
+
+# Queue the preview of a pipeline stage. The inputs are read here; the
+# worker checks them and computes the coordinates, then show(steps) builds
+# the preview on the UI thread, unless a newer preview came in the meantime.
+def SubmitPreview(step, stage, show):
+    steps = WizardSteps(step)
+    params = WizardParameters(steps)
+    key = CoordinateKey(steps["Geometry"])
+    requested = default_timer()
+
+    def Prepare(check):
+        problems = AirfoilValidation.Validate(params, stage)
+        check()
+        if problems:
+            return (problems, None)
+        return ([], coordinateCache.Get(key) or KeyCoordinates(key))
+
+    def Apply(prepared):
+        (problems, coordinates) = prepared
+        if problems:
+            MessageBox.Show(" " + "\n ".join(problems) + " ")
+            return
+        coordinateCache.Put(key, coordinates)
+        show(steps)
+        # Report the time from the request to the preview.
+        if stage == "Airfoil":
+            steps["Geometry"].Properties["PreviewTime"].Value = default_timer() - requested
+        print(Previews().Report())
+
+    return Previews().Submit(Prepare, Apply, stage)
+
+# Update Airfoil, before Next button is pressed.
+@callTimer.Instrument
+@apiLoader.Requires
+def UpdateAirfoil(step,property):
+    # Get user inputs.
+    Preview = step.Properties["Preview"].ValueString
+	
+	# If user has selected show option, show the airfoil.
+    if Preview == "Show":
+        SubmitPreview(step, "Airfoil", ShowAirfoil)
 		
 	# If user has selected delete option, delete the airfoil.	
     elif Preview == "Delete":
-	    DeleteAllVisible()
+        CancelPreviews()
+        DeleteAllVisible()
+        pipeline.Invalidate()
     return True
 
+# Build the airfoil preview.
+@callTimer.Instrument
+@apiLoader.Requires
+def ShowAirfoil(steps):
+    callTimer.Reset()
+    pipeline.Run("Airfoil", steps)
+	
+    # Select the airfoil (Surface1 after a CAD cut, Surface otherwise).
+    selection = cad.AirfoilSelection()
+    # Activate the airfoil.
+    selection.SetActive()
+	
+    # Report the cost of each API call and the API load time.
+    print(callTimer.Report())
+    print(callTimer.SpanReport())
+    print(apiLoader.Report())
+    callTimer.Save()
+
+# Fluid Flow systems and their design points in the Workbench project. The
+# input parameters are the ones published with the names of DesignPoints.
+class WorkbenchProject(DesignPointProject):
+    def CreateSystem(self, name, settings=None):
+        template1 = GetTemplate(TemplateName="Fluid Flow")
+        system1 = template1.CreateSystem()
+        system1.DisplayText = name
+        return system1
+
+    def InputParameters(self, system, names):
+        published = dict((parameter.DisplayText, parameter) for parameter in Parameters.GetAllParameters())
+        missing = [name for name in names if name not in published]
+        if missing:
+            raise ValueError("Publish Workbench parameters for " + ", ".join(missing))
+        return dict((name, published[name]) for name in names)
+
+    def AddDesignPoints(self, system, parameters, rows):
+        points = []
+        for values in rows:
+            point = Parameters.CreateDesignPoint()
+            for name in sorted(values):
+                point.SetParameterExpression(Parameter=parameters[name], Expression=repr(values[name]))
+            points.append(point)
+        return points
+
+    def Update(self, points):
+        try:
+            UpdateAllDesignPoints(DesignPoints=points)
+        except Exception as error:
+            return [str(error)]*len(points)
+        return [None]*len(points)
+
+project = callTimer.InstrumentObject(WorkbenchProject(), ("CreateSystem", "AddDesignPoints", "Update"), "project.")
+
+# Components of the Fluid Flow system the steps after Mode Selection work on.
+STEP_COMPONENTS = ("Geometry", "Geometry", "Geometry", "Mesh")
+
 # Create a Fluid Flow Fluent system and define steps.	
+@callTimer.Instrument
 def CreateFluent(step):
     # Create the system.
-    template1 = GetTemplate(TemplateName="Fluid Flow")
-    system1 = template1.CreateSystem()
-    system1.DisplayText = "FFF"
+    system1 = project.CreateSystem("FFF")
 	
 	# Define with which system's component is associated each step.
     nextStep = step.NextStep
-    if nextStep!=None:
+    for component in STEP_COMPONENTS:
+        if nextStep == None:
+            break
         nextStep.SystemName = system1.Name
-        nextStep.ComponentName = "Geometry"
+        nextStep.ComponentName = component
         nextStep = nextStep.NextStep
-    if nextStep!=None:
-        nextStep.SystemName = system1.Name
-        nextStep.ComponentName = "Geometry"
-        nextStep = nextStep.NextStep
-    if nextStep!=None:
-        nextStep.SystemName = system1.Name
-        nextStep.ComponentName = "Geometry"
-        nextStep = nextStep.NextStep
-    if nextStep!=None:
-        nextStep.SystemName = system1.Name
-        nextStep.ComponentName = "Mesh"
+
+# Register the cases of the design point sweep on the system of the Mesh step,
+# the wizard inputs filling in the ones the sweep leaves out. The system holds
+# the wizard inputs, so only the values that differ from them are pushed.
+@callTimer.Instrument
+def RegisterDesignPoints(step):
+    with open(designPointSweep) as sweep:
+        definition = json.load(sweep)
+    params = WizardParameters(WizardSteps(step))
+    cases = SweepCases(definition, params)
+    system = GetSystem(Name=step.SystemName)
+    results = RegisterCases(project, cases, designPointWorkers, system.DisplayText, system, current=params)
+    failed = [result for result in results if result["status"] != "ok"]
+    print("%d design points registered, %d failed" % (len(results), len(failed)))
+    for result in failed:
+        print("Design point %d: %s" % (result["point"], result["error"]))
 
 # Is called when Back button is pressed on 3rd step.
+@callTimer.Instrument
+@apiLoader.Requires
 def DeleteAirfoil(step):
+    CancelPreviews()
     selection = Selection.SelectAll()
     if selection.Items.Count > 0:
         result = Delete.Execute(selection)
+    pipeline.Invalidate()
     return
 
 # Do scale, rotate and pull, before Next button is pressed.
+@callTimer.Instrument
+@apiLoader.Requires
 def ScaleRotatePull(step,property):
     # Get user inputs.
-    Chord = step.Properties["Chord"].Value
-    Angle = step.Properties["Angle"].Value
-    Angle = -Angle
     Preview2 = step.Properties["Preview2"].ValueString
 	
 	# If user has selected show option, do scale, rotate and pull.
     if Preview2 == "Show":
-		
-       # Scale
-       CutTE = step.PreviousStep.Properties["Cut Trailing/CutTE"].ValueString
-       if CutTE == "No":
-	       selection = Selection.CreateByNames("Surface")
-       else:
-           selection = Selection.CreateByNames("Surface1")
-		   
-       preserveHoles = False
-       if Chord != 0:
-           result = Scale.Execute(selection, Frame.Create(Point.Create(MM(0), MM(0), MM(0)),Direction.DirX,Direction.DirY), Vector.Create(Chord,Chord,Chord), preserveHoles)
-    
-	   # Rotate
-       if CutTE == "No":
-	       selection = Selection.CreateByNames("Surface")
-       else:
-           selection = Selection.CreateByNames("Surface1")
-       anchorPoint = Point.Create(M(0.25*Chord), M(0.0), M(0.0))
-       axis = Line.Create(anchorPoint, Direction.DirZ)
-       options = MoveOptions()
-       options.CreatePatterns = False
-       options.DetachFirst = False
-       options.MaintainOrientation = False
-       options.MaintainMirrorRelationships = True
-       options.MaintainConnectivity = True
-       options.MaintainOffsetRelationships = True
-       options.Copy = False
-       result = Move.Rotate(selection, axis, DEG(Angle), options)
-	
-	   # Pull, only if 3D mode has been selected.
-       selection = step.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
-       if selection != "2D":
-           WingSpan = step.Properties["WingSpan"].Value
-           myBody = GetRootPart().Bodies[0]
-           for myFace in myBody.Faces:
-               selection = Selection.Create(myFace)
-           options = ExtrudeFaceOptions()
-           options.KeepMirror = True
-           options.KeepLayoutSurfaces = False
-           options.KeepCompositeFaceRelationships = True
-           options.PullSymmetric = False
-           options.OffsetMode = OffsetMode.IgnoreRelationships
-           options.Copy = False
-           options.ForceDoAsExtrude = False
-           options.ExtrudeType = ExtrudeType.Add
-           result = ExtrudeFaces.Execute(selection, M(WingSpan), options)
+        SubmitPreview(step, "ScaleRotatePull", ShowScaleRotatePull)
 	
     # If user has selected delete option, delete scale, rotate and pull.	
     elif Preview2 == "Delete":
-         SetAirfoil(step.PreviousStep)
+        SetAirfoil(step.PreviousStep)
          
     return True
 
+# Build the scale, rotate and pull preview.
+@callTimer.Instrument
+@apiLoader.Requires
+def ShowScaleRotatePull(steps):
+    pipeline.Run("ScaleRotatePull", steps)
+
 # Is called when Next button is pressed at 2nd step.(Creates the airfoil)
+@callTimer.Instrument
+@apiLoader.Requires
 def SetAirfoil(step):
-    Naca = step.Properties["Naca"].ValueString
-    Points = step.Properties["Points"].Value
-    Preview = step.Properties["Preview"].ValueString
-    DeleteAllVisible()
-	
-    mode = InteractionMode.Sketch
-    viewResult = ViewHelper.SetViewMode(mode)
-    viewResult = ViewHelper.SetSketchPlane(Plane.PlaneXY)
-	
-    max_camb = float(Naca[0])/100.0
-    max_camb_loc = float(Naca[1])/10.0
-    thick_perc = float(Naca[2:4])/100.0	
-	
-    nx = Points/1.0
-    dx = 1.0/nx
-	
-    x= range(0,Points+1,1)
-    for i in range(0,len(x),1):
-        x[i]=i*dx
-	
-    (x,y) = CreateAirfoil(max_camb, max_camb_loc,thick_perc,x)
-    points = Point2DList(x,y,True)
-    
-    curve = SketchNurbs.CreateFrom2DPoints(False, points)
-    mode = InteractionMode.Solid
-    result = ViewHelper.SetViewMode(mode)
-    
-    if ShowCutValue(step,"Cut Trailing/CutTE") == True:
-        CutValue = step.Properties["Cut Trailing/CutValue"].Value
-        CutTrailingEdge(CutValue)
-	
-    selection = Selection.CreateByNames("Surface1")
+    CancelPreviews()
+    steps = WizardSteps(step)
+    pipeline.Run("Airfoil", steps)
+    selection = cad.AirfoilSelection()
     selection.SetActive()
+    Export(steps, CoordinateArrays(*AirfoilCoordinates(steps["Geometry"])), new=True)
     return True
 
 # Is called when Next Button is pressed at 3rd step.(Do scale,rotate and pull)
+@callTimer.Instrument
+@apiLoader.Requires
 def SetScaleRotatePull(step):
-    Chord = step.Properties["Chord"].Value
-    Angle = step.Properties["Angle"].Value
-    Angle = -Angle
-    CutTE = step.PreviousStep.Properties["Cut Trailing/CutTE"].ValueString
-    SetAirfoil(step.PreviousStep)
-	
-	# Exclude items from physics.
-    selection = Selection.Create(GetRootPart().Curves)
-    ViewHelper.SetSuppressForPhysics(selection, True)
-	
-	# Scale
-    if CutTE == "No":
-	    selection = Selection.CreateByNames("Surface")
-    else:
-        selection = Selection.CreateByNames("Surface1")
-    preserveHoles = False
-    if Chord != 0:
-        result = Scale.Execute(selection, Frame.Create(Point.Create(MM(0), MM(0), MM(0)),Direction.DirX,Direction.DirY), Vector.Create(Chord,Chord,Chord), preserveHoles)
-    
-	# Rotate
-    if CutTE == "No":
-	    selection = Selection.CreateByNames("Surface")
-    else:
-        selection = Selection.CreateByNames("Surface1")
-    anchorPoint = Point.Create(M(0.25*Chord), M(0.0), M(0.0))
-    axis = Line.Create(anchorPoint, Direction.DirZ)
-    options = MoveOptions()
-    options.CreatePatterns = False
-    options.DetachFirst = False
-    options.MaintainOrientation = False
-    options.MaintainMirrorRelationships = True
-    options.MaintainConnectivity = True
-    options.MaintainOffsetRelationships = True
-    options.Copy = False
-    result = Move.Rotate(selection, axis, DEG(Angle), options)
-	
-	# Pull, only if 3D mode has been selected.
-    selection = step.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
-    if selection != "2D":
-        WingSpan = step.Properties["WingSpan"].Value
-        myBody = GetRootPart().Bodies[0]
-        for myFace in myBody.Faces:
-            selection = Selection.Create(myFace)
-        options = ExtrudeFaceOptions()
-        options.KeepMirror = True
-        options.KeepLayoutSurfaces = False
-        options.KeepCompositeFaceRelationships = True
-        options.PullSymmetric = False
-        options.OffsetMode = OffsetMode.IgnoreRelationships
-        options.Copy = False
-        options.ForceDoAsExtrude = False
-        options.ExtrudeType = ExtrudeType.Add
-        result = ExtrudeFaces.Execute(selection, M(WingSpan), options)
-        Preview4 = "Delete"
-		
-		# Check if there is an old Enclosure component and delete it.
-        try:
-            myBody2 = GetRootPart().Components[0]
-            selection = Selection.Create(myBody2)
-            result = Delete.Execute(selection)
-        except:
-		    return
+    CancelPreviews()
+    pipeline.Run("ScaleRotatePull", WizardSteps(step))
     return True
 
 # Create a Domain rectangle.
+@callTimer.Instrument
+@apiLoader.Requires
 def CreateDomain(step,property):
     # Get user inputs.
-    RightX = step.Properties["2DDomain/RightX"].Value
-    LeftX = step.Properties["2DDomain/LeftX"].Value
-    UpY = step.Properties["2DDomain/UpY"].Value
-    DownY = step.Properties["2DDomain/DownY"].Value
     Preview3 = step.Properties["2DDomain/Preview3"].ValueString
-    CutTE = step.PreviousStep.PreviousStep.Properties["Cut Trailing/CutTE"].ValueString
 	# If user has selected show option, show the 2D domain.
     if Preview3 == "Show":
-	    # Set Sketch Plane.
-        sectionPlane = Plane.PlaneXY
-        result = ViewHelper.SetSketchPlane(sectionPlane)
-
-        # Sketch Rectangle.
-        point1 = Point2D.Create(M(LeftX),M(UpY))
-        point2 = Point2D.Create(M(RightX),M(UpY))
-        point3 = Point2D.Create(M(RightX),M(DownY))
-        result = SketchRectangle.Create(point1, point2, point3)
-
-        # Solidify Sketch.
-        mode = InteractionMode.Solid
-        result = ViewHelper.SetViewMode(mode)
-
-        # Rename Objects.
-        if CutTE == "No":
-            selection = Selection.Create(GetRootPart().Bodies[0].Faces[0])
-            result = Delete.Execute(selection)
-        else:
-		    # Delete Objects.
-            selection = Selection.Create(GetRootPart().Bodies[0].Faces[0])
-            result = Delete.Execute(selection)
-
-        # Solidify Sketch.
-        mode = InteractionMode.Solid
-        result = ViewHelper.SetViewMode(mode)
+        SubmitPreview(step, "Domain", ShowDomain)
     
 	# If user has selected delete option, delete the 2D Domain.
     elif Preview3 == "Delete":
-         SetScaleRotatePull(step.PreviousStep)
-
-# Is called when Next Button is pressed at 4th step.(Creates the Domain or the Enclosure)	
-def SetDomainOrEnclosure(step):
-    CutTE = step.PreviousStep.PreviousStep.Properties["Cut Trailing/CutTE"].ValueString
-	# Get first user input.
-    selection = step.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
-	
-	# If user has selected 2D mode, create the 2D domain.
-    if selection == "2D":
-        RightX = step.Properties["2DDomain/RightX"].Value
-        LeftX = step.Properties["2DDomain/LeftX"].Value
-        UpY = step.Properties["2DDomain/UpY"].Value
-        DownY = step.Properties["2DDomain/DownY"].Value
-	
         SetScaleRotatePull(step.PreviousStep)
-	    # Set Sketch Plane.
-        sectionPlane = Plane.PlaneXY
-        result = ViewHelper.SetSketchPlane(sectionPlane)
 
-        # Sketch Rectangle.
-        point1 = Point2D.Create(M(LeftX),M(UpY))
-        point2 = Point2D.Create(M(RightX),M(UpY))
-        point3 = Point2D.Create(M(RightX),M(DownY))
-        result = SketchRectangle.Create(point1, point2, point3)
+# Build the domain or enclosure preview.
+@callTimer.Instrument
+@apiLoader.Requires
+def ShowDomain(steps):
+    pipeline.Run("Domain", steps)
 
-        # Solidify Sketch.
-        mode = InteractionMode.Solid
-        result = ViewHelper.SetViewMode(mode)
-
-        # Delete Objects.
-        if CutTE == "No":
-            selection = Selection.Create(GetRootPart().Bodies[0].Faces[0])
-            result = Delete.Execute(selection)
-        else:
-		    # Delete Objects.
-            selection = Selection.Create(GetRootPart().Bodies[0].Faces[0])
-            result = Delete.Execute(selection)
-
-        # Solidify Sketch.
-        mode = InteractionMode.Solid
-        result = ViewHelper.SetViewMode(mode)
-		
-	# If user has selected 3D mode, create the 3D Enclosure.
-    elif selection != "2D":
-         RX = step.Properties["3DEnclosure/RX"].Value
-         LX = step.Properties["3DEnclosure/LX"].Value
-         UY = step.Properties["3DEnclosure/UY"].Value
-         DY = step.Properties["3DEnclosure/DY"].Value
-         FZ = step.Properties["3DEnclosure/FZ"].Value
-		 
-         SetScaleRotatePull(step.PreviousStep)
-		 
-		 # Check if there is an old Enclosure and delete it.
-         try:
-             myBody2 = GetRootPart().Components[0]
-             selection = Selection.Create(myBody2)
-             result = Delete.Execute(selection)
-			 
-             myBody = GetRootPart().Bodies[0]
-             selection = Selection.Create(myBody)
-             options = EnclosureOptions()
-             options.EnclosureType = EnclosureType.Box
-             options.EnclosureCushion = BoxEnclosureCushion(M(LX),M(RX),M(DY),M(UY),M(0),M(FZ))
-             options.CustomBody = None
-             options.CreateShareTopology = False
-             options.Frame = Frame.Create(Point.Create(MM(0), MM(0), MM(0)),  Direction.DirX, Direction.DirY)
-             options.CushionProportion = PERCENT(25)
-             result = Enclosure.Create(selection, options)
-			 
-             selection = Selection.Create(myBody)
-             result = Delete.Execute(selection)
-         except:   
-             myBody = GetRootPart().Bodies[0]
-             selection = Selection.Create(myBody)
-             options = EnclosureOptions()
-             options.EnclosureType = EnclosureType.Box
-             options.EnclosureCushion = BoxEnclosureCushion(M(LX),M(RX),M(DY),M(UY),M(0),M(FZ))
-             options.CustomBody = None
-             options.CreateShareTopology = False
-             options.Frame = Frame.Create(Point.Create(MM(0), MM(0), MM(0)), Direction.DirX, Direction.DirY)
-             options.CushionProportion = PERCENT(25)
-             result = Enclosure.Create(selection, options)
-			 
-             if CutTE == "Yes":
-                 selection = Selection.Create(myBody)
-                 result = Delete.Execute(selection)
-             else:
-                 selection = Selection.Create(myBody)
-                 result = Delete.Execute(selection)
-		 # Create Named Selections for each face.
-         for face in GetRootPart().Components[0].Content.Bodies[0].Faces:
-            myNS = NamedSelection.Create(Selection.Create(face),Selection())
-         
-		 # Delete Objects.
-         result = NamedSelection.Delete("Group1")
-         result = NamedSelection.Delete("Group2")
-         result = NamedSelection.Delete("Group3")
-		 
-		 # Rename Objects.
-         result = NamedSelection.Rename("Group5", "Outlet")
-         result = NamedSelection.Rename("Group7", "Inlet")
-         result = NamedSelection.Rename("Group4", "Symmetry1")
-         result = NamedSelection.Rename("Group8", "Symmetry2")
-         result = NamedSelection.Rename("Group6", "Symmetry3")
-         result = NamedSelection.Rename("Group9", "Symmetry4")
-		 
-		 # Create group of Named selections.
-         primarySelection = Selection.Create(GetRootPart().Components[0].Content.Bodies[0].Faces[0],
-         GetRootPart().Components[0].Content.Bodies[0].Faces[1],
-         GetRootPart().Components[0].Content.Bodies[0].Faces[2])
-         secondarySelection = Selection.Empty()
-         result = NamedSelection.Create(primarySelection, secondarySelection)
-		 
-		 # Rename Object.
-         result = NamedSelection.Rename("Group1", "Airfoil")
+# Is called when Next Button is pressed at 4th step.(Creates the Domain or the Enclosure)	
+@callTimer.Instrument
+@apiLoader.Requires
+def SetDomainOrEnclosure(step):
+    CancelPreviews()
+    steps = WizardSteps(step)
+    pipeline.Run("Domain", steps)
+    Export(steps, DomainArrays(WizardParameters(steps)))
 
 # Undo scale, rotate and pull.	
+@callTimer.Instrument
+@apiLoader.Requires
 def DeleteScaleRotatePull(step):
     SetAirfoil(step.PreviousStep)
 
 # Undo Domain or Enclosure creation.	
+@callTimer.Instrument
+@apiLoader.Requires
 def DeleteDomainOrEnclosure(step):
     SetScaleRotatePull(step.PreviousStep)
-    selection = step.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
-    if selection != "2D":
-        Preview4 = "Delete"
 
 # Create an Enclosure and delete the inside solid(airfoil).
+@callTimer.Instrument
+@apiLoader.Requires
 def CreateEnclosure(step,property):
     # Get user inputs.
-    RX = step.Properties["3DEnclosure/RX"].Value
-    LX = step.Properties["3DEnclosure/LX"].Value
-    UY = step.Properties["3DEnclosure/UY"].Value
-    DY = step.Properties["3DEnclosure/DY"].Value
-    FZ = step.Properties["3DEnclosure/FZ"].Value
     Preview4 = step.Properties["3DEnclosure/Preview4"].ValueString
-    CutTE = step.PreviousStep.PreviousStep.Properties["Cut Trailing/CutTE"].ValueString
 	
 	# If show option is selected, create the Enclosure.
     if Preview4 == "Show":
-        myBody = GetRootPart().Bodies[0]
-        selection = Selection.Create(myBody)
-
-        options = EnclosureOptions()
-        options.EnclosureType = EnclosureType.Box
-        options.EnclosureCushion = BoxEnclosureCushion(M(LX),M(RX),M(DY),M(UY),M(0),M(FZ))
-        options.CustomBody = None
-        options.CreateShareTopology = False
-        options.Frame = Frame.Create(Point.Create(MM(0), MM(0), MM(0)), 
-        Direction.DirX, 
-        Direction.DirY)
-        options.CushionProportion = PERCENT(25)
-        result = Enclosure.Create(selection, options)
-        
-		# Delete Objects.
-        if CutTE == "Yes":
-            selection = Selection.Create(myBody)
-            result = Delete.Execute(selection)
-        else:
-            selection = Selection.Create(myBody)
-            result = Delete.Execute(selection)
+        SubmitPreview(step, "Domain", ShowDomain)
 	# If delete option is selected, delete the Enclosure.	
     elif Preview4 == "Delete":
-         SetScaleRotatePull(step.PreviousStep)
-		 
-		 # Check if there is an old component and delete it.
-         try:
-             myBody2 = GetRootPart().Components[0]
-             selection = Selection.Create(myBody2)
-             result = Delete.Execute(selection)
-         except:
-		     return
+        SetScaleRotatePull(step.PreviousStep)
+
+# Map step names to the steps of the wizard, from the given step backwards.
+def WizardSteps(step):
+    steps = {}
+    while step != None:
+        steps[step.Name] = step
+        step = step.PreviousStep
+    return steps
+
+# Inputs of the airfoil stage (Geometry step).
+def AirfoilInputs(steps):
+    step = steps["Geometry"]
+    CutValue = None
+    if ShowCutValue(step,"Cut Trailing/CutTE") == True:
+        CutValue = step.Properties["Cut Trailing/CutValue"].Value
+    return CoordinateKey(step) + (CutValue, AnalyticCut(step), DrawSketchPoints(step))
+
+# Inputs of the scale, rotate and pull stage (Extra Definitions step).
+def ScaleRotatePullInputs(steps):
+    step = steps["Extra Definitions"]
+    Mode = steps["Mode Selection"].Properties["2Dor3D"].ValueString
+    WingSpan = None
+    Sections = None
+    if Mode != "2D":
+        WingSpan = step.Properties["WingSpan"].Value
+        Sections = step.Properties["Sections"].ValueString
+    return (Mode, step.Properties["Chord"].Value, step.Properties["Angle"].Value, WingSpan, Sections)
+
+# Inputs of the domain or enclosure stage (SetDomain step).
+def DomainInputs(steps):
+    step = steps["SetDomain"]
+    if steps["Mode Selection"].Properties["2Dor3D"].ValueString == "2D":
+        return (step.Properties["2DDomain/LeftX"].Value, step.Properties["2DDomain/RightX"].Value,
+                step.Properties["2DDomain/DownY"].Value, step.Properties["2DDomain/UpY"].Value)
+    return (step.Properties["3DEnclosure/LX"].Value, step.Properties["3DEnclosure/RX"].Value,
+            step.Properties["3DEnclosure/DY"].Value, step.Properties["3DEnclosure/UY"].Value,
+            step.Properties["3DEnclosure/FZ"].Value)
+
+# Wizard inputs of the given steps, as used by AirfoilStages.
+def WizardParameters(steps):
+    params = dict(AirfoilStages.DEFAULTS)
+    params["Mode"] = steps["Mode Selection"].Properties["2Dor3D"].ValueString
+    if "Geometry" in steps:
+        step = steps["Geometry"]
+        params["Naca"] = step.Properties["Naca"].ValueString
+        params["Profiles"] = profileLibrary
+        params["Points"] = step.Properties["Points"].Value
+        params["Spacing"] = step.Properties["Spacing/Mode"].ValueString
+        params["Tolerance"] = step.Properties["Spacing/Tolerance"].Value
+        params["SketchPoints"] = step.Properties["SketchPoints"].ValueString
+        params["CutTE"] = step.Properties["Cut Trailing/CutTE"].ValueString
+        params["CutValue"] = step.Properties["Cut Trailing/CutValue"].Value
+        params["CutMethod"] = step.Properties["Cut Trailing/CutMethod"].ValueString
+    if "Extra Definitions" in steps:
+        step = steps["Extra Definitions"]
+        params["Chord"] = step.Properties["Chord"].Value
+        params["Angle"] = step.Properties["Angle"].Value
+        params["WingSpan"] = step.Properties["WingSpan"].Value
+        params["Sections"] = step.Properties["Sections"].ValueString
+    if "SetDomain" in steps:
+        step = steps["SetDomain"]
+        params["Domain"] = [step.Properties["2DDomain/LeftX"].Value, step.Properties["2DDomain/RightX"].Value,
+                            step.Properties["2DDomain/DownY"].Value, step.Properties["2DDomain/UpY"].Value]
+        params["Enclosure"] = [step.Properties["3DEnclosure/LX"].Value, step.Properties["3DEnclosure/RX"].Value,
+                               step.Properties["3DEnclosure/DY"].Value, step.Properties["3DEnclosure/UY"].Value,
+                               step.Properties["3DEnclosure/FZ"].Value]
+    if "Mesh" in steps:
+        params["ElemSize"] = steps["Mesh"].Properties["MeshControls/ElemSize"].Value
+        params["Mesher"] = steps["Mesh"].Properties["MeshControls/Mesher"].ValueString
+        params["FirstHeight"] = steps["Mesh"].Properties["MeshControls/FirstHeight"].Value
+        params["Growth"] = steps["Mesh"].Properties["MeshControls/Growth"].Value
+        params["Sizing"] = steps["Mesh"].Properties["MeshControls/Sizing"].ValueString
+        params["CellBudget"] = steps["Mesh"].Properties["MeshControls/CellBudget"].Value
+    return params
+
+# Add arrays to the Airfoil record of the export. The Geometry step starts a
+# new export.
+def Export(steps, arrays, new=False):
+    if exportDir is None:
+        return
+    path = os.path.join(exportDir, "Airfoil.afs")
+    if new and os.path.exists(path):
+        os.remove(path)
+    with callTimer.Time("Export"):
+        with StoreWriter(path) as store:
+            store.Add("Airfoil", WizardParameters(steps), arrays)
+
+# Check the inputs of the steps up to stage before any CAD call. Problems are
+# shown and stop the step.
+def CheckInputs(steps, stage):
+    with callTimer.Time("Validate"):
+        problems = AirfoilValidation.Validate(WizardParameters(steps), stage)
+    if problems:
+        MessageBox.Show(" " + "\n ".join(problems) + " ")
+        raise ValueError("; ".join(problems))
+
+# Sketch the airfoil and cut its trailing edge.
+def BuildAirfoil(steps):
+    callTimer.Save()
+    CheckInputs(steps, "Airfoil")
+    cad.drawPoints = DrawSketchPoints(steps["Geometry"])
+    AirfoilStages.BuildAirfoil(cad, WizardParameters(steps), AirfoilCoordinates(steps["Geometry"]))
+
+# Scale and rotate the airfoil, in one transform, and, in 3D mode, pull it to
+# the wing span.
+def BuildScaleRotatePull(steps):
+    callTimer.Save()
+    CheckInputs(steps, "ScaleRotatePull")
+    AirfoilStages.BuildScaleRotatePull(cad, WizardParameters(steps))
+
+# Create the 2D domain around the airfoil, or the 3D enclosure around the wing.
+def BuildDomainOrEnclosure(steps):
+    callTimer.Save()
+    CheckInputs(steps, "Domain")
+    AirfoilStages.BuildDomainOrEnclosure(cad, WizardParameters(steps))
+
+# Wizard stages. Each one builds on the document left by the one before, and
+# a changed input only re-executes its own stage and the ones after it. A
+# stage build saves the profile, once its callback is done.
+pipeline = StagePipeline(StoreGeometry, RestoreGeometry)
+pipeline.Add("Airfoil", AirfoilInputs, BuildAirfoil)
+pipeline.Add("ScaleRotatePull", ScaleRotatePullInputs, BuildScaleRotatePull, after="Airfoil")
+pipeline.Add("Domain", DomainInputs, BuildDomainOrEnclosure, after="ScaleRotatePull", snapshot=False)
  
+# Copy the mesh of the inputs params from the cache to directory, and export
+# its arrays. Returns False if it is not cached, or the cache fails.
+def FetchMesh(steps, params, directory):
+    names = ["Airfoil.msh", "Mesh.afs"] if exportDir is not None else ["Airfoil.msh"]
+    try:
+        with callTimer.Time("FetchMesh"):
+            if artifactCache.Fetch(ArtifactKey(params, "mesh"), directory, names) is None:
+                return False
+    except (CacheTimeout, IOError, OSError) as error:
+        print("Mesh cache not read: %s" % error)
+        return False
+    if exportDir is not None:
+        path = os.path.join(directory, "Mesh.afs")
+        with StoreReader(path) as store:
+            arrays = store.Tables("Mesh")
+        os.remove(path)
+        Export(steps, arrays)
+    return True
+
+# Keep the mesh file at path and its arrays in the cache for the inputs
+# params.
+def CacheMesh(params, path, arrays):
+    def Write(entry):
+        shutil.copyfile(path, os.path.join(entry, "Airfoil.msh"))
+        with StoreWriter(os.path.join(entry, "Mesh.afs")) as store:
+            store.Add("Mesh", params, arrays)
+    try:
+        with callTimer.Time("CacheMesh"):
+            artifactCache.Put(ArtifactKey(params, "mesh"), Write)
+    except (CacheTimeout, IOError, OSError) as error:
+        print("Mesh not cached: %s" % error)
+
+# Mesh the domain without Mechanical, with StructuredGrid or, in 2D, TriMesh,
+# and write it as a Fluent mesh file. A mesh of the same inputs in the cache
+# is copied instead.
+def CreateNativeMesh(step):
+    steps = WizardSteps(step)
+    params = WizardParameters(steps)
+    directory = GetUserFilesDirectory()
+    start = default_timer()
+    if artifactCache is not None and FetchMesh(steps, params, directory):
+        print("Cached mesh copied to %s in %.2f s" % (os.path.join(directory, "Airfoil.msh"), default_timer() - start))
+        return
+    if params["Mesher"] == "Structured":
+        with callTimer.Time("GridAirfoil"):
+            (nodes, cells, faces) = GridAirfoil(params)
+    else:
+        with callTimer.Time("MeshAirfoil"):
+            (nodes, cells, faces) = MeshAirfoil(params)
+    path = os.path.join(directory, "Airfoil.msh")
+    with callTimer.Time("WriteFluentMesh"):
+        WriteFluentMesh(path, nodes, cells, faces)
+    seconds = default_timer() - start
+    print("%d cells in %.2f s (%.0f cells/s), written to %s" % (len(cells), seconds, len(cells)/seconds, path))
+    arrays = MeshArrays(nodes, cells, faces)
+    Export(steps, arrays)
+    if artifactCache is not None:
+        CacheMesh(params, path, arrays)
+
 # Create Mesh.(Either 2D or 3D)
+@callTimer.Instrument
 def CreateMesh(step):
     # Get user input.
     ElemSize = step.Properties["MeshControls/ElemSize"].Value
+    callTimer.Save()
+    CheckInputs(WizardSteps(step), "Mesh")
+    
+	# Mesh the domain here, without Mechanical, if selected. The native mesher is 2D only.
+    Mesher = step.Properties["MeshControls/Mesher"].ValueString
+    selection = step.PreviousStep.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
+    if Mesher == "Structured" or (Mesher == "Native" and selection == "2D"):
+        CreateNativeMesh(step)
+        return
     
 	# Communicate with Mechanical by sending a text with commands.
     commands = "model = ExtAPI.DataModel.Project.Model\n"
     commands += "mesh = model.Mesh\n"
 	
-    #commands += "sizing = mesh.AddSizing()\n"
-    #commands += "ids = []\n"
-	
-    #selection = step.PreviousStep.PreviousStep.PreviousStep.PreviousStep.Properties["2Dor3D"].ValueString
-    #if selection != "2D":
-        #commands += "for part in ExtAPI.DataModel.GeoData.Assemblies[0].Parts:\n\tfor body in part.Bodies:\n\t\tids.Add(body.Id)\n"
-    #elif selection == "2D":
-	    #commands += "for part in ExtAPI.DataModel.GeoData.Assemblies[0].Parts:\n\tfor body in part.Bodies:\n\t\tfor face in body.Faces:\n\t\t\tids.Add(face.Id)\n"
-    #commands += "sel = ExtAPI.SelectionManager.CreateSelectionInfo(SelectionTypeEnum.GeometryEntities)\n"
-    #commands += "sel.Ids = ids\n"
-    #commands += "sizing.Location = sel\n"
-    #commands += "sizing.Type = SizingType.ElementSize\n"
-	
-    commands += "Elem =" +ElemSize.ToString()+"\n"
-	
-    #commands += "sizing.ElementSize = Quantity(Elem,'m')\n"
-	
-    commands += "mesh.ElementSize = Quantity(Elem,'m')\n"
-    commands += "mesh.CaptureCurvature = True\n"
-    commands += "mesh.CaptureProximity = True\n"
+    # Local sizes from the airfoil, with the cells they give before meshing.
+    if step.Properties["MeshControls/Sizing"].ValueString == "Adaptive":
+        CellBudget = step.Properties["MeshControls/CellBudget"].Value
+        with callTimer.Time("AirfoilSizing"):
+            (controls, cells) = AirfoilSizing(WizardParameters(WizardSteps(step)), CellBudget or None)
+        step.Properties["MeshControls/PredictedCells"].Value = int(cells)
+        print("Predicted %d cells: airfoil %g m, %d spheres, far field %g m" %
+              (cells, controls["wall"], len(controls["spheres"]), controls["far"]))
+        commands += SizingCommands(controls)
+    else:
+        commands += "Elem =" +ElemSize.ToString()+"\n"
+        commands += "mesh.ElementSize = Quantity(Elem,'m')\n"
+        commands += "mesh.CaptureCurvature = True\n"
+        commands += "mesh.CaptureProximity = True\n"
     commands += "mesh.Update()\n"
 	
 	# Send Commands to Mechanical and generate mesh.
     systems = GetAllSystems()
     system = systems[0]
-    model = system.GetContainer(ComponentName="Mesh")
-    model.Refresh()
-    model.Edit()
-    model.SendCommand(Language = "Python", Command = commands)
-    model.Exit()
+    if meshPool.dispatch is None:
+        meshPool.dispatch = UiDispatch()
+    meshPool.Run(commands, system.Name)
+    if designPointSweep is not None:
+        RegisterDesignPoints(step)
 	
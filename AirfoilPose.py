@@ -0,0 +1,117 @@
+# Pose of a unit chord profile as one affine transform.
+#
+# The Extra Definitions step scales the profile to the chord, rotates it by
+# the angle of attack about its quarter chord and, for wing sections, moves it
+# by the sweep offset. PoseMatrix gives the three together as one 2x3 matrix
+#
+#     ((a, b, tx),
+#      (c, d, ty))    x' = a*x + b*y + tx, y' = c*x + d*y + ty
+#
+# so the CAD applies a single transform (CadBackend.Transform), or none when
+# the coordinates are sketched already posed. PoseBatch applies a batch of
+# matrices to one base profile in one pass, with numpy when it is there: the
+# cases of an angle of attack sweep share their profile and only differ in
+# their matrix. Plain Python otherwise, so it runs in the wizard.
+#
+#     matrices = [PoseMatrix(chord, angle) for angle in angles]
+#     posed = PoseBatch(x, y, matrices)    # (x, y) per matrix
+#
+# Run this file directly to compare batch posing with posing case by case and
+# with the scale and rotate operations of MemoryBackend:
+#     python AirfoilPose.py [cases] [points]
+
+import sys
+import math
+from timeit import default_timer
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The transform that leaves the profile in place.
+IDENTITY = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+
+# Matrix scaling a unit chord profile to chord, rotating it by the angle of
+# attack (degrees, nose up) about its quarter chord and moving it by offset
+# (x, y).
+def PoseMatrix(chord=1.0, angle=0.0, offset=(0.0, 0.0)):
+    angle = math.radians(-angle)
+    (c, s) = (math.cos(angle), math.sin(angle))
+    center = 0.25*chord
+    return ((c*chord, -s*chord, center - c*center + offset[0]),
+            (s*chord, c*chord, -s*center + offset[1]))
+
+# Matrix of first applied, then second.
+def ComposePoses(first, second):
+    ((a, b, tx), (c, d, ty)) = first
+    ((e, f, ux), (g, h, uy)) = second
+    return ((e*a + f*c, e*b + f*d, e*tx + f*ty + ux),
+            (g*a + h*c, g*b + h*d, g*tx + h*ty + uy))
+
+# Check if a matrix leaves the profile in place.
+def Identity(matrix, tolerance=1e-15):
+    return all(abs(value - other) <= tolerance for (row, rowIdentity) in zip(matrix, IDENTITY)
+               for (value, other) in zip(row, rowIdentity))
+
+# Profile x,y posed by every matrix, as (x, y) lists per matrix.
+def PoseBatch(x, y, matrices):
+    if numpy is not None:
+        points = numpy.array([x, y, numpy.ones(len(x))], dtype=float)
+        posed = numpy.asarray(matrices, dtype=float).reshape(-1, 2, 3).dot(points)
+        return [(xs.tolist(), ys.tolist()) for (xs, ys) in posed]
+    batch = []
+    for ((a, b, tx), (c, d, ty)) in matrices:
+        batch.append(([a*px + b*py + tx for (px, py) in zip(x, y)],
+                      [c*px + d*py + ty for (px, py) in zip(x, y)]))
+    return batch
+
+# Profile x,y posed by one matrix.
+def PosePoints(x, y, matrix):
+    return PoseBatch(x, y, [matrix])[0]
+
+# Pose an angle of attack sweep of one profile: batch, case by case, and on
+# MemoryBackend with one scale and one rotate per case, and check that they
+# agree.
+def Benchmark(cases=500, points=401):
+    from NacaProfile import ProfileScalar
+    from ProfileSources import ProfileSurfaces
+    from WingSections import PoseProfile
+    grid = [0.5 - 0.5*math.cos(math.pi*i/(points - 1)) for i in range(points)]
+    (x, y) = ProfileScalar(ProfileSurfaces("2412")[0], grid)
+    angles = [-10.0 + 20.0*k/max(cases - 1, 1) for k in range(cases)]
+
+    start = default_timer()
+    single = [PoseProfile(x, y, 2.0, angle) for angle in angles]
+    elapsed = default_timer() - start
+    print("case by case:  %d cases in %.4f s" % (cases, elapsed))
+
+    start = default_timer()
+    batch = PoseBatch(x, y, [PoseMatrix(2.0, angle) for angle in angles])
+    elapsed = default_timer() - start
+    print("batch:         %d cases in %.4f s (%s)" % (cases, elapsed, "numpy" if numpy is not None else "plain Python"))
+    error = max(abs(px - bx) + abs(py - by) for (posed, (xs, ys)) in zip(single, batch)
+                for ((px, py), bx, by) in zip(posed, xs, ys))
+
+    try:
+        from MemoryBackend import MemoryBackend, ProfilePolygon
+    except ImportError:
+        print("max difference %.1e" % error)
+        return
+    for label in ("scale and rotate", "one transform"):
+        cad = MemoryBackend()
+        start = default_timer()
+        for angle in angles:
+            cad.DeleteAll()
+            cad.SketchAirfoil(x, y)
+            if label == "one transform":
+                cad.Transform(PoseMatrix(2.0, angle))
+            else:
+                cad.Scale(2.0)
+                cad.Rotate(0.5, 0.0, -angle)
+        elapsed = default_timer() - start
+        print("%-14s %d cases in %.4f s, CAD calls %s" % (label + ":", cases, elapsed, sorted(cad.calls.items())))
+        error = max(error, abs(cad.Body().outline - ProfilePolygon(*batch[-1])).max())
+    print("max difference %.1e" % error)
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:3]])
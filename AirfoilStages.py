@@ -0,0 +1,198 @@
+# The wizard stages, written against the CadBackend interface.
+#
+# The wizard runs them on SpaceClaim through SpaceClaimBackend and the sweep
+# runner on any backend, e.g. MemoryBackend.MemoryBackend. Inputs are passed as a
+# dict using the names below, with the wizard defaults of AirfoilGenerator.xml.
+# Domain is (LeftX, RightX, DownY, UpY) and Enclosure is (LX, RX, DY, UY, FZ).
+# Sections is the station text of WingSections. Naca is a profile name of
+# ProfileSources, and Profiles the directory or archive of .dat files it may
+# name. With the "Spline" spacing the airfoil is sketched as a ProfileSpline
+# within the Tolerance, and its coordinates are sampled from it.
+#
+# The chord and angle of attack are applied as one AirfoilPose matrix: by a
+# single CAD transform, or, when all stages run together, by sketching the
+# airfoil already posed.
+
+from NacaProfile import ProfileScalar, ProfileTruncated
+from ChordSpacing import ChordwiseGrid
+from ProfileSources import ProfileSurfaces, ProfileSignature
+from ProfileSpline import CachedSpline
+from AirfoilPose import PoseMatrix, PoseBatch, Identity
+from GeometryCache import LRUCache
+import WingSections
+
+DEFAULTS = {
+    "Mode": "2D",
+    "Naca": "0012",
+    "Profiles": "",
+    "Points": 201,
+    "Spacing": "Uniform",
+    "Tolerance": 0.0001,
+    "SketchPoints": "No",
+    "CutTE": "Yes",
+    "CutValue": 1.0,
+    "CutMethod": "Analytic",
+    "Chord": 1.0,
+    "Angle": 0.0,
+    "WingSpan": 1.0,
+    "Sections": "",
+    "Domain": [-2.0, 2.0, -2.0, 2.0],
+    "Enclosure": [0.25, 0.25, 0.25, 0.25, 0.25],
+    "ElemSize": 0.08,
+    "Mesher": "Mechanical",
+    "FirstHeight": 0.0001,
+    "Growth": 1.15,
+    "Sizing": "Global",
+    "CellBudget": 0,
+}
+
+# Inputs that shape the unit chord coordinates of a case.
+PROFILE_INPUTS = ("Naca", "Profiles", "Points", "Spacing", "Tolerance", "CutTE", "CutValue", "CutMethod")
+
+# Chord station of the trailing edge cut.
+def CutStation(params):
+    return 1.0 - params["CutValue"]/100.0
+
+# Check if the trailing edge is cut on the coordinates rather than by CAD.
+def AnalyticCut(params):
+    return params["CutTE"] == "Yes" and params["CutMethod"] == "Analytic"
+
+# Profile spline for the Geometry step inputs, already cut for the analytic
+# cut method.
+def AirfoilSpline(params):
+    xCut = CutStation(params) if AnalyticCut(params) else None
+    return CachedSpline(params["Naca"], params.get("Profiles", ""), params["Tolerance"], xCut)
+
+# Airfoil x,y coords for the Geometry step inputs, already cut for the
+# analytic cut method.
+def AirfoilCoordinates(params):
+    if params["Spacing"] == "Spline":
+        return AirfoilSpline(params).Coordinates(params["Points"])
+    (surfaces, closed) = ProfileSurfaces(params["Naca"], params.get("Profiles", ""))
+    x = ChordwiseGrid(params["Spacing"], params["Points"], surfaces, params["Tolerance"])
+    if AnalyticCut(params):
+        return ProfileTruncated(surfaces, x, CutStation(params))
+    return ProfileScalar(surfaces, x, closed)
+
+# Pose of the Extra Definitions step: scale to the chord and rotation by the
+# angle of attack about the quarter chord.
+def AirfoilPose(params):
+    return PoseMatrix(params["Chord"], params["Angle"])
+
+# Check if the airfoil can be sketched already posed. The CAD cut is made at
+# a chord station of the unit chord profile, and a lofted wing is built from
+# its own sections.
+def SketchPosed(params):
+    return not WingSections.Lofted(params) and not (params["CutTE"] == "Yes" and not AnalyticCut(params))
+
+# Unit chord coordinates of the profiles posed recently.
+baseCoordinates = LRUCache(16)
+
+# Posed airfoil x,y coords of cases, in the order of the cases. Cases with the
+# same profile inputs, e.g. an angle of attack sweep, share their unit chord
+# coordinates and are posed by all their matrices in one batch.
+def PosedCoordinates(cases):
+    groups = {}
+    for (k, case) in enumerate(cases):
+        key = tuple(str(case.get(name, "")) for name in PROFILE_INPUTS)
+        key += (str(ProfileSignature(case["Naca"], case.get("Profiles", ""))),)
+        groups.setdefault(key, []).append(k)
+    posed = [None]*len(cases)
+    for (key, indices) in groups.items():
+        base = baseCoordinates.Get(key)
+        if base is None:
+            base = AirfoilCoordinates(cases[indices[0]])
+            baseCoordinates.Put(key, base)
+        for (k, coordinates) in zip(indices, PoseBatch(base[0], base[1], [AirfoilPose(cases[k]) for k in indices])):
+            posed[k] = coordinates
+    return posed
+
+# Geometry step: sketch the airfoil and cut its trailing edge. With posed the
+# airfoil is sketched in the pose of the Extra Definitions step, which then
+# leaves it in place; the given coordinates are in the sketched pose.
+def BuildAirfoil(cad, params, coordinates=None, posed=False):
+    if posed and not SketchPosed(params):
+        raise ValueError("Only an airfoil without CAD cut or sections can be sketched posed")
+    cad.DeleteAll()
+    if params["Spacing"] == "Spline":
+        spline = AirfoilSpline(params)
+        cad.SketchSpline(spline.Posed(AirfoilPose(params)) if posed else spline)
+    else:
+        if coordinates is None:
+            coordinates = PosedCoordinates([params])[0] if posed else AirfoilCoordinates(params)
+        (x, y) = coordinates
+        cad.SketchAirfoil(x, y)
+    if params["CutTE"] == "Yes" and not AnalyticCut(params):
+        cad.CutTrailingEdge(CutStation(params))
+
+# Extra Definitions step: scale to the chord and rotate by the angle of attack
+# about the quarter chord, in one transform unless the airfoil was sketched
+# posed, and, in 3D mode, pull to the wing span. A wing with sections is
+# lofted through them instead, built from their coordinates.
+def BuildScaleRotatePull(cad, params, posed=False):
+    if WingSections.Lofted(params):
+        cad.LoftWing(WingSections.SectionOutlines(params))
+        cad.SuppressCurves()
+        return
+    cad.SuppressCurves()
+    pose = AirfoilPose(params)
+    if not posed and not Identity(pose):
+        cad.Transform(pose)
+    if params["Mode"] != "2D":
+        cad.Extrude(params["WingSpan"])
+
+# SetDomain step: create the 2D domain or the 3D enclosure.
+def BuildDomainOrEnclosure(cad, params):
+    if params["Mode"] == "2D":
+        (LeftX, RightX, DownY, UpY) = params["Domain"]
+        cad.DomainRectangle(LeftX, RightX, DownY, UpY)
+    else:
+        (LX, RX, DY, UY, FZ) = params["Enclosure"]
+        cad.Enclosure(LX, RX, DY, UY, FZ)
+        NameEnclosureFaces(cad)
+
+# Sides of the enclosure box by the axis of their normal and the end of the
+# box they are at: inlet upstream (-X), outlet downstream, symmetry planes on
+# the others.
+ENCLOSURE_SIDES = {
+    (0, -1): "Inlet",
+    (0, 1): "Outlet",
+    (1, 1): "Symmetry1",
+    (1, -1): "Symmetry2",
+    (2, -1): "Symmetry3",
+    (2, 1): "Symmetry4",
+}
+
+# Named selections of the enclosure, in the order they are created.
+ENCLOSURE_NAMES = ("Inlet", "Outlet", "Symmetry1", "Symmetry2", "Symmetry3", "Symmetry4", "Airfoil")
+
+# Named selection of every enclosure face, from its centroid and normal
+# (FaceFrame), as indices of frames per name. The cushions put the sides of
+# the box beyond the wing, so a face whose normal is along an axis and which
+# lies in the plane of the outermost faces along that axis is that side of the
+# box. Every other face is the wing.
+def ClassifyEnclosureFaces(frames, tolerance=1e-6):
+    low = [min(center[axis] for (center, normal) in frames) for axis in range(3)]
+    high = [max(center[axis] for (center, normal) in frames) for axis in range(3)]
+    groups = dict((name, []) for name in ENCLOSURE_NAMES)
+    for (k, (center, normal)) in enumerate(frames):
+        name = "Airfoil"
+        axis = max(range(3), key=lambda a: abs(normal[a]))
+        if abs(normal[axis]) > 1.0 - tolerance:
+            distance = tolerance*max(high[axis] - low[axis], 1.0)
+            if abs(center[axis] - low[axis]) <= distance:
+                name = ENCLOSURE_SIDES[(axis, -1)]
+            elif abs(center[axis] - high[axis]) <= distance:
+                name = ENCLOSURE_SIDES[(axis, 1)]
+        groups[name].append(k)
+    missing = [name for name in ENCLOSURE_NAMES if not groups[name]]
+    if missing:
+        raise ValueError("No enclosure faces for " + ", ".join(missing))
+    return groups
+
+# Named selections of the enclosure faces, one call per selection.
+def NameEnclosureFaces(cad):
+    faces = cad.Faces()
+    groups = ClassifyEnclosureFaces([cad.FaceFrame(face) for face in faces])
+    for name in ENCLOSURE_NAMES:
+        cad.CreateNamedSelection([faces[k] for k in groups[name]], name)
@@ -0,0 +1,352 @@
+# Columnar binary store of airfoil coordinates, domains and meshes.
+#
+# A store file holds records, one per airfoil (a wizard project or a sweep
+# case), each a set of named arrays: float64 coordinates and int32
+# connectivity, little-endian and aligned to 64 bytes. A fixed header at the
+# start of the file points to a JSON index at the end, with the inputs of
+# every record and the offset, type and shape of each of its arrays. A reader
+# only parses the index and maps the file, so one airfoil or one boundary zone
+# comes out of a sweep file of any size without reading the rest.
+#
+# New arrays and a new index only go where the index the header points to has
+# nothing, and the header is rewritten last, so a file is always readable even
+# if a writer stops half way. Writing a record again replaces it. The space of
+# replaced arrays and of older indexes is used again once the header no longer
+# points to them, and free space at the end of the file is cut off, so
+# flushing often and exporting the same record again do not grow the file.
+# Plain Python, so the wizard can write a store; the reader returns numpy
+# arrays when numpy is there.
+#
+#     with StoreWriter("sweep.afs") as store:
+#         store.Add("case", inputs, MeshArrays(nodes, cells, faces))
+#     with StoreReader("sweep.afs") as store:
+#         nodes = store.Array("case", "nodes")
+#         wall = store.Zone("case", "Airfoil")
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"AIRFOIL\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+ALIGNMENT = 64
+
+# Array types: array module typecode to numpy dtype.
+TYPES = {"d": "<f8", "i": "<i4"}
+
+# Named selections of the wizard for the zones of the native meshers, as
+# NameEnclosureFaces names the faces of the 3D enclosure.
+SELECTION_NAMES = {
+    "airfoil": "Airfoil",
+    "inlet": "Inlet",
+    "outlet": "Outlet",
+    "top": "Symmetry1",
+    "bottom": "Symmetry2",
+    "root": "Symmetry3",
+    "tip": "Symmetry4",
+}
+
+# Array of typecode with the rows of values flattened, and its shape.
+def Table(typecode, rows):
+    rows = list(rows)
+    if rows and isinstance(rows[0], (list, tuple)):
+        width = len(rows[0])
+        return (array(typecode, [v for row in rows for v in row]), [len(rows), width])
+    return (array(typecode, rows), [len(rows)])
+
+# Airfoil coordinates as they are sketched.
+def CoordinateArrays(x, y):
+    return {"x": Table("d", x), "y": Table("d", y)}
+
+# Posed airfoil outline (Extra Definitions step) and the domain box around
+# it: left, right, down, up in 2D, with the span (zmin, zmax) in 3D. A lofted
+# wing also gets its sections, (stations, points, 3).
+def DomainArrays(params):
+    from TriMesh import AirfoilOutline
+    import WingSections
+    (outline, corners) = AirfoilOutline(params)
+    arrays = {"outline": Table("d", outline), "corners": Table("i", corners)}
+    if params["Mode"] == "2D":
+        box = list(params["Domain"])
+    else:
+        (LX, RX, DY, UY, FZ) = params["Enclosure"]
+        (xmin, xmax, ymin, ymax) = WingSections.SectionBounds([outline])
+        if WingSections.Lofted(params):
+            sections = WingSections.SectionOutlines(params)
+            (xmin, xmax, ymin, ymax) = WingSections.SectionBounds(sections)
+            (values, shape) = Table("d", [point for section in sections for point in section])
+            arrays["sections"] = (values, [len(sections), len(sections[0]), 3])
+        box = [xmin - LX, xmax + RX, ymin - DY, ymax + UY, 0.0, params["WingSpan"] + FZ]
+    arrays["box"] = Table("d", box)
+    return arrays
+
+# Mesh nodes, cells and boundary zones, as the native meshers return them.
+# Zones are stored as zones/<named selection>, one row per face: its nodes,
+# then the cells on both sides (-1 outside).
+def MeshArrays(nodes, cells, faces):
+    arrays = {"nodes": Table("d", nodes), "cells": Table("i", cells)}
+    for (zone, zoneFaces) in faces.items():
+        if zoneFaces:
+            arrays["zones/" + SELECTION_NAMES.get(zone, zone)] = Table("i", zoneFaces)
+    return arrays
+
+# Offset and length of the index of a store file, from its header.
+def _ReadHeader(stream):
+    stream.seek(0)
+    (magic, version, reserved, offset, length) = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("not an airfoil store")
+    if version > VERSION:
+        raise ValueError("airfoil store version %d is not supported" % version)
+    return (offset, length)
+
+# Records of the index of a store file.
+def _ReadIndex(stream):
+    (offset, length) = _ReadHeader(stream)
+    if not length:
+        return {}
+    stream.seek(offset)
+    return json.loads(stream.read(length).decode("utf-8"))["records"]
+
+# Offset of the first aligned byte at or after position.
+def _Aligned(position):
+    return position + -position % ALIGNMENT
+
+# Bytes from the offset of an index entry to the end of its array.
+def _Extent(entry):
+    size = array(entry["type"]).itemsize
+    for length in entry["shape"]:
+        size *= length
+    return (entry["offset"], entry["offset"] + size)
+
+# The writer keeps the free regions of the file, (start, end), sorted: space
+# that no array of its records and not the index of the header take. released
+# holds the regions of replaced arrays, still in the index of the header until
+# the next flush.
+class StoreWriter(object):
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+        self.stream = open(path, "r+b" if exists else "w+b")
+        self.released = []
+        if exists:
+            self.records = _ReadIndex(self.stream)
+            self.index = _ReadHeader(self.stream)
+        else:
+            self.records = {}
+            self.index = (0, 0)
+            self.stream.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self.stream.seek(0, 2)
+        self.end = self.stream.tell()
+        used = [_Extent(entry) for record in self.records.values() for entry in record["arrays"].values()]
+        if self.index[1]:
+            used.append((self.index[0], self.index[0] + self.index[1]))
+        self.free = []
+        position = HEADER.size
+        for (start, end) in sorted(used):
+            if start > position:
+                self.free.append((position, start))
+            position = max(position, end)
+        if position < self.end:
+            self.free.append((position, self.end))
+        self._Merge()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.Close()
+
+    # Aligned offset for size bytes: the first free region they fit in, or the
+    # end of the file.
+    def _Allocate(self, size):
+        for (k, (start, end)) in enumerate(self.free):
+            offset = _Aligned(start)
+            if offset + size <= end:
+                if offset + size < end:
+                    self.free[k] = (offset + size, end)
+                else:
+                    del self.free[k]
+                return offset
+        offset = _Aligned(self.end)
+        if offset > self.end:
+            self.stream.seek(self.end)
+            self.stream.write(b"\0"*(offset - self.end))
+        self.end = offset + size
+        return offset
+
+    # Free the region (start, end) with the padding after it.
+    def _Free(self, start, end):
+        self.free.append((start, min(_Aligned(end), self.end)))
+
+    # Join adjacent free regions and cut the last one off the file.
+    def _Merge(self):
+        merged = []
+        for (start, end) in sorted(self.free):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        if merged and merged[-1][1] >= self.end:
+            self.end = merged.pop()[0]
+            self.stream.truncate(self.end)
+        self.free = merged
+
+    # Append the arrays, as Table gives them, to the record name, replacing
+    # arrays of the same names. inputs are kept with the record.
+    def Add(self, name, inputs, arrays):
+        record = self.records.setdefault(name, {"inputs": {}, "arrays": {}})
+        record["inputs"].update(inputs or {})
+        for arrayName in sorted(arrays):
+            (values, shape) = arrays[arrayName]
+            if arrayName in record["arrays"]:
+                self.released.append(_Extent(record["arrays"][arrayName]))
+            offset = self._Allocate(len(values)*values.itemsize)
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            self.stream.seek(offset)
+            values.tofile(self.stream)
+            record["arrays"][arrayName] = {"offset": offset, "type": values.typecode, "shape": shape}
+
+    # Write the index and point the header to it. The old index and the
+    # replaced arrays are free from then on.
+    def Flush(self):
+        index = json.dumps({"records": self.records}, sort_keys=True).encode("utf-8")
+        offset = self._Allocate(len(index))
+        self.stream.seek(offset)
+        self.stream.write(index)
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.stream.seek(0)
+        self.stream.write(HEADER.pack(MAGIC, VERSION, 0, offset, len(index)))
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        if self.index[1]:
+            self.released.append((self.index[0], self.index[0] + self.index[1]))
+        self.index = (offset, len(index))
+        for (start, end) in self.released:
+            self._Free(start, end)
+        self.released = []
+        self._Merge()
+
+    def Close(self):
+        if self.stream is not None:
+            self.Flush()
+            self.stream.close()
+            self.stream = None
+
+class StoreReader(object):
+    def __init__(self, path):
+        self.stream = open(path, "rb")
+        self.records = _ReadIndex(self.stream)
+        self.map = mmap.mmap(self.stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.Close()
+
+    def Names(self):
+        return sorted(self.records)
+
+    def Inputs(self, name):
+        return self.records[name]["inputs"]
+
+    def Arrays(self, name):
+        return sorted(self.records[name]["arrays"])
+
+    def Zones(self, name):
+        return [arrayName[6:] for arrayName in self.Arrays(name) if arrayName.startswith("zones/")]
+
+    # Array of a record, mapped from the file: a numpy array of its shape, or
+    # a flat array.array without numpy.
+    def Array(self, name, arrayName):
+        entry = self.records[name]["arrays"][arrayName]
+        (offset, typecode, shape) = (entry["offset"], entry["type"], entry["shape"])
+        count = 1
+        for size in shape:
+            count *= size
+        if numpy is not None:
+            return numpy.frombuffer(self.map, TYPES[typecode], count, offset).reshape(shape)
+        values = array(typecode)
+        data = self.map[offset:offset + count*values.itemsize]
+        if hasattr(values, "frombytes"):
+            values.frombytes(data)
+        else:
+            values.fromstring(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    # Faces of a boundary zone, by its named selection.
+    def Zone(self, name, zone):
+        return self.Array(name, "zones/" + zone)
+
+    # All arrays of a record as Table gives them, copied out of the file, to
+    # add them to another store.
+    def Tables(self, name):
+        tables = {}
+        for arrayName in self.Arrays(name):
+            entry = self.records[name]["arrays"][arrayName]
+            values = self.Array(name, arrayName)
+            if numpy is not None:
+                values = array(entry["type"], values.ravel().tolist())
+            tables[arrayName] = (values, list(entry["shape"]))
+        return tables
+
+    # Arrays still in use keep the file mapped until they are freed.
+    def Close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+            self.stream.close()
+            self.map = None
+
+# Write a store of records with a mesh of cells cells each, and time reading
+# one zone back against reading the whole file.
+def Benchmark(records=200, cells=20000, path="benchmark.afs"):
+    import random
+    from timeit import default_timer
+    side = int(cells**0.5)
+    nodes = [(random.random(), random.random()) for k in range((side + 1)*(side + 1))]
+    quads = [[i*(side + 1) + j, i*(side + 1) + j + 1, (i + 1)*(side + 1) + j + 1, (i + 1)*(side + 1) + j]
+             for i in range(side) for j in range(side)]
+    faces = {"airfoil": [(q[0], q[1], k, -1) for (k, q) in enumerate(quads[:side])],
+             "interior": [(q[1], q[2], k, k + 1) for (k, q) in enumerate(quads[:-1])]}
+    arrays = MeshArrays(nodes, quads, faces)
+    if os.path.exists(path):
+        os.remove(path)
+    start = default_timer()
+    with StoreWriter(path) as store:
+        for k in range(records):
+            store.Add("case%d" % k, {"Case": k}, arrays)
+    elapsed = default_timer() - start
+    size = os.path.getsize(path)
+    print("wrote %d records, %.1f MB in %.2f s (%.0f MB/s)" % (records, size/1e6, elapsed, size/1e6/elapsed))
+    start = default_timer()
+    with StoreReader(path) as store:
+        wall = store.Zone("case%d" % (records//2), "Airfoil")
+        total = sum(wall[:, 2]) if numpy is not None else sum(wall[2::4])
+    elapsed = default_timer() - start
+    print("read one zone of %d faces (check %d) in %.4f s" % (len(faces["airfoil"]), total, elapsed))
+    start = default_timer()
+    with open(path, "rb") as stream:
+        data = stream.read()
+    elapsed = default_timer() - start
+    print("read the whole file (%d bytes) in %.4f s" % (len(data), elapsed))
+    os.remove(path)
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:]])
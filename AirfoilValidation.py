@@ -0,0 +1,250 @@
+# Checks of the wizard inputs before any CAD call.
+#
+# Validate runs on the AirfoilStages parameters and on the coordinates they
+# give, stage by stage, and returns the problems found as messages. The input
+# checks of a stage come first, so a bad case is rejected before its
+# coordinates are computed; a profile file is read by then, to check that it
+# exists and parses. The coordinates are checked for crossing surfaces
+# and a degenerate trailing edge, the posed airfoil for containment in the 2D
+# domain, and its thickness and trailing edge for the smallest feature the
+# element size can resolve. Plain Python, so it runs in the wizard; the
+# surface checks are vectorized with numpy when it is there.
+#
+#     problems = Validate(params)              # all stages
+#     problems = Validate(params, "Domain")    # up to the SetDomain step
+
+import sys
+from bisect import bisect_left
+from timeit import default_timer
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ProfileSources import SourceProblems
+
+# Stages of the wizard in order, as StagePipeline names them, and the Mesh step.
+STAGES = ("Airfoil", "ScaleRotatePull", "Domain", "Mesh")
+
+MIN_POINTS = 10
+MAX_CUT = 50.0
+# Smallest trailing edge gap of a cut profile, as a fraction of the chord.
+MIN_GAP = 1e-6
+# Smallest thickness or cut trailing edge, as a fraction of the element size.
+MIN_FEATURE = 0.02
+
+# Values of ys (over ascending xs) at the stations at.
+def Interpolate(xs, ys, at):
+    if numpy is not None:
+        return numpy.interp(at, xs, ys)
+    values = []
+    for x in at:
+        k = min(max(bisect_left(xs, x), 1), len(xs) - 1)
+        (x0, x1) = (xs[k-1], xs[k])
+        f = (x - x0)/(x1 - x0) if x1 > x0 else 0.0
+        values.append(ys[k-1] + f*(ys[k] - ys[k-1]))
+    return values
+
+# Upper and lower surfaces of a profile in the Naca4Scalar layout (upper from
+# TE to LE, then lower from LE to TE), both from the leading edge, as x and y
+# sequences, or None if a surface folds back along x.
+def Surfaces(x, y):
+    if numpy is not None:
+        (x, y) = (numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float))
+        k = int(numpy.argmin(x))
+        (upper, lower) = ((x[k::-1], y[k::-1]), (x[k:], y[k:]))
+        if (numpy.diff(upper[0]) < 0.0).any() or (numpy.diff(lower[0]) < 0.0).any():
+            return None
+        return (upper, lower)
+    k = x.index(min(x))
+    upper = (x[k::-1], y[k::-1])
+    lower = (x[k:], y[k:])
+    for (xs, ys) in (upper, lower):
+        if any(b < a for (a, b) in zip(xs, xs[1:])):
+            return None
+    return (upper, lower)
+
+# Smallest and largest distance of the upper above the lower surface, at the
+# stations of both surfaces between the leading edge and the trailing edge.
+def SurfaceGap(upper, lower):
+    (xu, yu) = upper
+    (xl, yl) = lower
+    start = max(xu[0], xl[0])
+    end = min(xu[-1], xl[-1])
+    if numpy is not None:
+        atUpper = xu[(xu > start) & (xu < end)]
+        atLower = xl[(xl > start) & (xl < end)]
+        gaps = numpy.concatenate((Interpolate(xu, yu, atUpper) - Interpolate(xl, yl, atUpper),
+                                  Interpolate(xu, yu, atLower) - Interpolate(xl, yl, atLower)))
+        if not len(gaps):
+            return (0.0, 0.0)
+        return (float(gaps.min()), float(gaps.max()))
+    atUpper = [xi for xi in xu if start < xi < end]
+    atLower = [xi for xi in xl if start < xi < end]
+    gaps = [a - b for (a, b) in zip(Interpolate(xu, yu, atUpper), Interpolate(xl, yl, atUpper))]
+    gaps += [a - b for (a, b) in zip(Interpolate(xu, yu, atLower), Interpolate(xl, yl, atLower))]
+    if not gaps:
+        return (0.0, 0.0)
+    return (min(gaps), max(gaps))
+
+# Problems of a unit chord profile x,y: folded or crossing surfaces, and a
+# trailing edge that is cut without a gap, or barely open without a cut (a
+# blunt one is kept). Returns the problems and the largest thickness and the
+# trailing edge gap.
+def ProfileProblems(x, y, cut, label="Profile"):
+    surfaces = Surfaces(x, y)
+    if surfaces is None:
+        return (["%s folds back along the chord" % label], 0.0, 0.0)
+    problems = []
+    (smallest, thickness) = SurfaceGap(*surfaces)
+    if smallest <= 0.0:
+        problems.append("%s crosses itself: the lower surface is above the upper one" % label)
+    gap = y[0] - y[-1]
+    if cut and gap < MIN_GAP:
+        problems.append("%s has a degenerate cut trailing edge (gap %.2e of the chord)" % (label, gap))
+    if not cut and gap != 0.0 and gap < MIN_GAP:
+        problems.append("%s has a degenerate trailing edge (gap %.2e of the chord)" % (label, gap))
+    return (problems, thickness, gap)
+
+# Problems of the inputs of a stage.
+def InputProblems(params, stage):
+    problems = []
+    if stage == "Airfoil":
+        problems += SourceProblems(params["Naca"], params.get("Profiles", ""))
+        if params["Points"] < MIN_POINTS:
+            problems.append("At least %d points are needed" % MIN_POINTS)
+        if params["Spacing"] in ("Adaptive", "Spline") and params["Tolerance"] <= 0.0:
+            problems.append("Chord deviation should be positive")
+        if params["CutTE"] == "Yes" and not 0.0 < params["CutValue"] < MAX_CUT:
+            problems.append("Cut value should be between 0 and %g %% of the chord" % MAX_CUT)
+    elif stage == "ScaleRotatePull":
+        if params["Chord"] <= 0.0:
+            problems.append("Chord should be positive")
+        if not 0.0 <= params["Angle"] <= 180.0:
+            problems.append("Angle of attack should be between 0 and 180")
+        if params["Mode"] != "2D":
+            if params["WingSpan"] <= 0.0:
+                problems.append("Wing span should be positive")
+            import WingSections
+            if WingSections.Lofted(params):
+                try:
+                    stations = WingSections.ParseSections(params["Sections"])
+                except ValueError as error:
+                    problems.append(str(error))
+                else:
+                    for naca in sorted(set(station[1] for station in stations)):
+                        problems += SourceProblems(naca, params.get("Profiles", ""))
+    elif stage == "Domain":
+        if params["Mode"] == "2D":
+            (LeftX, RightX, DownY, UpY) = params["Domain"]
+            if LeftX >= RightX or DownY >= UpY:
+                problems.append("Domain should have Upstream < Downstream and Down Y < Up Y")
+        elif min(params["Enclosure"]) <= 0.0:
+            problems.append("Enclosure cushions should be positive")
+    elif stage == "Mesh":
+        if params["ElemSize"] <= 0.0:
+            problems.append("Element size should be positive")
+        if params["Mesher"] == "Structured" and (params["FirstHeight"] <= 0.0 or params["Growth"] <= 1.0):
+            problems.append("First cell height should be positive and growth rate above 1")
+        if params["Mesher"] == "Mechanical" and params["Sizing"] == "Adaptive":
+            if params["Growth"] <= 1.0:
+                problems.append("Growth rate should be above 1")
+            if params["CellBudget"] < 0:
+                problems.append("Cell budget should be positive, or 0 for none")
+    return problems
+
+# xmin, xmax, ymin, ymax of the unit chord profile x,y posed as the Extra
+# Definitions step poses it.
+def PosedBounds(x, y, chord, angle):
+    from AirfoilPose import PoseMatrix, PosePoints
+    (xs, ys) = PosePoints(x, y, PoseMatrix(chord, angle))
+    return (min(xs), max(xs), min(ys), max(ys))
+
+# Problems of the geometry of a stage. The profile is always cut analytically,
+# as the CAD cut leaves it. found keeps the profile and the sizes later
+# stages check: the Mesh stage checks them against the element size.
+def GeometryProblems(params, stage, found):
+    import WingSections
+    problems = []
+    if stage == "Airfoil":
+        (grid, xCut) = WingSections.SectionGrid(params)
+        if params["Spacing"] == "Spline":
+            import AirfoilStages
+            try:
+                (x, y) = AirfoilStages.AirfoilCoordinates(dict(params, CutMethod="Analytic"))
+            except ValueError as error:
+                return [str(error)]
+        else:
+            (x, y) = WingSections.SectionProfiles([params["Naca"]], grid, xCut, params.get("Profiles", ""))[0]
+        (problems, thickness, gap) = ProfileProblems(x, y, xCut is not None)
+        found["profile"] = (x, y)
+        found["thickness"] = thickness
+        found["gap"] = gap or None
+    elif stage == "ScaleRotatePull" and WingSections.Lofted(params):
+        stations = WingSections.ParseSections(params["Sections"])
+        (grid, xCut) = WingSections.SectionGrid(params)
+        profiles = WingSections.SectionProfiles([station[1] for station in stations], grid, xCut,
+                                                params.get("Profiles", ""))
+        sizes = []
+        for ((span, naca, chord, twist, sweep), (x, y)) in zip(stations, profiles):
+            (sectionProblems, thickness, gap) = ProfileProblems(x, y, xCut is not None, "Section at span %g" % span)
+            problems += sectionProblems
+            sizes.append((chord*thickness, chord*gap))
+        found["thickness"] = min(thickness for (thickness, gap) in sizes)
+        gaps = [gap for (thickness, gap) in sizes if gap]
+        if gaps:
+            found["gap"] = min(gaps)
+    elif stage == "Domain" and params["Mode"] == "2D":
+        (xmin, xmax, ymin, ymax) = PosedBounds(found["profile"][0], found["profile"][1],
+                                               params["Chord"], params["Angle"])
+        (LeftX, RightX, DownY, UpY) = params["Domain"]
+        found["clearance"] = min(xmin - LeftX, RightX - xmax, ymin - DownY, UpY - ymax)
+        if found["clearance"] <= 0.0:
+            problems.append("Domain clips the airfoil")
+    elif stage == "Mesh":
+        size = MIN_FEATURE*params["ElemSize"]
+        chord = params["Chord"]
+        if chord*found["thickness"] < size:
+            problems.append("Airfoil thickness %.3g m is too small for element size %g m" %
+                            (chord*found["thickness"], params["ElemSize"]))
+        if found.get("gap") is not None and chord*found["gap"] < size:
+            problems.append("Trailing edge %.3g m is too small for element size %g m" %
+                            (chord*found["gap"], params["ElemSize"]))
+        if found.get("clearance") is not None and found["clearance"] < params["ElemSize"]:
+            problems.append("Domain leaves less than one element size around the airfoil")
+    return problems
+
+# Problems of the inputs up to and including stage, an empty list if they are
+# valid. The inputs of all these stages are checked before any coordinates
+# are computed, and the checks stop at the first stage with problems.
+def Validate(params, stage="Mesh"):
+    stages = STAGES[:STAGES.index(stage) + 1]
+    for name in stages:
+        problems = InputProblems(params, name)
+        if problems:
+            return problems
+    found = {}
+    for name in stages:
+        problems = GeometryProblems(params, name, found)
+        if problems:
+            return problems
+    return []
+
+# Time the validation of valid cases and the rejection of bad ones.
+def Benchmark(cases=2000):
+    import AirfoilStages
+    bad = [("Naca", "2012"), ("Naca", "0000"), ("CutValue", 80.0), ("Chord", -1.0),
+           ("Domain", [0.1, 2.0, -2.0, 2.0]), ("ElemSize", 0.0), ("ElemSize", 1.0)]
+    for (label, changes) in (("valid", []),) + tuple((name + " " + str(value), [(name, value)]) for (name, value) in bad):
+        params = dict(AirfoilStages.DEFAULTS)
+        params["Angle"] = 10.0
+        params.update(changes)
+        problems = Validate(params)
+        start = default_timer()
+        for k in range(cases):
+            Validate(params)
+        elapsed = default_timer() - start
+        print("%-22s %8.1f us per case  %s" % (label, 1e6*elapsed/cases, "; ".join(problems) or "ok"))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,57 @@
+# Deferred loading of the SpaceClaim scripting API.
+#
+# The SCDM API scripts are executed into the wizard namespace the first time a
+# callback needs them, instead of when the extension loads. Callbacks that only
+# validate inputs or toggle visibility never load them. Decorate the callbacks
+# that call the API with loader.Requires; the load time of each script is kept
+# in loader.timer.
+
+import os
+from CallTimer import CallTimer
+
+# SCDM scripts that define the V18 API, in load order.
+SCDM_SCRIPTS = (
+    "LoadSCDMAPIModuleV18.py",
+    "LoadSCDMAPITypesV18.py",
+    "LoadSCDMAPIUtilitiesV18.py",
+    "UtilitiesOnLoadV18.py",
+)
+
+# Directory of the SCDM scripts of the running Ansys installation.
+def ScdmScriptingDir():
+    import clr
+    clr.AddReference("Ans.Utilities")
+    from Ansys.Utilities import ApplicationConfiguration
+    ansysDir = ApplicationConfiguration.DefaultConfiguration.AwpRootEnvironmentVariableValue
+    return os.path.join(ansysDir, "scdm", "Scripting")
+
+class ApiLoader(object):
+    def __init__(self, namespace, scripts=SCDM_SCRIPTS, scriptDir=ScdmScriptingDir):
+        self.namespace = namespace
+        self.scripts = scripts
+        self.scriptDir = scriptDir
+        self.loaded = False
+        self.timer = CallTimer()
+
+    # Execute the API scripts into the namespace, once.
+    def Load(self):
+        if self.loaded:
+            return
+        with self.timer.Time("ScdmScriptingDir"):
+            directory = self.scriptDir()
+        for script in self.scripts:
+            with self.timer.Time(script):
+                execfile(os.path.join(directory, script), self.namespace)
+        self.loaded = True
+
+    # Decorator loading the API before the function runs.
+    def Requires(self, function):
+        def Loading(*args, **kwargs):
+            self.Load()
+            return function(*args, **kwargs)
+        Loading.__name__ = function.__name__
+        return Loading
+
+    # Load time of each script, slowest first.
+    def Report(self):
+        return self.timer.Report()
@@ -0,0 +1,319 @@
+# Content-addressed cache of finished artifacts on local disk.
+#
+# The same inputs come back again and again across sweeps and wizard runs,
+# and each run rebuilds the geometry and the mesh from scratch. An
+# ArtifactCache keeps the files a run produced, e.g. the Fluent mesh and the
+# AirfoilStore arrays, in a directory per entry, under the key of the full
+# input set and of the code that made them (ArtifactKey): a change of any
+# input, of a coordinate file a profile name resolves to, or of the source of
+# a module that shapes the artifacts, gives a new key, so a stale entry is
+# never served.
+#
+# Entries are written to a private directory first and renamed into place, so
+# an entry is either complete or absent. Fetch copies the files of an entry
+# out and marks it used. Once the cache holds more than maxBytes, Put evicts
+# the least recently used entries, moving each out of place before deleting
+# it. Several processes may share a cache: the rename and the eviction, and
+# Fetch, hold a lock file created exclusively, which works on every platform
+# and in the IronPython of the wizard. A lock older than stale seconds, left
+# by a process that died, is broken by one waiter at a time, holding a second
+# lock file, and only if it is still stale then.
+#
+#     cache = ArtifactCache("cache", maxBytes=2 << 30)
+#     key = ArtifactKey(params, "mesh")
+#     if cache.Fetch(key, directory) is None:
+#         cache.Put(key, lambda entry: WriteFluentMesh(os.path.join(entry, "Airfoil.msh"), ...))
+#
+# Run this file directly to time hits against misses of worker processes
+# sharing one cache:
+#     python ArtifactCache.py [cases] [workers]
+
+import os
+import sys
+import json
+import time
+import uuid
+import errno
+import shutil
+import hashlib
+from timeit import default_timer
+
+# Modules whose code shapes the artifacts.
+ARTIFACT_MODULES = ("AirfoilStages", "AirfoilPose", "NacaProfile", "ChordSpacing", "ProfileSources",
+                    "ProfileSpline", "WingSections", "MemoryBackend", "TriMesh", "StructuredGrid",
+                    "FluentMesh", "MeshSizing", "AirfoilStore")
+
+# Raised when the lock of a cache is not free within its timeout.
+class CacheTimeout(Exception):
+    pass
+
+_versions = {}
+
+# Hash of the sources of the modules, found next to this file.
+def CodeVersion(modules=ARTIFACT_MODULES):
+    if modules not in _versions:
+        digest = hashlib.sha1()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in modules:
+            with open(os.path.join(directory, name + ".py"), "rb") as source:
+                digest.update(source.read())
+        _versions[modules] = digest.hexdigest()[:16]
+    return _versions[modules]
+
+# Signatures of the coordinate files of the profiles of the inputs: the Naca
+# input and the sections of a lofted wing, by name.
+def ProfileFiles(params):
+    from ProfileSources import ProfileSignature
+    import WingSections
+    names = [params.get("Naca", "")]
+    if WingSections.Lofted(params):
+        try:
+            names += [naca for (span, naca, chord, twist, sweep) in WingSections.ParseSections(params["Sections"])]
+        except ValueError:
+            pass
+    library = params.get("Profiles", "")
+    files = {}
+    for name in names:
+        signature = ProfileSignature(name, library)
+        if signature is not None:
+            files[name] = signature
+    return files
+
+# Key of the artifacts of kind for the inputs params (AirfoilStages
+# parameters): a hash of all inputs, of the coordinate files they name and of
+# the code version.
+def ArtifactKey(params, kind="", version=None):
+    inputs = dict(params)
+    inputs["ProfileFiles"] = ProfileFiles(params)
+    text = json.dumps([kind, inputs, version or CodeVersion()], sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# Create the file path with data, unless it exists. Returns True if it was
+# created.
+def _CreateExclusive(path, data=b""):
+    try:
+        handle = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError as error:
+        if error.errno not in (errno.EEXIST, errno.EACCES):
+            raise
+        return False
+    os.write(handle, data)
+    os.close(handle)
+    return True
+
+# Lock file held by one process at a time. The file holds a token of its
+# holder, which only removes it if it still holds that token.
+class CacheLock(object):
+    def __init__(self, path, timeout=60.0, stale=300.0, poll=0.005):
+        self.path = path
+        self.timeout = timeout
+        self.stale = stale
+        self.poll = poll
+        self.token = None
+
+    # Check if the file path is older than stale seconds.
+    def _Stale(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) > self.stale
+        except OSError:
+            return False
+
+    # Remove the lock if it is stale. Waiters break it one at a time, holding
+    # the break file, and check it again then: another waiter may have broken
+    # it and a live process taken it in the meantime.
+    def _Break(self):
+        breaker = self.path + ".break"
+        if not _CreateExclusive(breaker):
+            if self._Stale(breaker):
+                try:
+                    os.remove(breaker)
+                except OSError:
+                    pass
+            return
+        try:
+            if self._Stale(self.path):
+                os.remove(self.path)
+        except OSError:
+            pass
+        finally:
+            os.remove(breaker)
+
+    def __enter__(self):
+        token = ("%d %s" % (os.getpid(), uuid.uuid4().hex)).encode("ascii")
+        start = default_timer()
+        while not _CreateExclusive(self.path, token):
+            if self._Stale(self.path):
+                self._Break()
+            if default_timer() - start > self.timeout:
+                raise CacheTimeout("Cache lock %s is held for more than %g s" % (self.path, self.timeout))
+            time.sleep(self.poll)
+        self.token = token
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        try:
+            with open(self.path, "rb") as stream:
+                held = stream.read() == self.token
+            if held:
+                os.remove(self.path)
+        except (IOError, OSError):
+            pass
+        self.token = None
+
+class ArtifactCache(object):
+    def __init__(self, root, maxBytes=1 << 30, timeout=60.0, stale=300.0):
+        self.root = root
+        self.maxBytes = maxBytes
+        self.timeout = timeout
+        self.stale = stale
+        self.temp = os.path.join(root, "tmp")
+        if not os.path.isdir(self.temp):
+            try:
+                os.makedirs(self.temp)
+            except OSError:
+                if not os.path.isdir(self.temp):
+                    raise
+        self.stats = {"hits": 0, "misses": 0, "puts": 0, "evicted": 0}
+
+    def _Lock(self):
+        return CacheLock(os.path.join(self.root, "lock"), self.timeout, self.stale)
+
+    def _Entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.isdir(self._Entry(key))
+
+    # Copy the files of the entry, all or the given names, to directory and
+    # return their names, or None if there is no entry for key.
+    def Fetch(self, key, directory, names=None):
+        entry = self._Entry(key)
+        with self._Lock():
+            if not os.path.isdir(entry):
+                self.stats["misses"] += 1
+                return None
+            if names is None:
+                names = sorted(os.listdir(entry))
+            for name in names:
+                shutil.copyfile(os.path.join(entry, name), os.path.join(directory, name))
+            os.utime(entry, None)
+        self.stats["hits"] += 1
+        return names
+
+    # Store the files write(directory) writes as the entry of key, unless the
+    # entry is there already. Returns True if it was stored.
+    def Put(self, key, write):
+        private = os.path.join(self.temp, uuid.uuid4().hex)
+        os.mkdir(private)
+        try:
+            write(private)
+            entry = self._Entry(key)
+            with self._Lock():
+                if os.path.isdir(entry):
+                    os.utime(entry, None)
+                    return False
+                if not os.path.isdir(os.path.dirname(entry)):
+                    os.mkdir(os.path.dirname(entry))
+                os.rename(private, entry)
+                self.stats["puts"] += 1
+                self._Evict(key)
+            return True
+        finally:
+            if os.path.isdir(private):
+                shutil.rmtree(private, True)
+
+    # Entries as (last use, bytes, key), oldest first.
+    def Entries(self):
+        entries = []
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for key in os.listdir(folder):
+                entry = os.path.join(folder, key)
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, key))
+        return sorted(entries)
+
+    # Total bytes of the entries.
+    def Size(self):
+        return sum(size for (used, size, key) in self.Entries())
+
+    # Remove the least recently used entries, but keep, until the entries fit
+    # in maxBytes, and private directories left by writers that died. Called
+    # with the lock held.
+    def _Evict(self, keep):
+        entries = self.Entries()
+        total = sum(size for (used, size, key) in entries)
+        for (used, size, key) in entries:
+            if total <= self.maxBytes:
+                break
+            if key == keep:
+                continue
+            doomed = os.path.join(self.temp, uuid.uuid4().hex)
+            os.rename(self._Entry(key), doomed)
+            shutil.rmtree(doomed, True)
+            total -= size
+            self.stats["evicted"] += 1
+        for name in os.listdir(self.temp):
+            path = os.path.join(self.temp, name)
+            try:
+                if time.time() - os.path.getmtime(path) > self.stale:
+                    shutil.rmtree(path, True)
+            except OSError:
+                pass
+
+    def Report(self):
+        stats = self.stats
+        return "cache %d hits, %d misses, %d stored, %d evicted" % (
+            stats["hits"], stats["misses"], stats["puts"], stats["evicted"])
+
+def _BenchmarkCase(arguments):
+    (root, maxBytes, params) = arguments
+    import TriMesh
+    from FluentMesh import WriteFluentMesh
+    import tempfile
+    cache = ArtifactCache(root, maxBytes)
+    key = ArtifactKey(params, "mesh")
+    directory = tempfile.mkdtemp()
+    start = default_timer()
+    try:
+        if cache.Fetch(key, directory) is None:
+            mesh = TriMesh.MeshAirfoil(params)
+            cache.Put(key, lambda entry: WriteFluentMesh(os.path.join(entry, "Airfoil.msh"), *mesh))
+            return ("miss", default_timer() - start)
+        return ("hit", default_timer() - start)
+    finally:
+        shutil.rmtree(directory, True)
+
+# Mesh cases with repeated inputs on worker processes sharing a cache, twice,
+# and time the hits against the misses. A last pass of new inputs goes to a
+# cache bounded to 1 MB, so it evicts.
+def Benchmark(cases=24, workers=4, root="benchmark-cache"):
+    import multiprocessing
+    import AirfoilStages
+    shutil.rmtree(root, True)
+    pool = multiprocessing.Pool(workers)
+    try:
+        for (label, maxBytes, elemSize) in (("first pass", 1 << 30, 0.16), ("second pass", 1 << 30, 0.16),
+                                            ("1 MB cache", 1 << 20, 0.12)):
+            sweep = [dict(AirfoilStages.DEFAULTS, Naca="24%02d" % (8 + k % 6), Angle=float(k % 4), ElemSize=elemSize)
+                     for k in range(cases)]
+            start = default_timer()
+            results = pool.map(_BenchmarkCase, [(root, maxBytes, params) for params in sweep])
+            elapsed = default_timer() - start
+            times = {}
+            for (kind, seconds) in results:
+                times.setdefault(kind, []).append(seconds)
+            cache = ArtifactCache(root)
+            print("%-11s %d cases in %.2f s: %s; %d entries, %.2f MB" % (
+                label, cases, elapsed, ", ".join("%s %d in %.1f ms" % (kind, len(values), 1e3*sum(values)/len(values))
+                                                 for (kind, values) in sorted(times.items())),
+                len(cache.Entries()), cache.Size()/1e6))
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(root, True)
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,95 @@
+# CAD operations used by the wizard, behind a backend interface.
+#
+# CadBackend lists the operations the wizard stages perform. The wizard script
+# implements it on top of SpaceClaim (SpaceClaimBackend in AirfoilGenerator.py)
+# and MemoryBackend.py implements it with numpy on plain polygons, so that the
+# stages in AirfoilStages.py can be run, timed and checked outside Ansys.
+#
+# Lengths are in meters and angles in degrees, as in the wizard.
+
+class CadBackend(object):
+    # Delete every body of the document.
+    def DeleteAll(self):
+        raise NotImplementedError
+
+    # Sketch an airfoil through x,y on the XY plane and fill it. An open
+    # profile (cut trailing edge) is closed with a straight line.
+    def SketchAirfoil(self, x, y):
+        raise NotImplementedError
+
+    # Sketch an airfoil as the curve of a ProfileSpline on the XY plane and
+    # fill it. An open profile is closed with a straight line.
+    def SketchSpline(self, spline):
+        raise NotImplementedError
+
+    # Remove the part of the airfoil aft of chord station xCut.
+    def CutTrailingEdge(self, xCut):
+        raise NotImplementedError
+
+    # Exclude the sketch curves from physics.
+    def SuppressCurves(self):
+        raise NotImplementedError
+
+    # Scale the airfoil about the origin.
+    def Scale(self, factor):
+        raise NotImplementedError
+
+    # Rotate the airfoil about the Z axis through (centerX, centerY).
+    def Rotate(self, centerX, centerY, angle):
+        raise NotImplementedError
+
+    # Transform the airfoil in its plane by an AirfoilPose matrix, scale,
+    # rotation and translation in one operation.
+    def Transform(self, matrix):
+        raise NotImplementedError
+
+    # Pull the airfoil along Z into a wing of the given span.
+    def Extrude(self, span):
+        raise NotImplementedError
+
+    # Replace the airfoil by a wing lofted through sections, lists of (x, y, z)
+    # points of its spanwise stations from root to tip, each on a plane of
+    # constant z. An open section (cut trailing edge) is closed with a straight
+    # line.
+    def LoftWing(self, sections):
+        raise NotImplementedError
+
+    # Replace the airfoil by a rectangular 2D domain with the airfoil cut out.
+    def DomainRectangle(self, left, right, down, up):
+        raise NotImplementedError
+
+    # Replace the wing by a box enclosure with the given cushions, the wing
+    # cut out. The cushion behind the wing root (-Z) is zero.
+    def Enclosure(self, left, right, down, up, front):
+        raise NotImplementedError
+
+    # Faces of the fluid body.
+    def Faces(self):
+        raise NotImplementedError
+
+    # Centroid (x, y, z) and unit normal (nx, ny, nz) of a face. The normal may
+    # point either way.
+    def FaceFrame(self, face):
+        raise NotImplementedError
+
+    # Create a named selection of faces. Without a name it is named GroupN, N
+    # the lowest free number.
+    def CreateNamedSelection(self, faces, name=None):
+        raise NotImplementedError
+
+    def DeleteNamedSelection(self, name):
+        raise NotImplementedError
+
+    def RenameNamedSelection(self, name, newName):
+        raise NotImplementedError
+
+    # Copy of the document content, for Restore.
+    def Snapshot(self):
+        raise NotImplementedError
+
+    # Replace the document content by a Snapshot.
+    def Restore(self, snapshot):
+        raise NotImplementedError
+
+# Names of the operations above.
+OPERATIONS = tuple(sorted(name for name in vars(CadBackend) if not name.startswith("_")))
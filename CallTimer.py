@@ -0,0 +1,50 @@
+# Per-call timing of scripting API calls.
+#
+# Wrap a call in "with timer.Time(name):" to record its count and duration, then
+# print timer.Report() to see total and per-call cost for each name.
+
+from timeit import default_timer
+
+class CallTimer(object):
+    def __init__(self):
+        self.Reset()
+
+    # Forget all recorded calls.
+    def Reset(self):
+        self.counts = {}
+        self.totals = {}
+
+    # Add one call of the given duration.
+    def Record(self, name, seconds):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    # Context manager timing the enclosed block under name.
+    def Time(self, name):
+        return _TimedBlock(self, name)
+
+    # Total seconds spent in name.
+    def Total(self, name):
+        return self.totals.get(name, 0.0)
+
+    # Table of count, total and mean time per call, slowest first.
+    def Report(self):
+        lines = ["%-40s %8s %10s %12s" % ("call", "count", "total s", "per call ms")]
+        for name in sorted(self.totals, key=self.totals.get, reverse=True):
+            count = self.counts[name]
+            total = self.totals[name]
+            lines.append("%-40s %8d %10.4f %12.4f" % (name, count, total, 1000.0*total/count))
+        return "\n".join(lines)
+
+class _TimedBlock(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.timer.Record(self.name, default_timer() - self.start)
+        return False
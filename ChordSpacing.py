@@ -0,0 +1,130 @@
+# Chordwise point distributions for the airfoil sketch.
+#
+# Plain Python so it runs inside the wizard. A "surfaces" argument is any
+# function returning the (upper, lower) ordinates at a chord station, e.g.
+# lambda x: Naca4Surfaces(m, p, t, x).
+
+import math
+
+SPACING_MODES = ("Uniform", "Cosine", "Half-Cosine", "Adaptive", "Spline")
+
+# Equally spaced stations, x[i] = i*dx (the wizard's original grid).
+def UniformGrid(points):
+    dx = 1.0/points
+    return [i*dx for i in range(0, points+1, 1)]
+
+# Stations clustered at both the leading and the trailing edge.
+def CosineGrid(points):
+    x = [0.5*(1.0 - math.cos(math.pi*i/points)) for i in range(0, points+1, 1)]
+    x[-1] = 1.0
+    return x
+
+# Stations clustered at the leading edge only.
+def HalfCosineGrid(points):
+    x = [1.0 - math.cos(0.5*math.pi*i/points) for i in range(0, points+1, 1)]
+    x[0] = 0.0
+    x[-1] = 1.0
+    return x
+
+# Stations of equal steps in sqrt(x), where the profile spline (ProfileSpline)
+# is sampled.
+def SquareGrid(points):
+    return [(float(i)/points)**2 for i in range(0, points+1, 1)]
+
+# Distance of point (px,py) from the segment (ax,ay)-(bx,by).
+def SegmentDistance(px, py, ax, ay, bx, by):
+    dx = bx - ax
+    dy = by - ay
+    length2 = dx*dx + dy*dy
+    if length2 == 0.0:
+        return math.hypot(px - ax, py - ay)
+    s = max(0.0, min(1.0, ((px - ax)*dx + (py - ay)*dy)/length2))
+    return math.hypot(px - ax - s*dx, py - ay - s*dy)
+
+# Largest distance between the true surfaces and the straight chord that the
+# sketch draws between stations x0 and x1, sampled at the interval midpoint.
+def ChordDeviation(surfaces, x0, x1, y0=None, y1=None):
+    if y0 is None:
+        y0 = surfaces(x0)
+    if y1 is None:
+        y1 = surfaces(x1)
+    xm = 0.5*(x0 + x1)
+    ym = surfaces(xm)
+    upper = SegmentDistance(xm, ym[0], x0, y0[0], x1, y1[0])
+    lower = SegmentDistance(xm, ym[1], x0, y0[1], x1, y1[1])
+    return max(upper, lower)
+
+# Largest chord deviation over a whole grid. Stops early once the deviation
+# exceeds limit, if one is given.
+def MaxDeviation(surfaces, x, limit=None):
+    deviation = 0.0
+    y1 = surfaces(x[0])
+    for i in range(0, len(x)-1, 1):
+        y0 = y1
+        y1 = surfaces(x[i+1])
+        deviation = max(deviation, ChordDeviation(surfaces, x[i], x[i+1], y0, y1))
+        if limit is not None and deviation > limit:
+            break
+    return deviation
+
+# Curvature-adaptive grid: intervals are bisected until the chord deviation is
+# below tolerance, or until maxPoints intervals have been created.
+def AdaptiveGrid(surfaces, tolerance, maxPoints=2000):
+    x = CosineGrid(8)
+    y = [surfaces(xi) for xi in x]
+    intervals = [(x[i], x[i+1], y[i], y[i+1]) for i in range(0, len(x)-1, 1)]
+    done = []
+    while intervals:
+        (x0, x1, y0, y1) = intervals.pop()
+        if len(done) + len(intervals) + 1 >= maxPoints or \
+           ChordDeviation(surfaces, x0, x1, y0, y1) <= tolerance:
+            done.append((x0, x1))
+            continue
+        xm = 0.5*(x0 + x1)
+        ym = surfaces(xm)
+        intervals.append((xm, x1, ym, y1))
+        intervals.append((x0, xm, y0, ym))
+    done.sort()
+    return [interval[0] for interval in done] + [1.0]
+
+# Chord station where the nose is measured, and the chord deviation of a nose
+# y = a*sqrt(x) over [0, h] per unit of a*sqrt(h), at the interval midpoint.
+NOSE = 1e-4
+NOSE_DEVIATION = math.sqrt(0.5) - 0.5
+
+# Smallest uniform point count whose chord deviation is at most deviation.
+# On a uniform grid the leading edge interval is the worst one. Near the
+# leading edge the half thickness is a*sqrt(x), so the first interval [0, h]
+# deviates by c*h/sqrt(h + a*a) (c = NOSE_DEVIATION*a), solved here for h.
+# Within a few percent of searching the uniform grids, at the cost of one
+# evaluation of the surfaces.
+def UniformPointsFor(surfaces, deviation, limit=1000000):
+    if deviation <= 0.0:
+        return limit
+    (upper, lower) = surfaces(NOSE)
+    a = 0.5*(upper - lower)/math.sqrt(NOSE)
+    if a <= 0.0:
+        return min(limit, int(math.ceil(NOSE_DEVIATION/deviation)))
+    c = NOSE_DEVIATION*a
+    d2 = deviation*deviation
+    step = (d2 + math.sqrt(d2*d2 + 4.0*c*c*a*a*d2))/(2.0*c*c)
+    return min(limit, int(math.ceil(1.0/step)))
+
+# Points saved by grid x compared to a uniform grid of equal chord deviation.
+def PointsSaved(surfaces, x):
+    deviation = MaxDeviation(surfaces, x)
+    return max(0, UniformPointsFor(surfaces, deviation) - (len(x)-1))
+
+# Build the chordwise grid for a spacing mode. For "Adaptive", points is the
+# upper bound on the number of intervals. "Spline" gives the stations of the
+# coordinates sampled from the profile spline.
+def ChordwiseGrid(mode, points, surfaces=None, tolerance=1e-4):
+    if mode == "Cosine":
+        return CosineGrid(points)
+    if mode == "Spline":
+        return SquareGrid(points)
+    if mode == "Half-Cosine":
+        return HalfCosineGrid(points)
+    if mode == "Adaptive":
+        return AdaptiveGrid(surfaces, tolerance, points)
+    return UniformGrid(points)
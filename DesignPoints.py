@@ -0,0 +1,197 @@
+# Sweep cases as design points of Fluid Flow systems.
+#
+# Running a sweep through the wizard, one Workbench project or system per
+# case, pays the system creation and the geometry transfer for every case.
+# RegisterCases creates one system per group of cases that share their
+# non-numeric inputs (profile, mode, spacing, mesher...) and registers every
+# case of the group as a design point of it. Only the numeric inputs that
+# vary between the cases or differ from the current values of the system are
+# pushed, all design points of a system are created in one pass before any
+# update, and the points are updated up to workers at a time.
+#
+# Workbench design points belong to the project, not to a system, and a
+# Fluid Flow system takes its profile and mode from the wizard, so a project
+# without systemSettings, as WorkbenchProject, takes only one group.
+#
+# A project is anything implementing DesignPointProject: WorkbenchProject in
+# AirfoilGenerator.py drives the Workbench project, FakeProject stands in for
+# it with the costs of the Workbench calls. The numeric inputs go by their
+# names below, with Domain and Enclosure split into their values as in
+# AirfoilStages.
+#
+#     results = RegisterCases(project, SweepRunner.SweepCases(definition), workers=4)
+#
+# Run this file directly to compare a system per case with design points:
+#     python DesignPoints.py [cases] [workers]
+
+import sys
+import time
+import threading
+from timeit import default_timer
+
+# Names of the Domain and Enclosure values, in order.
+DOMAIN_NAMES = ("LeftX", "RightX", "DownY", "UpY")
+ENCLOSURE_NAMES = ("LX", "RX", "DY", "UY", "FZ")
+
+# Numeric inputs, pushed as design point parameters.
+NUMERIC_INPUTS = ("Points", "Tolerance", "CutValue", "Chord", "Angle", "WingSpan", "ElemSize",
+                  "FirstHeight", "Growth")
+
+# Design point parameters of a case, by name.
+def CaseParameters(case):
+    values = dict((name, float(case[name])) for name in NUMERIC_INPUTS)
+    values.update(zip(DOMAIN_NAMES, [float(value) for value in case["Domain"]]))
+    values.update(zip(ENCLOSURE_NAMES, [float(value) for value in case["Enclosure"]]))
+    return values
+
+# Inputs of a case that are not design point parameters, and so shape the
+# system itself.
+def SystemSettings(case):
+    return dict((name, value) for (name, value) in case.items()
+                if name not in NUMERIC_INPUTS and name not in ("Domain", "Enclosure"))
+
+# Cases grouped by their system settings, as (settings, indices of the
+# cases), in the order of the cases.
+def GroupCases(cases):
+    groups = []
+    keys = {}
+    for (k, case) in enumerate(cases):
+        settings = SystemSettings(case)
+        key = tuple(sorted((name, str(value)) for (name, value) in settings.items()))
+        if key not in keys:
+            keys[key] = len(groups)
+            groups.append((settings, []))
+        groups[keys[key]][1].append(k)
+    return groups
+
+class DesignPointProject(object):
+    # Whether CreateSystem applies the settings and design points belong to
+    # their system, so that cases of several groups can be registered.
+    systemSettings = False
+
+    # Create a Fluid Flow system for cases with the settings.
+    def CreateSystem(self, name, settings):
+        raise NotImplementedError
+
+    # Input parameters of a system, by name. Raises ValueError for names it
+    # does not have.
+    def InputParameters(self, system, names):
+        raise NotImplementedError
+
+    # Add a design point per dict of parameter values and return them.
+    def AddDesignPoints(self, system, parameters, rows):
+        raise NotImplementedError
+
+    # Update design points together. Returns the error message of each point,
+    # None for the ones updated.
+    def Update(self, points):
+        raise NotImplementedError
+
+# Stand-in for a Workbench project. Every call sleeps for its cost in the
+# project: systemTime for a system (its creation and geometry transfer),
+# valueTime per parameter value and updateTime per design point update, the
+# points of one Update in parallel.
+class FakeProject(DesignPointProject):
+    systemSettings = True
+
+    def __init__(self, systemTime=0.0, valueTime=0.0, updateTime=0.0):
+        self.systemTime = systemTime
+        self.valueTime = valueTime
+        self.updateTime = updateTime
+        self.systems = []
+        self.stats = {"systems": 0, "points": 0, "values": 0, "updates": 0}
+
+    def CreateSystem(self, name, settings):
+        time.sleep(self.systemTime)
+        self.systems.append({"name": name, "settings": settings, "points": []})
+        self.stats["systems"] += 1
+        return self.systems[-1]
+
+    def InputParameters(self, system, names):
+        return dict((name, name) for name in names)
+
+    def AddDesignPoints(self, system, parameters, rows):
+        points = []
+        for values in rows:
+            time.sleep(self.valueTime*len(values))
+            points.append({"system": system["name"], "values": dict(values), "updated": False})
+            self.stats["values"] += len(values)
+        system["points"] += points
+        self.stats["points"] += len(points)
+        return points
+
+    def Update(self, points):
+        def Run(point):
+            time.sleep(self.updateTime)
+            point["updated"] = True
+        threads = [threading.Thread(target=Run, args=(point,)) for point in points]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats["updates"] += len(points)
+        return [None]*len(points)
+
+# Register cases as design points, one system per group of GroupCases, or
+# all in the given system, and update them workers at a time. current are
+# the inputs the given system holds (AirfoilStages parameters): the numeric
+# inputs equal to them in all cases are not pushed. All numeric inputs are
+# pushed to a new system. Returns per case the name of its system, its design
+# point and its status: "ok" or "error", with the error.
+def RegisterCases(project, cases, workers=4, name="FFF", system=None, progress=None, current=None):
+    groups = GroupCases(cases)
+    if (system is not None or not project.systemSettings) and len(groups) > 1:
+        differing = sorted(key for key in groups[0][0]
+                           if any(str(settings[key]) != str(groups[0][0][key]) for (settings, indices) in groups))
+        raise ValueError("Cases differ in inputs that are not design point parameters: " + ", ".join(differing))
+    results = [None]*len(cases)
+    done = 0
+    for (k, (settings, indices)) in enumerate(groups):
+        label = name if len(groups) == 1 else "%s %d" % (name, k + 1)
+        target = system if system is not None else project.CreateSystem(label, settings)
+        values = [CaseParameters(cases[i]) for i in indices]
+        held = CaseParameters(current) if system is not None and current is not None else {}
+        varying = sorted(key for key in values[0] if key not in held or
+                         any(row[key] != held[key] for row in values))
+        parameters = project.InputParameters(target, varying)
+        points = project.AddDesignPoints(target, parameters, [dict((key, row[key]) for key in varying)
+                                                              for row in values])
+        for start in range(0, len(points), workers):
+            wave = list(range(start, min(start + workers, len(points))))
+            errors = project.Update([points[j] for j in wave])
+            for (j, error) in zip(wave, errors):
+                results[indices[j]] = {"system": label, "point": j, "status": "ok" if error is None else "error"}
+                if error is not None:
+                    results[indices[j]]["error"] = error
+            done += len(wave)
+            if progress is not None:
+                progress(done, len(cases))
+    return results
+
+# Register a sweep of profiles and angles on fake projects: a system per case,
+# as running the wizard for each case does, and as design points.
+def Benchmark(cases=60, workers=4, systemTime=0.05, valueTime=0.0005, updateTime=0.02):
+    import AirfoilStages
+    profiles = ("0012", "2412", "4412")
+    sweep = [dict(AirfoilStages.DEFAULTS, Naca=profiles[k % len(profiles)], Angle=float(k // len(profiles)))
+             for k in range(cases)]
+    allValues = len(CaseParameters(sweep[0]))
+    for label in ("system per case", "design points"):
+        project = FakeProject(systemTime, valueTime, updateTime)
+        start = default_timer()
+        if label == "system per case":
+            for case in sweep:
+                system = project.CreateSystem("FFF", SystemSettings(case))
+                project.AddDesignPoints(system, {}, [CaseParameters(case)])
+                project.Update(system["points"])
+        else:
+            results = RegisterCases(project, sweep, workers)
+        elapsed = default_timer() - start
+        stats = project.stats
+        print("%-16s %d cases in %.2f s, %d systems, %d values pushed (%d per case), %d updates" %
+              (label, cases, elapsed, stats["systems"], stats["values"], stats["values"]//cases,
+               stats["updates"]))
+    print("%d parameters per case, %d errors" % (allValues, sum(result["status"] != "ok" for result in results)))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:3]])
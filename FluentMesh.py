@@ -0,0 +1,81 @@
+# Fluent mesh files for the native meshers.
+#
+# Meshes are plain lists: nodes as (x, y) or (x, y, z) tuples, cells as node
+# index lists and faces per zone as (n0, n1, ..., c0, c1) tuples, with c1 -1 on
+# the boundary. Face nodes are ordered so that their right-hand normal points
+# into c0, as Fluent expects. Plain Python, so it also runs in the wizard.
+
+# Boundary zones of the airfoil domain: name, Fluent zone type and boundary
+# condition code.
+ZONES = (
+    ("airfoil", "wall", 3),
+    ("inlet", "velocity-inlet", 10),
+    ("outlet", "pressure-outlet", 5),
+    ("bottom", "symmetry", 7),
+    ("top", "symmetry", 7),
+    ("root", "symmetry", 7),
+    ("tip", "symmetry", 7),
+)
+
+# Fluent element types by cell node count and dimension.
+CELL_TYPES = {(3, 2): 1, (4, 2): 3, (4, 3): 2, (8, 3): 4}
+FACE_TYPES = {2: 2, 3: 3, 4: 4}
+
+# Faces of a quadrilateral (counter-clockwise) and of a hexahedron (bottom
+# quadrilateral counter-clockwise seen from above, then the top one), ordered
+# so that their right-hand normals point out of the cell.
+QUAD_FACES = ((0, 1), (1, 2), (2, 3), (3, 0))
+HEX_FACES = ((0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7))
+
+# Interior and boundary faces of cells, with the local faces of one cell in
+# template. Boundary faces are put in the zone zone(nodes of the face) names.
+def CellFaces(cells, template, zone):
+    found = {}
+    order = []
+    for (c, cell) in enumerate(cells):
+        for local in template:
+            face = [cell[k] for k in local]
+            key = tuple(sorted(face))
+            if key in found:
+                found[key][2] = c
+            else:
+                face.reverse()
+                found[key] = [face, c, -1]
+                order.append(key)
+    faces = {"interior": []}
+    for key in order:
+        (face, c0, c1) = found[key]
+        name = "interior" if c1 >= 0 else zone(face)
+        faces.setdefault(name, []).append(tuple(face) + (c0, c1))
+    return faces
+
+# Write the mesh as an ASCII Fluent mesh file.
+def WriteFluentMesh(path, nodes, cells, faces, title="Airfoil domain"):
+    dimension = len(nodes[0])
+    cellType = CELL_TYPES[(len(cells[0]), dimension)]
+    zones = [("interior", "interior", 2)] + [zone for zone in ZONES if faces.get(zone[0])]
+    with open(path, "w") as mesh:
+        mesh.write('(0 "%s, %dD")\n' % (title, dimension))
+        mesh.write("(2 %d)\n" % dimension)
+        mesh.write("(10 (0 1 %x 0 %d))\n" % (len(nodes), dimension))
+        mesh.write("(12 (0 1 %x 0))\n" % len(cells))
+        mesh.write("(13 (0 1 %x 0))\n" % sum(len(faces[zone[0]]) for zone in zones))
+        mesh.write("(10 (1 1 %x 1 %d)(\n" % (len(nodes), dimension))
+        line = " ".join(["%.12e"]*dimension) + "\n"
+        for node in nodes:
+            mesh.write(line % tuple(node))
+        mesh.write("))\n")
+        mesh.write("(12 (2 1 %x 1 %d))\n" % (len(cells), cellType))
+        first = 1
+        for (k, (name, kind, code)) in enumerate(zones):
+            zoneFaces = faces[name]
+            faceType = FACE_TYPES[len(zoneFaces[0]) - 2] if zoneFaces else 2
+            mesh.write("(13 (%x %x %x %x %x)(\n" % (k + 3, first, max(first, first + len(zoneFaces) - 1),
+                                                   code, faceType))
+            for face in zoneFaces:
+                mesh.write(" ".join("%x" % (n + 1) for n in face) + "\n")
+            mesh.write("))\n")
+            first += len(zoneFaces)
+        mesh.write("(45 (2 fluid fluid)())\n")
+        for (k, (name, kind, code)) in enumerate(zones):
+            mesh.write("(45 (%d %s %s)())\n" % (k + 3, kind, name))
@@ -0,0 +1,58 @@
+# Bounded least-recently-used cache.
+#
+# Used by the wizard to keep generated coordinates and snapshots of the
+# SpaceClaim bodies, keyed on the inputs that produced them, so that Back and
+# Delete navigation can restore geometry instead of rebuilding it. Get, Put
+# and Discard hold a lock, so a cache can be shared with the preview worker.
+
+import threading
+from collections import OrderedDict
+
+class LRUCache(object):
+    # onEvict(key, value) is called for every entry dropped to stay in maxSize.
+    def __init__(self, maxSize=16, onEvict=None):
+        self.maxSize = maxSize
+        self.onEvict = onEvict
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # Value stored for key, marking it as most recently used.
+    def Get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            value = self.entries.pop(key)
+            self.entries[key] = value
+            return value
+
+    # Store value for key and evict the least recently used entries.
+    def Put(self, key, value):
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                self.entries.pop(key)
+            self.entries[key] = value
+            while len(self.entries) > self.maxSize:
+                evicted.append(self.entries.popitem(last=False))
+        if self.onEvict is not None:
+            for (oldKey, oldValue) in evicted:
+                self.onEvict(oldKey, oldValue)
+
+    # Remove key, if present.
+    def Discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def Clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,461 @@
+# In-memory stand-in for SpaceClaim.
+#
+# MemoryBackend implements the CadBackend operations with numpy: the airfoil
+# is a polygon, the cut clips it, scale, rotate and transform move it, the
+# pull and the enclosure turn it into prisms and a box, and a loft into ruled
+# strips between sections. Faces carry normal, centroid and area, and named selections
+# are kept like SpaceClaim names them (GroupN).
+#
+# Run this file directly for a throughput benchmark of the wizard stages, a
+# comparison of the analytic and CAD trailing edge cuts and of the enclosure
+# naming against renumbering GroupN selections:
+#     python MemoryBackend.py [cases]
+
+import sys
+import copy
+import math
+import time
+import numpy as np
+
+from CadBackend import CadBackend
+
+class MemoryFace(object):
+    def __init__(self, normal, centroid, area, planar):
+        self.normal = normal
+        self.centroid = centroid
+        self.area = area
+        self.planar = planar
+
+# A planar region (outline with holes), extruded between z0 and z1 for solids.
+# Every hole is a body whose outline is cut out between its own z limits, or
+# all the way through for a planar hole. corners are the outline vertices
+# where one edge (a face, once extruded) ends and the next one starts.
+class MemoryBody(object):
+    def __init__(self, name, outline, corners=None, holes=None, span=None):
+        self.name = name
+        self.outline = np.asarray(outline, dtype=float)
+        self.corners = corners if corners is not None else list(range(len(self.outline)))
+        self.holes = holes or []
+        self.span = span
+
+    def Area(self):
+        area = abs(PolygonArea(self.outline))
+        for hole in self.holes:
+            if hole.span is None:
+                area -= abs(PolygonArea(hole.outline))
+        return area
+
+    def Volume(self):
+        if self.span is None:
+            return 0.0
+        volume = abs(PolygonArea(self.outline))*(self.span[1] - self.span[0])
+        for hole in self.holes:
+            if hole.span is None:
+                volume -= abs(PolygonArea(hole.outline))*(self.span[1] - self.span[0])
+            else:
+                volume -= hole.Volume()
+        return volume
+
+    # xmin, xmax, ymin, ymax of the outline.
+    def Bounds(self):
+        return (self.outline[:, 0].min(), self.outline[:, 0].max(),
+                self.outline[:, 1].min(), self.outline[:, 1].max())
+
+    # Outline at the root (end 0) or at the tip (end -1).
+    def EndOutline(self, end):
+        return self.outline
+
+    # Side faces between z0 and z1, with outward normals for sign 1.
+    def WallFaces(self, z0, z1, sign):
+        return SideFaces(self.outline, self.corners, z0, z1, sign)
+
+    def Faces(self):
+        if self.span is None:
+            centroid = np.append(self.outline.mean(axis=0), 0.0)
+            return [MemoryFace(np.array([0.0, 0.0, 1.0]), centroid, self.Area(), True)]
+        faces = []
+        for hole in self.holes:
+            (z0, z1) = hole.span or self.span
+            faces.extend(hole.WallFaces(z0, z1, -1.0))
+            if z1 < self.span[1]:
+                tip = hole.EndOutline(-1)
+                centroid = np.append(tip.mean(axis=0), z1)
+                faces.append(MemoryFace(np.array([0.0, 0.0, -1.0]), centroid, abs(PolygonArea(tip)), True))
+        if self.holes:
+            faces.extend(BoxFaces(self.Bounds(), self.span))
+        else:
+            faces.extend(self.WallFaces(self.span[0], self.span[1], 1.0))
+            faces.extend(CapFaces(self.EndOutline(0), self.EndOutline(-1), self.span))
+        return faces
+
+# A wing lofted through sections at increasing z, all with the same number of
+# points. The loft is approximated by ruled strips between neighbouring
+# sections, and each run of edges between two corners is one face over the
+# whole span, as the CAD loft makes it.
+class MemoryLoft(MemoryBody):
+    def __init__(self, name, sections, levels, corners=None):
+        self.sections = [np.asarray(section, dtype=float) for section in sections]
+        self.levels = list(levels)
+        MemoryBody.__init__(self, name, self.sections[0], corners, span=(self.levels[0], self.levels[-1]))
+
+    def Area(self):
+        return abs(PolygonArea(self.sections[0]))
+
+    def Volume(self):
+        areas = [abs(PolygonArea(section)) for section in self.sections]
+        return sum(0.5*(areas[k] + areas[k+1])*(self.levels[k+1] - self.levels[k])
+                   for k in range(len(areas) - 1))
+
+    def Bounds(self):
+        points = np.concatenate(self.sections)
+        return (points[:, 0].min(), points[:, 0].max(), points[:, 1].min(), points[:, 1].max())
+
+    def EndOutline(self, end):
+        return self.sections[end]
+
+    def WallFaces(self, z0, z1, sign):
+        strips = [SideFaces(0.5*(self.sections[k] + self.sections[k+1]), self.corners,
+                            self.levels[k], self.levels[k+1], sign) for k in range(len(self.sections) - 1)]
+        faces = []
+        for run in zip(*strips):
+            area = sum(face.area for face in run)
+            centroid = sum(face.centroid*face.area for face in run)/area
+            normal = sum(face.normal*face.area for face in run)
+            normal = normal/max(np.linalg.norm(normal), 1e-300)
+            planar = all(face.planar and np.allclose(face.normal, run[0].normal) for face in run)
+            faces.append(MemoryFace(normal, centroid, area, planar))
+        return faces
+
+# Side faces of a prism, one per run of edges between two corners. sign is 1
+# for outward normals of the outline, -1 for the walls of a hole.
+def SideFaces(polygon, corners, z0, z1, sign):
+    n = len(polygon)
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    corners = sorted(corners) or [0]
+    orientation = 1.0 if PolygonArea(polygon) > 0 else -1.0
+    faces = []
+    for k in range(len(corners)):
+        length = (corners[(k+1) % len(corners)] - corners[k]) % n or n
+        run = [(corners[k] + j) % n for j in range(length)]
+        runEdges = edges[run]
+        runLengths = lengths[run]
+        midpoints = polygon[run] + 0.5*runEdges
+        normals = sign*orientation*np.column_stack((runEdges[:, 1], -runEdges[:, 0]))
+        normal = normals.sum(axis=0)
+        normal = np.append(normal/max(np.hypot(normal[0], normal[1]), 1e-300), 0.0)
+        centroid = np.append((midpoints*runLengths[:, None]).sum(axis=0)/runLengths.sum(), 0.5*(z0 + z1))
+        faces.append(MemoryFace(normal, centroid, runLengths.sum()*(z1 - z0), len(run) == 1))
+    return faces
+
+# End caps of a prism or a loft, root and tip outlines.
+def CapFaces(root, tip, span):
+    return [MemoryFace(np.array([0.0, 0.0, -1.0]), np.append(root.mean(axis=0), span[0]),
+                       abs(PolygonArea(root)), True),
+            MemoryFace(np.array([0.0, 0.0, 1.0]), np.append(tip.mean(axis=0), span[1]),
+                       abs(PolygonArea(tip)), True)]
+
+# The six faces of a box enclosure, in the order SpaceClaim creates them.
+def BoxFaces(bounds, span):
+    (xmin, xmax, ymin, ymax) = bounds
+    (zmin, zmax) = span
+    center = np.array([0.5*(xmin + xmax), 0.5*(ymin + ymax), 0.5*(zmin + zmax)])
+    size = np.array([xmax - xmin, ymax - ymin, zmax - zmin])
+    faces = []
+    for (axis, side) in ((1, 1.0), (0, 1.0), (2, -1.0), (0, -1.0), (1, -1.0), (2, 1.0)):
+        normal = np.zeros(3)
+        normal[axis] = side
+        centroid = center.copy()
+        centroid[axis] += 0.5*side*size[axis]
+        area = np.prod(np.delete(size, axis))
+        faces.append(MemoryFace(normal, centroid, area, True))
+    return faces
+
+# Signed shoelace area of a closed polygon (counter-clockwise positive).
+def PolygonArea(polygon):
+    polygon = np.asarray(polygon, dtype=float)
+    x = polygon[:, 0]
+    y = polygon[:, 1]
+    return 0.5*np.sum(x*np.roll(y, -1) - np.roll(x, -1)*y)
+
+# Part of a polygon with x <= xCut (Sutherland-Hodgman against one plane).
+# Returns the clipped polygon and its corners: the corners that are kept and
+# the points where the cut crosses the outline.
+def ClipPolygon(polygon, xCut, corners=()):
+    polygon = np.asarray(polygon, dtype=float)
+    previous = np.roll(polygon, 1, axis=0)
+    inside = polygon[:, 0] <= xCut
+    crossing = inside != (previous[:, 0] <= xCut)
+    clipped = []
+    clippedCorners = []
+    for i in range(len(polygon)):
+        if crossing[i]:
+            (x0, y0) = previous[i]
+            (x1, y1) = polygon[i]
+            clippedCorners.append(len(clipped))
+            clipped.append((xCut, y0 + (xCut - x0)/(x1 - x0)*(y1 - y0)))
+        if inside[i]:
+            if i in corners:
+                clippedCorners.append(len(clipped))
+            clipped.append(tuple(polygon[i]))
+    return (np.array(clipped), clippedCorners)
+
+# Closed polygon through x,y, without repeated points.
+def ProfilePolygon(x, y):
+    points = np.column_stack((np.asarray(x, dtype=float), np.asarray(y, dtype=float)))
+    keep = np.any(np.abs(np.diff(points, axis=0)) > 1e-15, axis=1)
+    points = points[np.append(True, keep)]
+    if np.all(np.abs(points[0] - points[-1]) <= 1e-15):
+        points = points[:-1]
+    return points
+
+# Points per surface of the polygon of a sketched spline.
+SPLINE_POINTS = 200
+
+class MemoryBackend(CadBackend):
+    def __init__(self):
+        self.bodies = []
+        self.selections = []
+        self.curvesSuppressed = False
+        self.calls = {}
+
+    def _Call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # The airfoil (or fluid) body the operations apply to.
+    def Body(self):
+        return self.bodies[0]
+
+    def DeleteAll(self):
+        self._Call("DeleteAll")
+        self.bodies = []
+        self.selections = []
+        self.curvesSuppressed = False
+
+    def SketchAirfoil(self, x, y):
+        self._Call("SketchAirfoil")
+        self._Sketch(x, y)
+
+    # The curve is kept as a polygon through points of the spline.
+    def SketchSpline(self, spline):
+        self._Call("SketchSpline")
+        self._Sketch(*spline.Coordinates(SPLINE_POINTS))
+
+    def _Sketch(self, x, y):
+        polygon = ProfilePolygon(x, y)
+        corners = [0]
+        if (x[0], y[0]) != (x[-1], y[-1]):
+            corners.append(len(polygon) - 1)
+        self.bodies.append(MemoryBody("Surface", polygon, corners))
+
+    def CutTrailingEdge(self, xCut):
+        self._Call("CutTrailingEdge")
+        body = self.Body()
+        (body.outline, body.corners) = ClipPolygon(body.outline, xCut, body.corners)
+        body.name = "Surface1"
+
+    def SuppressCurves(self):
+        self._Call("SuppressCurves")
+        self.curvesSuppressed = True
+
+    def Scale(self, factor):
+        self._Call("Scale")
+        self.Body().outline = self.Body().outline*factor
+
+    def Rotate(self, centerX, centerY, angle):
+        self._Call("Rotate")
+        angle = math.radians(angle)
+        rotation = np.array([[math.cos(angle), -math.sin(angle)],
+                             [math.sin(angle), math.cos(angle)]])
+        center = np.array([centerX, centerY])
+        body = self.Body()
+        body.outline = (body.outline - center).dot(rotation.T) + center
+
+    def Transform(self, matrix):
+        self._Call("Transform")
+        matrix = np.asarray(matrix, dtype=float)
+        body = self.Body()
+        body.outline = body.outline.dot(matrix[:, :2].T) + matrix[:, 2]
+
+    def Extrude(self, span):
+        self._Call("Extrude")
+        self.Body().span = (0.0, span)
+
+    def LoftWing(self, sections):
+        self._Call("LoftWing")
+        outlines = []
+        for section in sections:
+            points = np.asarray(section, dtype=float)
+            outlines.append(ProfilePolygon(points[:, 0], points[:, 1]))
+        corners = [0]
+        if tuple(sections[0][0]) != tuple(sections[0][-1]):
+            corners.append(len(outlines[0]) - 1)
+        levels = [section[0][2] for section in sections]
+        self.bodies = [MemoryLoft("Solid", outlines, levels, corners)]
+
+    def DomainRectangle(self, left, right, down, up):
+        self._Call("DomainRectangle")
+        airfoil = self.Body()
+        rectangle = [(left, up), (left, down), (right, down), (right, up)]
+        self.bodies = [MemoryBody("Surface", rectangle, holes=[airfoil])]
+
+    def Enclosure(self, left, right, down, up, front):
+        self._Call("Enclosure")
+        wing = self.Body()
+        (xmin, xmax, ymin, ymax) = wing.Bounds()
+        box = [(xmin - left, ymax + up), (xmin - left, ymin - down),
+               (xmax + right, ymin - down), (xmax + right, ymax + up)]
+        span = (wing.span[0], wing.span[1] + front)
+        self.bodies = [MemoryBody("Enclosure", box, holes=[wing], span=span)]
+
+    def Faces(self):
+        return self.Body().Faces()
+
+    def FaceFrame(self, face):
+        self._Call("FaceFrame")
+        return (tuple(face.centroid), tuple(face.normal))
+
+    def CreateNamedSelection(self, faces, name=None):
+        self._Call("CreateNamedSelection")
+        if name is None:
+            names = set(selectionName for (selectionName, members) in self.selections)
+            number = 1
+            while "Group%d" % number in names:
+                number += 1
+            name = "Group%d" % number
+        self.selections.append((name, list(faces)))
+
+    def DeleteNamedSelection(self, name):
+        self._Call("DeleteNamedSelection")
+        self.selections = [s for s in self.selections if s[0] != name]
+
+    def RenameNamedSelection(self, name, newName):
+        self._Call("RenameNamedSelection")
+        self.selections = [(newName if s[0] == name else s[0], s[1]) for s in self.selections]
+
+    # Faces of a named selection.
+    def NamedSelection(self, name):
+        for (selectionName, faces) in self.selections:
+            if selectionName == name:
+                return faces
+        raise KeyError(name)
+
+    def Snapshot(self):
+        return copy.deepcopy((self.bodies, self.selections, self.curvesSuppressed))
+
+    def Restore(self, snapshot):
+        (self.bodies, self.selections, self.curvesSuppressed) = copy.deepcopy(snapshot)
+
+# Run the wizard stages on MemoryBackend for a number of cases.
+def Benchmark(cases=200):
+    import AirfoilStages
+    start = time.time()
+    for i in range(cases):
+        params = dict(AirfoilStages.DEFAULTS)
+        params["Naca"] = "%d4%02d" % (i % 7, 8 + i % 15)
+        params["Angle"] = float(i % 12)
+        params["Mode"] = "3D" if i % 2 else "2D"
+        cad = MemoryBackend()
+        AirfoilStages.BuildAirfoil(cad, params)
+        AirfoilStages.BuildScaleRotatePull(cad, params)
+        AirfoilStages.BuildDomainOrEnclosure(cad, params)
+    elapsed = time.time() - start
+    print("%d cases in %.3f s, %.1f cases/s" % (cases, elapsed, cases/elapsed))
+    return elapsed
+
+# Build the cut airfoil with the analytic and the CAD cut method and compare
+# time, backend calls and the resulting area.
+def CutBenchmark(cases=200):
+    import AirfoilStages
+    results = {}
+    for method in ("Analytic", "CAD"):
+        areas = []
+        start = time.time()
+        for i in range(cases):
+            params = dict(AirfoilStages.DEFAULTS)
+            params["Naca"] = "%d4%02d" % (i % 7, 8 + i % 15)
+            params["CutValue"] = 0.5 + i % 10
+            params["CutMethod"] = method
+            cad = MemoryBackend()
+            AirfoilStages.BuildAirfoil(cad, params)
+            areas.append(cad.Body().Area())
+        elapsed = time.time() - start
+        results[method] = (elapsed, cad.calls, np.array(areas))
+        print("%-8s cut: %d cases in %.3f s, %.1f cases/s, calls per case %s" %
+              (method, cases, elapsed, cases/elapsed, sorted(cad.calls.items())))
+    difference = np.abs(results["Analytic"][2] - results["CAD"][2])/results["CAD"][2]
+    print("max relative area difference %.2e" % difference.max())
+    return results
+
+# The enclosure naming the wizard used before NameEnclosureFaces: a selection
+# per face, renumbered assuming the wing has three faces, then the six sides
+# of the box in SpaceClaim order.
+def RenumberEnclosureFaces(cad):
+    faces = cad.Faces()
+    for face in faces:
+        cad.CreateNamedSelection([face])
+    for name in ("Group1", "Group2", "Group3"):
+        cad.DeleteNamedSelection(name)
+    for (name, newName) in (("Group5", "Outlet"), ("Group7", "Inlet"), ("Group4", "Symmetry1"),
+                            ("Group8", "Symmetry2"), ("Group6", "Symmetry3"), ("Group9", "Symmetry4")):
+        cad.RenameNamedSelection(name, newName)
+    cad.CreateNamedSelection(faces[0:3])
+    cad.RenameNamedSelection("Group1", "Airfoil")
+
+# Check that every box side selection is the one face of the box with its
+# normal, and that Airfoil is all the other faces.
+def SelectionErrors(cad):
+    import AirfoilStages
+    key = lambda face: tuple(face.centroid) + tuple(face.normal)
+    faces = cad.Faces()
+    sides = set()
+    errors = []
+    for ((axis, side), name) in AirfoilStages.ENCLOSURE_SIDES.items():
+        try:
+            selected = cad.NamedSelection(name)
+        except KeyError:
+            errors.append(name)
+            continue
+        if len(selected) != 1 or selected[0].normal[axis] != side:
+            errors.append(name)
+        sides.update(key(face) for face in selected)
+    try:
+        airfoil = set(key(face) for face in cad.NamedSelection("Airfoil"))
+    except KeyError:
+        airfoil = set()
+    if airfoil != set(key(face) for face in faces) - sides:
+        errors.append("Airfoil")
+    return errors
+
+# Name the enclosure faces of cut and uncut wings at several angles with both
+# methods and compare time, backend calls and mislabelled selections.
+def NamingBenchmark(cases=200):
+    import AirfoilStages
+    for (label, method) in (("renumber", RenumberEnclosureFaces), ("classify", AirfoilStages.NameEnclosureFaces)):
+        elapsed = 0.0
+        wrong = 0
+        calls = {}
+        for i in range(cases):
+            params = dict(AirfoilStages.DEFAULTS)
+            params["Mode"] = "3D"
+            params["Angle"] = float(i % 30) - 10.0
+            params["CutTE"] = "Yes" if i % 2 else "No"
+            cad = MemoryBackend()
+            AirfoilStages.BuildAirfoil(cad, params)
+            AirfoilStages.BuildScaleRotatePull(cad, params)
+            (LX, RX, DY, UY, FZ) = params["Enclosure"]
+            cad.Enclosure(LX, RX, DY, UY, FZ)
+            cad.calls = {}
+            start = time.time()
+            method(cad)
+            elapsed += time.time() - start
+            calls = cad.calls
+            if SelectionErrors(cad):
+                wrong += 1
+        print("%-8s: %d enclosures in %.4f s, %d mislabelled, calls per enclosure %s" %
+              (label, cases, elapsed, wrong, sorted(calls.items())))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:2]])
+    CutBenchmark(*[int(a) for a in sys.argv[1:2]])
+    NamingBenchmark(*[int(a) for a in sys.argv[1:2]])
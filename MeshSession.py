@@ -0,0 +1,384 @@
+# Long-lived meshing sessions.
+#
+# CreateMesh sends Mechanical a Python command string. Launching Mechanical for
+# every mesh costs far more than the mesh itself, so the strings go through a
+# SessionPool that keeps sessions open between jobs. A session is anything
+# with Open, Send(commands) and Close: MechanicalSession drives the Mesh
+# component of a Workbench system, FakeMechanicalSession runs the commands
+# against a stand-in of the Mechanical data model.
+#
+# Sessions are reused for jobs with the same key (the system name), closed
+# after maxJobs jobs or maxAge seconds, and evicted after idleTimeout seconds
+# unused, by a timer thread, with no further job needed. A job runs on the
+# calling thread; a watchdog flags one that runs for more than runTimeout
+# seconds, its session leaves the pool and is closed, and the job fails with
+# MeshTimeout. dispatch(function) runs evictions and these closes on the thread
+# of the sessions, the UI thread for Mechanical. Without it evictions run on
+# the timer thread and a timed-out session is closed when its job returns.
+# Jobs are run directly with Run or queued with Submit, which runs them on up
+# to size worker threads.
+#
+# Run this file directly to compare launch-per-mesh with a warm pool:
+#     python MeshSession.py [jobs]
+
+import sys
+import time
+import threading
+from timeit import default_timer
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+# Raised for a job that waited longer than its timeout.
+class MeshTimeout(Exception):
+    pass
+
+class MeshSession(object):
+    # Start the session.
+    def Open(self):
+        raise NotImplementedError
+
+    # Run a command string and return the reply.
+    def Send(self, commands):
+        raise NotImplementedError
+
+    # Stop the session.
+    def Close(self):
+        raise NotImplementedError
+
+# Mechanical, opened on the Mesh container of a Workbench system.
+class MechanicalSession(MeshSession):
+    def __init__(self, container):
+        self.container = container
+
+    def Open(self):
+        self.container.Refresh()
+        self.container.Edit()
+
+    # Refresh first, so that Mechanical picks up the current geometry.
+    def Send(self, commands):
+        self.container.Refresh()
+        return self.container.SendCommand(Language = "Python", Command = commands)
+
+    def Close(self):
+        self.container.Exit()
+
+class _FakeObject(object):
+    pass
+
+# Stand-in for Mechanical. The commands are executed against a fake ExtAPI
+# with a Mesh object; the reply is the state of the mesh after the commands.
+# startup and meshTime are the seconds spent in Open and in each mesh.Update().
+class FakeMechanicalSession(MeshSession):
+    def __init__(self, startup=0.0, meshTime=0.0):
+        self.startup = startup
+        self.meshTime = meshTime
+        self.api = None
+
+    def Open(self):
+        time.sleep(self.startup)
+        mesh = _FakeObject()
+        mesh.ElementSize = None
+        mesh.CaptureCurvature = False
+        mesh.CaptureProximity = False
+        mesh.Updates = 0
+        def Update():
+            time.sleep(self.meshTime)
+            mesh.Updates += 1
+        mesh.Update = Update
+        self.api = _FakeObject()
+        self.api.DataModel = _FakeObject()
+        self.api.DataModel.Project = _FakeObject()
+        self.api.DataModel.Project.Model = _FakeObject()
+        self.api.DataModel.Project.Model.Mesh = mesh
+
+    def Send(self, commands):
+        if self.api is None:
+            raise RuntimeError("session is not open")
+        namespace = {"ExtAPI": self.api, "Quantity": lambda value, unit: (value, unit)}
+        exec(commands, namespace)
+        mesh = self.api.DataModel.Project.Model.Mesh
+        return {"ElementSize": mesh.ElementSize, "CaptureCurvature": mesh.CaptureCurvature,
+                "CaptureProximity": mesh.CaptureProximity, "Updates": mesh.Updates}
+
+    def Close(self):
+        self.api = None
+
+# A queued job. Wait for its reply with Wait.
+class MeshJob(object):
+    def __init__(self, commands, key, deadline):
+        self.commands = commands
+        self.key = key
+        self.deadline = deadline
+        self.reply = None
+        self.error = None
+        self.done = threading.Event()
+
+    # Reply of the job. Raises the error of a failed job, or MeshTimeout if it
+    # is not done within timeout seconds.
+    def Wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise MeshTimeout("mesh job not done after %s s" % timeout)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+class _Slot(object):
+    def __init__(self, key, session, now):
+        self.key = key
+        self.session = session
+        self.opened = now
+        self.lastUsed = now
+        self.jobs = 0
+        self.abandoned = False
+
+class SessionPool(object):
+    def __init__(self, factory, size=1, maxJobs=None, maxAge=None, idleTimeout=None, runTimeout=None,
+                 dispatch=None, clock=default_timer):
+        self.factory = factory
+        self.size = size
+        self.maxJobs = maxJobs
+        self.maxAge = maxAge
+        self.idleTimeout = idleTimeout
+        self.runTimeout = runTimeout
+        self.dispatch = dispatch
+        self.clock = clock
+        self.idle = []
+        self.count = 0
+        self.condition = threading.Condition()
+        self.queue = Queue()
+        self.workers = []
+        self.timer = None
+        self.stats = {"opened": 0, "closed": 0, "jobs": 0, "failed": 0, "timeouts": 0}
+
+    def _Expired(self, slot, now):
+        return ((self.maxJobs is not None and slot.jobs >= self.maxJobs) or
+                (self.maxAge is not None and now - slot.opened >= self.maxAge))
+
+    def _Unused(self, slot, now):
+        return self.idleTimeout is not None and now - slot.lastUsed >= self.idleTimeout
+
+    def _Count(self, name, change=1):
+        with self.condition:
+            self.stats[name] += change
+
+    # Close a session. With release the pool may open another in its place.
+    def _Close(self, slot, release=True):
+        try:
+            slot.session.Close()
+        finally:
+            with self.condition:
+                self.stats["closed"] += 1
+                if release:
+                    self.count -= 1
+                    self.condition.notify()
+
+    # Close the sessions unused for idleTimeout or past their lifetime.
+    # Returns the number of sessions closed.
+    def EvictIdle(self):
+        now = self.clock()
+        with self.condition:
+            evicted = [slot for slot in self.idle if self._Unused(slot, now) or self._Expired(slot, now)]
+            self.idle = [slot for slot in self.idle if slot not in evicted]
+        for slot in evicted:
+            self._Close(slot)
+        return len(evicted)
+
+    # Run EvictIdle when the session unused longest reaches idleTimeout, on a
+    # daemon timer, as long as there are idle sessions.
+    def _ScheduleEviction(self):
+        with self.condition:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.idleTimeout is None or not self.idle:
+                return
+            delay = max(0.0, min(slot.lastUsed for slot in self.idle) + self.idleTimeout - self.clock())
+            self.timer = threading.Timer(delay, self._TimerEvict)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _TimerEvict(self):
+        if self.dispatch is None:
+            self._EvictAndSchedule()
+        else:
+            self.dispatch(self._EvictAndSchedule)
+
+    def _EvictAndSchedule(self):
+        self.EvictIdle()
+        self._ScheduleEviction()
+
+    # An open session for key: an idle one if there is one, else a new one,
+    # in place of the least recently used idle session if the pool is full.
+    def _Acquire(self, key):
+        self.EvictIdle()
+        replaced = None
+        with self.condition:
+            while True:
+                matching = [slot for slot in self.idle if slot.key == key]
+                if matching:
+                    slot = matching[-1]
+                    self.idle.remove(slot)
+                    return slot
+                if self.count < self.size:
+                    self.count += 1
+                    break
+                if self.idle:
+                    replaced = self.idle.pop(0)
+                    break
+                self.condition.wait()
+        try:
+            if replaced is not None:
+                self._Close(replaced, release=False)
+            session = self.factory(key)
+            session.Open()
+        except Exception:
+            with self.condition:
+                self.count -= 1
+                self.condition.notify()
+            raise
+        self._Count("opened")
+        return _Slot(key, session, self.clock())
+
+    # Return a session after a job. Failed and expired sessions are closed.
+    def _Release(self, slot, failed):
+        now = self.clock()
+        slot.jobs += 1
+        slot.lastUsed = now
+        if failed or self._Expired(slot, now):
+            self._Close(slot)
+        else:
+            with self.condition:
+                self.idle.append(slot)
+                self.condition.notify()
+            self._ScheduleEviction()
+
+    # Close a session that has left the pool, once.
+    def _Abandon(self, slot):
+        with self.condition:
+            if slot.abandoned:
+                return
+            slot.abandoned = True
+        self._Close(slot, release=False)
+
+    # Send commands to the session of slot on the calling thread. A watchdog
+    # flags a Send still running after timeout seconds: the session leaves the
+    # pool at once, so that another can open, and is closed through dispatch,
+    # which also ends a hung Send when the thread of the sessions gets to it,
+    # or else once the Send returns. The job then fails with MeshTimeout.
+    def _Send(self, slot, commands, timeout):
+        if timeout is None:
+            return slot.session.Send(commands)
+        state = {"done": False, "late": False}
+        def Expire():
+            with self.condition:
+                if state["done"]:
+                    return
+                state["late"] = True
+                self.stats["timeouts"] += 1
+                self.count -= 1
+                self.condition.notify()
+            if self.dispatch is not None:
+                self.dispatch(lambda: self._Abandon(slot))
+        def Finish():
+            watchdog.cancel()
+            with self.condition:
+                state["done"] = True
+            if state["late"]:
+                if self.dispatch is None:
+                    self._Abandon(slot)
+                raise MeshTimeout("mesh job ran for more than %s s" % timeout)
+        watchdog = threading.Timer(timeout, Expire)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            reply = slot.session.Send(commands)
+        except Exception:
+            Finish()
+            raise
+        Finish()
+        return reply
+
+    # Run a command string on a session for key and return the reply. Raises
+    # MeshTimeout if it runs for more than timeout seconds, runTimeout by
+    # default.
+    def Run(self, commands, key=None, timeout=None):
+        timeout = self.runTimeout if timeout is None else timeout
+        slot = self._Acquire(key)
+        try:
+            reply = self._Send(slot, commands, timeout)
+        except MeshTimeout:
+            self._Count("failed")
+            raise
+        except Exception:
+            self._Count("failed")
+            self._Release(slot, True)
+            raise
+        self._Count("jobs")
+        self._Release(slot, False)
+        return reply
+
+    # Queue a command string. A job still queued after timeout seconds fails
+    # with MeshTimeout instead of running.
+    def Submit(self, commands, key=None, timeout=None):
+        deadline = None if timeout is None else self.clock() + timeout
+        job = MeshJob(commands, key, deadline)
+        self.queue.put(job)
+        with self.condition:
+            if len(self.workers) < self.size:
+                worker = threading.Thread(target=self._Work)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+        return job
+
+    def _Work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            try:
+                if job.deadline is not None and self.clock() > job.deadline:
+                    raise MeshTimeout("mesh job expired in the queue")
+                job.reply = self.Run(job.commands, job.key)
+            except Exception as error:
+                job.error = error
+            job.done.set()
+
+    # Stop the workers once the queued jobs are done and close all sessions.
+    def Close(self):
+        with self.condition:
+            workers = self.workers
+            self.workers = []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        for worker in workers:
+            self.queue.put(None)
+        for worker in workers:
+            worker.join()
+        with self.condition:
+            idle = self.idle
+            self.idle = []
+        for slot in idle:
+            self._Close(slot)
+
+# Mesh jobs on fake sessions, launching a session per job and with a warm pool.
+def Benchmark(jobs=20, startup=0.2, meshTime=0.01, size=2):
+    commands = ("model = ExtAPI.DataModel.Project.Model\nmesh = model.Mesh\n"
+                "mesh.ElementSize = Quantity(0.08,'m')\nmesh.Update()\n")
+    factory = lambda key: FakeMechanicalSession(startup, meshTime)
+    for (label, maxJobs) in (("launch per mesh", 1), ("warm pool", None)):
+        pool = SessionPool(factory, size, maxJobs=maxJobs)
+        start = default_timer()
+        pending = [pool.Submit(commands, "FFF") for i in range(jobs)]
+        for job in pending:
+            job.Wait()
+        elapsed = default_timer() - start
+        pool.Close()
+        print("%-16s %d jobs in %.2f s, %.1f jobs/s, %d sessions opened" %
+              (label, jobs, elapsed, jobs/elapsed, pool.stats["opened"]))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:2]])
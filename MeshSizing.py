@@ -0,0 +1,266 @@
+# Local element sizes for the Mechanical mesh.
+#
+# A single global element size is either too coarse at the leading and
+# trailing edges or, made small enough for them, spends most cells in the far
+# field. AirfoilSizing derives local sizes from the posed airfoil coordinates
+# instead: the curvature and proximity sizes of the outline vertices
+# (TriMesh.OutlineSizes), as Capture Curvature and Capture Proximity give
+# them, from which come
+#
+#   - a face sizing on the airfoil (its edges in 2D, the Airfoil faces in 3D),
+#     wallCells elements around the outline,
+#   - a sphere of influence around every run of the outline that needs less
+#     than refine times that, such as the leading edge and a cut trailing edge
+#     (2D only, Capture Curvature refines them on the wing in 3D),
+#   - a body sizing of ElemSize, reached from the wall at the growth rate.
+#
+# PredictCells integrates the cells of the size field of the controls over the
+# domain, before any mesh is made: triangles in 2D and prisms over the depth of
+# the enclosure in 3D. Equilateral cells of the size undercount a real mesh, so
+# the count is scaled by CELL_FILL, calibrated against TriMesh. A lofted wing
+# is sized on its Geometry step profile. With a cell budget, FitBudget scales
+# all sizes to meet it. SizingCommands writes the controls as Mechanical
+# commands. Plain Python, so it runs in the wizard.
+#
+#     (controls, cells) = AirfoilSizing(params, budget=200000)
+#     commands += SizingCommands(controls)
+#
+# Run this file directly to compare the predicted cells of the local sizes
+# with a global size that resolves the airfoil as well:
+#     python MeshSizing.py [budget]
+
+import sys
+import math
+from timeit import default_timer
+
+from TriMesh import OutlineSizes, SizeField, AirfoilOutline
+import WingSections
+
+# Area of the triangle of unit side, as SweepRunner.EstimatedCells counts
+# cells.
+CELL_AREA = math.sqrt(3.0)/4.0
+
+# Cells of a mesh per equilateral cell of its size. TriMesh meshes of the
+# same size fields, NACA 4- and 5-digit domains of element sizes 0.08 to 0.3
+# m and growth 1.1 to 1.3, have 1.81 to 1.94 times the equilateral count (see
+# Benchmark). Mechanical meshes are not calibrated.
+CELL_FILL = 1.87
+
+# Runs of consecutive True flags of a closed outline, as lists of indices.
+def FlagRuns(flags):
+    if all(flags):
+        return [list(range(len(flags)))]
+    start = flags.index(False)
+    runs = []
+    run = []
+    for k in range(1, len(flags) + 1):
+        i = (start + k) % len(flags)
+        if flags[i]:
+            run.append(i)
+        elif run:
+            runs.append(run)
+            run = []
+    return runs
+
+# Sizing controls of an outline with its corners in the domain box (left,
+# right, down, up). depth is the depth of the enclosure in 3D, None in 2D.
+def SizingControls(outline, corners, box, elemSize, growth, depth=None, curvatureAngle=18.0, gapCells=3,
+                   wallCells=100, refine=0.5):
+    sizes = OutlineSizes(outline, corners, box, elemSize, curvatureAngle, gapCells)
+    n = len(outline)
+    perimeter = sum(math.hypot(outline[(i + 1) % n][0] - outline[i][0], outline[(i + 1) % n][1] - outline[i][1])
+                    for i in range(n))
+    wall = min(elemSize, perimeter/wallCells)
+    spheres = []
+    if depth is None:
+        for run in FlagRuns([h < refine*wall for h in sizes]):
+            i = min(run, key=lambda k: sizes[k])
+            (x, y) = outline[i]
+            radius = sizes[i] + max(math.hypot(outline[k][0] - x, outline[k][1] - y) for k in run)
+            spheres.append((x, y, radius, sizes[i]))
+    return {"outline": outline, "sizes": sizes, "box": tuple(box), "depth": depth, "far": elemSize,
+            "wall": wall, "growth": growth, "curvatureAngle": curvatureAngle, "spheres": spheres}
+
+# Controls with every size scaled by scale.
+def ScaledControls(controls, scale):
+    scaled = dict(controls)
+    scaled["sizes"] = [scale*h for h in controls["sizes"]]
+    scaled["far"] = scale*controls["far"]
+    scaled["wall"] = scale*controls["wall"]
+    scaled["spheres"] = [(x, y, radius, scale*size) for (x, y, radius, size) in controls["spheres"]]
+    return scaled
+
+# Element size at a point for the controls: the wall sizes, capped by the face
+# sizing, and the spheres, each grown by (growth - 1) per unit distance, up to
+# the far field size.
+class ControlField(object):
+    def __init__(self, controls):
+        wall = controls["wall"]
+        sources = [(x, y, min(h, wall)) for ((x, y), h) in zip(controls["outline"], controls["sizes"])]
+        self.field = SizeField(sources, controls["far"], controls["growth"])
+        self.slope = controls["growth"] - 1.0
+        self.spheres = controls["spheres"]
+
+    def __call__(self, x, y):
+        h = self.field(x, y)
+        for (cx, cy, radius, size) in self.spheres:
+            h = min(h, size + self.slope*max(0.0, math.hypot(x - cx, y - cy) - radius))
+        return h
+
+# Check if x,y is inside the outline.
+def InsideOutline(outline, x, y):
+    inside = False
+    (px, py) = outline[-1]
+    for (qx, qy) in outline:
+        if (qy > y) != (py > y) and x < px + (y - py)*(qx - px)/(qy - py):
+            inside = not inside
+        (px, py) = (qx, qy)
+    return inside
+
+# Predicted cells of the domain box outside the outline for the controls. The
+# box is split in quarters until the size changes by less than tolerance over
+# a part, and parts over the airfoil down to the size, and each part outside
+# the outline counts its area over the cell area at its center, times
+# CELL_FILL.
+def PredictCells(controls, tolerance=0.5):
+    field = ControlField(controls)
+    outline = controls["outline"]
+    far = controls["far"]
+    depth = controls["depth"]
+    xs = [x for (x, y) in outline]
+    ys = [y for (x, y) in outline]
+    (xmin, xmax, ymin, ymax) = (min(xs), max(xs), min(ys), max(ys))
+    (left, right, down, up) = controls["box"]
+    cells = 0.0
+    parts = [(left, down, right, up)]
+    while parts:
+        (x0, y0, x1, y1) = parts.pop()
+        (x, y) = (0.5*(x0 + x1), 0.5*(y0 + y1))
+        h = field(x, y)
+        airfoil = x0 <= xmax and xmin <= x1 and y0 <= ymax and ymin <= y1
+        if (airfoil and max(x1 - x0, y1 - y0) > h) or (
+                field.slope*0.5*math.hypot(x1 - x0, y1 - y0) > tolerance*h and not (
+                h >= far and all(field(cx, cy) >= far for (cx, cy) in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))))):
+            parts += [(x0, y0, x, y), (x, y0, x1, y), (x0, y, x, y1), (x, y, x1, y1)]
+            continue
+        if airfoil and InsideOutline(outline, x, y):
+            continue
+        if depth is None:
+            cells += (x1 - x0)*(y1 - y0)/(CELL_AREA*h*h)
+        else:
+            cells += (x1 - x0)*(y1 - y0)*depth/(CELL_AREA*h*h*h)
+    return CELL_FILL*cells
+
+# Controls scaled to give about budget cells, and their predicted cells.
+def FitBudget(controls, budget, iterations=5, tolerance=0.02):
+    power = 2.0 if controls["depth"] is None else 3.0
+    scale = 1.0
+    scaled = controls
+    cells = PredictCells(controls)
+    for k in range(iterations):
+        if abs(cells - budget) <= tolerance*budget:
+            break
+        scale *= (cells/float(budget))**(1.0/power)
+        scaled = ScaledControls(controls, scale)
+        cells = PredictCells(scaled)
+    return (scaled, cells)
+
+# Sizing controls of the wizard inputs (AirfoilStages parameters) and their
+# predicted cells, scaled to the budget if one is given.
+def AirfoilSizing(params, budget=None, **options):
+    (outline, corners) = AirfoilOutline(params)
+    depth = None
+    if params["Mode"] == "2D":
+        box = params["Domain"]
+    else:
+        if WingSections.Lofted(params):
+            (xmin, xmax, ymin, ymax) = WingSections.SectionBounds(WingSections.SectionOutlines(params))
+        else:
+            (xmin, xmax) = (min(x for (x, y) in outline), max(x for (x, y) in outline))
+            (ymin, ymax) = (min(y for (x, y) in outline), max(y for (x, y) in outline))
+        (LX, RX, DY, UY, FZ) = params["Enclosure"]
+        box = (xmin - LX, xmax + RX, ymin - DY, ymax + UY)
+        depth = params["WingSpan"] + FZ
+    controls = SizingControls(outline, corners, box, params["ElemSize"], params["Growth"], depth, **options)
+    if budget:
+        return FitBudget(controls, budget)
+    return (controls, PredictCells(controls))
+
+# Commands that locate the sizing on the geometry entities ids.
+def _Located(ids):
+    return ("sel = ExtAPI.SelectionManager.CreateSelectionInfo(SelectionTypeEnum.GeometryEntities)\n"
+            "sel.Ids = " + ids + "\n"
+            "sizing.Location = sel\n")
+
+# Mechanical commands for the controls, after "mesh = model.Mesh".
+def SizingCommands(controls):
+    commands = "mesh.ElementSize = Quantity(%r,'m')\n" % controls["far"]
+    commands += "mesh.GrowthRate = %r\n" % controls["growth"]
+    commands += "mesh.CaptureCurvature = True\n"
+    commands += "mesh.CurvatureNormalAngle = Quantity(%r,'deg')\n" % controls["curvatureAngle"]
+    commands += "mesh.CaptureProximity = True\n"
+    commands += "bodies = [body.Id for part in ExtAPI.DataModel.GeoData.Assemblies[0].Parts for body in part.Bodies]\n"
+
+    # Far field: the fluid body.
+    commands += "sizing = mesh.AddSizing()\n"
+    commands += _Located("bodies")
+    commands += "sizing.ElementSize = Quantity(%r,'m')\n" % controls["far"]
+
+    # Wall: the airfoil faces in 3D, the edges off the domain box in 2D.
+    commands += "sizing = mesh.AddSizing()\n"
+    if controls["depth"] is not None:
+        commands += "sizing.Location = [selection for selection in model.NamedSelections.Children if selection.Name == 'Airfoil'][0]\n"
+    else:
+        (left, right, down, up) = controls["box"]
+        margin = 1e-6*max(right - left, up - down)
+        commands += ("edges = [edge.Id for part in ExtAPI.DataModel.GeoData.Assemblies[0].Parts for body in part.Bodies "
+                     "for edge in body.Edges if %r < edge.Centroid[0] < %r and %r < edge.Centroid[1] < %r]\n" %
+                     (left + margin, right - margin, down + margin, up - margin))
+        commands += _Located("edges")
+    commands += "sizing.ElementSize = Quantity(%r,'m')\n" % controls["wall"]
+
+    # Leading and trailing edges.
+    for (x, y, radius, size) in controls["spheres"]:
+        commands += "center = model.CoordinateSystems.AddCoordinateSystem()\n"
+        commands += "center.OriginX = Quantity(%r,'m')\n" % x
+        commands += "center.OriginY = Quantity(%r,'m')\n" % y
+        commands += "sizing = mesh.AddSizing()\n"
+        commands += _Located("bodies")
+        commands += "sizing.Type = SizingType.SphereOfInfluence\n"
+        commands += "sizing.SphereCenter = center\n"
+        commands += "sizing.SphereRadius = Quantity(%r,'m')\n" % radius
+        commands += "sizing.ElementSize = Quantity(%r,'m')\n" % size
+    return commands
+
+# Predicted cells of the wizard domains with local sizes, with a global size
+# as small as their face sizing, and scaled to a budget. In 2D, the local
+# sizes without the spheres are also meshed by TriMesh, as a check of the
+# prediction.
+def Benchmark(budget=100000):
+    import AirfoilStages
+    from TriMesh import MeshDomain
+    for (mode, naca, cut) in (("2D", "0012", "No"), ("2D", "2412", "Yes"), ("3D", "2412", "Yes")):
+        params = dict(AirfoilStages.DEFAULTS, Mode=mode, Naca=naca, CutTE=cut, Angle=5.0)
+        start = default_timer()
+        (controls, cells) = AirfoilSizing(params)
+        elapsed = default_timer() - start
+        uniform = dict(controls, far=controls["wall"], spheres=[])
+        print("%s %s cut %-3s wall %.4f m, far %.3f m, %d spheres (%s): %.0f cells in %.3f s, "
+              "%.0f with a global %.4f m" % (mode, naca, cut, controls["wall"], controls["far"],
+                                            len(controls["spheres"]),
+                                            ", ".join("%.4f m" % size for (x, y, r, size) in controls["spheres"]),
+                                            cells, elapsed, PredictCells(uniform), controls["wall"]))
+        start = default_timer()
+        (scaled, fitted) = AirfoilSizing(params, budget)
+        print("    budget %d: %.0f cells, wall %.4f m, far %.3f m, fitted in %.3f s" %
+              (budget, fitted, scaled["wall"], scaled["far"], default_timer() - start))
+        if mode == "2D":
+            plain = dict(controls, spheres=[])
+            corners = AirfoilOutline(params)[1]
+            (nodes, triangles, faces) = MeshDomain(controls["outline"], corners, controls["box"], controls["far"],
+                                                   controls["growth"], wallSize=controls["wall"])
+            print("    without spheres: %.0f cells predicted, %d meshed by TriMesh (x%.2f)" %
+                  (PredictCells(plain), len(triangles), len(triangles)/PredictCells(plain)))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:2]])
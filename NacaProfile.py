@@ -0,0 +1,151 @@
+# Scalar NACA 4-digit and 5-digit profile helpers.
+#
+# These are plain Python (no numpy) so they can be used from the wizard script
+# inside SpaceClaim as well as from headless tools. CreateAirfoil is the
+# wizard's NACA 4-digit profile; the array engine in AirfoilEngine.py is checked
+# and benchmarked against it. Naca4Scalar gives the same output from
+# Naca4Surfaces, and ProfileScalar and ProfileTruncated lay out any profile
+# given by its surfaces the same way.
+
+import math
+
+# Convert a 4 digit Naca code to max camber, max camber location and thickness.
+def Naca4Digits(Naca):
+    max_camb = float(Naca[0])/100.0
+    max_camb_loc = float(Naca[1])/10.0
+    thick_perc = float(Naca[2:4])/100.0
+    return (max_camb, max_camb_loc, thick_perc)
+
+# Calculate airfoil thickness for NACA 4-digit series and returns x,y coords.
+def CreateAirfoil(m,p,t,x):
+    thickness = [0 for i in range(0,len(x),1)]
+    for i in range(0,len(x),1):
+        thickness[i] = t / 0.20 * (0.29690 * math.sqrt(x[i]) - 0.12600 * x[i] - 0.35160 *
+        math.pow(x[i], 2) + 0.28430 * math.pow(x[i], 3) - 0.10360 *
+        math.pow(x[i], 4))
+
+    fwd_x = [i for i in x if i<p]
+    aft_x =[i for i in x if i>=p]
+
+    if 0<p<1 and 0<m<1:
+        fwd_camber =  [0 for i in range(0,len(fwd_x),1)]
+        aft_camber =  [0 for i in range(0,len(aft_x),1)]
+        for i in range(0,len(fwd_x),1):
+            fwd_camber[i] = m / p**2 * (2 * p * fwd_x[i] - math.pow(fwd_x[i], 2))
+        for i in range(0,len(aft_x),1):
+            aft_camber[i] = m / (1 - p)**2 * ((1 - 2 * p) + 2 * p * aft_x[i] -math.pow(aft_x[i], 2))
+
+        camber = fwd_camber + aft_camber
+    else:
+        camber = [0 for i in range(0,len(x),1)]
+
+    y_upper = [camber[i]+thickness[i] for i in range(len(thickness))]
+    y_lower = [camber[i]-thickness[i] for i in range(len(thickness))]
+
+    x_upper = x[::-1]
+    x_lower = x[0:]
+
+    y_upper = y_upper[::-1]
+    y_lower = y_lower[0:]
+
+    x = x_upper + x_lower
+    y = y_upper + y_lower
+
+    y [0] = 0.0
+    y[-1] = 0.0
+    return (x, y)
+
+# Half thickness of the profile at chord station x.
+def Naca4Thickness(t, x):
+    return t / 0.20 * (0.29690 * math.sqrt(x) - 0.12600 * x - 0.35160 *
+    math.pow(x, 2) + 0.28430 * math.pow(x, 3) - 0.10360 *
+    math.pow(x, 4))
+
+# Camber line of the profile at chord station x.
+def Naca4Camber(m, p, x):
+    if not (0<p<1 and 0<m<1):
+        return 0.0
+    if x < p:
+        return m / p**2 * (2 * p * x - math.pow(x, 2))
+    return m / (1 - p)**2 * ((1 - 2 * p) + 2 * p * x - math.pow(x, 2))
+
+# Upper and lower surface ordinates at chord station x.
+def Naca4Surfaces(m, p, t, x):
+    camber = Naca4Camber(m, p, x)
+    thickness = Naca4Thickness(t, x)
+    return (camber + thickness, camber - thickness)
+
+# Mean line constants of the NACA 5-digit profiles, by the digit of the
+# location of maximum camber, for a design lift coefficient of 0.3: r and k1
+# of the standard mean lines, and r, k1 and k2/k1 of the reflexed ones.
+NACA5_STANDARD = {1: (0.0580, 361.400), 2: (0.1260, 51.640), 3: (0.2025, 15.957),
+                  4: (0.2900, 6.643), 5: (0.3910, 3.230)}
+NACA5_REFLEXED = {2: (0.1300, 51.990, 0.000764), 3: (0.2170, 15.793, 0.00677),
+                  4: (0.3180, 6.520, 0.0303), 5: (0.4410, 3.191, 0.1355)}
+
+# Convert a 5 digit Naca code to the mean line constants k1, r and k2/k1, k1
+# scaled to the design lift coefficient of the first digit, and thickness.
+def Naca5Digits(Naca):
+    location = int(Naca[1])
+    if Naca[2] == "1":
+        (r, k1, k21) = NACA5_REFLEXED[location]
+    else:
+        (r, k1) = NACA5_STANDARD[location]
+        k21 = 0.0
+    design_lift = 0.15*float(Naca[0])
+    thick_perc = float(Naca[3:5])/100.0
+    return (k1*design_lift/0.3, r, k21, thick_perc)
+
+# Camber line of the 5-digit profile at chord station x. With k21 = 0 this is
+# the standard mean line.
+def Naca5Camber(k1, r, k21, x):
+    if x < r:
+        return k1 / 6.0 * (math.pow(x - r, 3) - k21 * math.pow(1 - r, 3) * x - r**3 * x + r**3)
+    return k1 / 6.0 * (k21 * math.pow(x - r, 3) - k21 * math.pow(1 - r, 3) * x - r**3 * x + r**3)
+
+# Upper and lower surface ordinates of the 5-digit profile at chord station
+# x, with the 4-digit thickness.
+def Naca5Surfaces(k1, r, k21, t, x):
+    camber = Naca5Camber(k1, r, k21, x)
+    thickness = Naca4Thickness(t, x)
+    return (camber + thickness, camber - thickness)
+
+# Same output as CreateAirfoil: upper surface from TE to LE followed by the
+# lower surface from LE to TE, with y[0] = y[-1] = 0 (closed trailing edge).
+def Naca4Scalar(m, p, t, x):
+    return ProfileScalar(lambda xi: Naca4Surfaces(m, p, t, xi), x)
+
+# Profile cut at chord station xCut, as the CAD split leaves it: the stations
+# aft of xCut are dropped and both surfaces end exactly at xCut. The profile
+# is open, from the upper to the lower end of the cut.
+def Naca4Truncated(m, p, t, x, xCut):
+    return ProfileTruncated(lambda xi: Naca4Surfaces(m, p, t, xi), x, xCut)
+
+# Naca4Scalar for any profile given by its surfaces. An open (blunt) trailing
+# edge is kept as it is.
+def ProfileScalar(surfaces, x, closed=True):
+    y_upper = []
+    y_lower = []
+    for xi in x:
+        (yu, yl) = surfaces(xi)
+        y_upper.append(yu)
+        y_lower.append(yl)
+
+    x = list(x[::-1]) + list(x)
+    y = y_upper[::-1] + y_lower
+
+    if closed:
+        y[0] = 0.0
+        y[-1] = 0.0
+    return (x, y)
+
+# Naca4Truncated for any profile given by its surfaces.
+def ProfileTruncated(surfaces, x, xCut):
+    stations = [xi for xi in x if xi < xCut - 1e-12] + [xCut]
+    y_upper = []
+    y_lower = []
+    for xi in stations:
+        (yu, yl) = surfaces(xi)
+        y_upper.append(yu)
+        y_lower.append(yl)
+    return (stations[::-1] + stations, y_upper[::-1] + y_lower)
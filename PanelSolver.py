@@ -0,0 +1,214 @@
+# Inviscid aerodynamics of the airfoil coordinates, for screening sweeps.
+#
+# PanelVelocities solves the linear strength vortex panel method (Kuethe and
+# Chow) on a profile in the CreateAirfoil layout, one panel between each pair
+# of consecutive points, with the Kutta condition at the trailing edge, for the
+# freestream along and across the chord. The solution at any angle of attack is
+# their superposition, so PanelCoefficients gives Cl, Cm about the quarter
+# chord and the Cp distribution for many angles of one profile at the cost of
+# one solve. Profiles are solved one at a time: the influence matrices take
+# most of the time, and building those of many profiles in one numpy pass was
+# no faster, as its arrays outgrow the cache. ThinAirfoil gives Cl and Cm in
+# closed form from the camber line alone, for a cheaper first pass.
+#
+# Angles are in degrees, positive nose up, as the Angle of the Extra
+# Definitions step. Coefficients are per unit chord. A trailing edge cut on
+# the coordinates is left open, with no panel across it.
+#
+# Runs headless (CPython + numpy), it is not imported by the wizard script.
+# SweepAerodynamics computes the coefficients of the cases of a sweep, for
+# SweepRunner to rank and prune them before any CAD or meshing work. Run this
+# file directly to benchmark it:
+#     python PanelSolver.py [airfoils] [points]
+
+import sys
+import math
+from timeit import default_timer
+import numpy as np
+
+from AirfoilStages import PROFILE_INPUTS
+
+# Geometry of the panels of a profile, x, y from the first point to the
+# last: start points, panel angles, lengths and control points (panel
+# middles). A point repeating the previous one, as the leading edge of the
+# CreateAirfoil layout does, gives no panel.
+def PanelGeometry(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = (np.diff(x) != 0.0) | (np.diff(y) != 0.0)
+    (x, y) = (x[keep], y[keep])
+    (dx, dy) = (np.diff(x), np.diff(y))
+    return (x[:-1], y[:-1], np.arctan2(dy, dx), np.hypot(dx, dy), x[:-1] + 0.5*dx, y[:-1] + 0.5*dy)
+
+# Normal and tangential influence matrices of a panel geometry, shape
+# (panels + 1, panels + 1) and (panels, panels + 1), with the Kutta condition
+# as the last row of the normal one.
+def InfluenceMatrices(geometry):
+    (x, y, theta, s, xm, ym) = geometry
+    n = len(x)
+    dx = xm[:, None] - x[None, :]
+    dy = ym[:, None] - y[None, :]
+    # Sines and cosines of the angle differences, from those of the angles.
+    (si, ci) = (np.sin(theta)[:, None], np.cos(theta)[:, None])
+    (sj, cj) = (np.sin(theta)[None, :], np.cos(theta)[None, :])
+    (s2j, c2j) = (2.0*sj*cj, cj*cj - sj*sj)
+    sj2 = si*c2j - ci*s2j
+    cj2 = ci*c2j + si*s2j
+    a = -dx*cj - dy*sj
+    b = dx*dx + dy*dy
+    c = si*cj - ci*sj
+    d = ci*cj + si*sj
+    e = dx*sj - dy*cj
+    length = s[None, :]
+    f = np.log1p(length*(length + 2.0*a)/b)
+    g = np.arctan2(e*length, b + a*length)
+    p = dx*sj2 + dy*cj2
+    q = dx*cj2 - dy*sj2
+    cn2 = d + (0.5*q*f - (a*c + d*e)*g)/length
+    cn1 = 0.5*d*f + c*g - cn2
+    ct2 = c + (0.5*p*f + (a*d - c*e)*g)/length
+    ct1 = 0.5*c*f - d*g - ct2
+    diagonal = np.arange(n)
+    (cn1[diagonal, diagonal], cn2[diagonal, diagonal]) = (-1.0, 1.0)
+    (ct1[diagonal, diagonal], ct2[diagonal, diagonal]) = (0.5*math.pi, 0.5*math.pi)
+
+    normal = np.zeros((n + 1, n + 1))
+    normal[:n, :n] = cn1
+    normal[:n, 1:] += cn2
+    normal[n, 0] = 1.0
+    normal[n, n] = 1.0
+    tangential = np.zeros((n, n + 1))
+    tangential[:, :n] = ct1
+    tangential[:, 1:] += ct2
+    return (normal, tangential)
+
+# Panel geometry and surface velocities (per unit freestream) of a profile in
+# the CreateAirfoil layout, shape (panels, 2), for the freestream along the
+# chord and across it.
+def PanelVelocities(x, y):
+    # The panel method runs clockwise, from the trailing edge along the lower
+    # surface.
+    geometry = PanelGeometry(np.asarray(x, dtype=float)[::-1], np.asarray(y, dtype=float)[::-1])
+    (normal, tangential) = InfluenceMatrices(geometry)
+    theta = geometry[2]
+    n = len(theta)
+    rhs = np.zeros((n + 1, 2))
+    rhs[:n, 0] = np.sin(theta)
+    rhs[:n, 1] = -np.cos(theta)
+    velocities = tangential.dot(np.linalg.solve(normal, rhs))
+    velocities[:, 0] += np.cos(theta)
+    velocities[:, 1] += np.sin(theta)
+    return (geometry, velocities)
+
+# Cl, Cm about the quarter chord and Cp at the control points of the panels
+# at the angles of attack, from PanelVelocities. Cp has shape (angles,
+# panels).
+def PanelCoefficients(geometry, velocities, angles):
+    (x, y, theta, s, xm, ym) = geometry
+    alpha = np.radians(np.atleast_1d(np.asarray(angles, dtype=float)))
+    v = np.cos(alpha)[:, None]*velocities[None, :, 0] + np.sin(alpha)[:, None]*velocities[None, :, 1]
+    cp = 1.0 - v*v
+    # Pressure force on every panel, along the inward normal.
+    fx = cp.dot(s*np.sin(theta))
+    fy = -cp.dot(s*np.cos(theta))
+    cl = fy*np.cos(alpha) - fx*np.sin(alpha)
+    cm = cp.dot(s*((xm - 0.25)*np.cos(theta) + ym*np.sin(theta)))
+    return (cl, cm, cp)
+
+# Cl, Cm and Cp of a profile in the CreateAirfoil layout at the angles.
+def PanelSolve(x, y, angles):
+    (geometry, velocities) = PanelVelocities(x, y)
+    return PanelCoefficients(geometry, velocities, angles)
+
+# Cl and Cm about the quarter chord of thin airfoil theory at the angles of
+# attack, from the camber line of profiles in the CreateAirfoil layout,
+# sampled at stations cosine spaced from the leading to the trailing edge. A
+# cut profile is solved over its shorter chord, and its coefficients brought
+# back to the unit chord.
+def ThinAirfoil(xs, ys, angles, stations=64):
+    ys = np.atleast_2d(np.asarray(ys, dtype=float))
+    xs = np.broadcast_to(np.asarray(xs, dtype=float), ys.shape)
+    theta = np.linspace(0.0, math.pi, stations + 1)
+    at = 0.5*(1.0 - np.cos(theta))
+    camber = np.empty((len(ys), len(at)))
+    (start, chord) = (xs.min(axis=1), xs.max(axis=1) - xs.min(axis=1))
+    for (k, (x, y)) in enumerate(zip(xs, ys)):
+        le = int(np.argmin(x))
+        stationsX = start[k] + chord[k]*at
+        upper = np.interp(stationsX, x[le::-1], y[le::-1])
+        lower = np.interp(stationsX, x[le:], y[le:])
+        camber[k] = 0.5*(upper + lower)/chord[k]
+    slope = np.diff(camber, axis=1)/np.diff(at)
+    middle = 0.5*(theta[1:] + theta[:-1])
+    weights = np.diff(theta)
+    a0 = -(slope*weights).sum(axis=1)/math.pi
+    a1 = 2.0/math.pi*(slope*np.cos(middle)*weights).sum(axis=1)
+    a2 = 2.0/math.pi*(slope*np.cos(2.0*middle)*weights).sum(axis=1)
+    alpha = np.radians(np.atleast_2d(np.asarray(angles, dtype=float)))
+    cl = math.pi*(2.0*(alpha + a0[:, None]) + a1[:, None])
+    cm = 0.25*math.pi*(a2 - a1)[:, None]
+    # Lift acts at the quarter of the profile chord, behind the quarter of the
+    # unit chord if it is cut.
+    quarter = (start + 0.25*chord - 0.25)[:, None]
+    return (cl*chord[:, None], cm*chord[:, None]**2 - cl*chord[:, None]*quarter)
+
+# Cl and Cm of the cases of a sweep at their Angle, by "panel" or "thin"
+# airfoil theory, as {"Cl": .., "Cm": ..} per case, or None for lofted wings
+# and for cases whose profile fails its checks (AirfoilValidation reports
+# them). Cases with the same profile share one solve, at all their angles.
+def SweepAerodynamics(cases, method="panel"):
+    import AirfoilStages
+    import AirfoilValidation
+    import WingSections
+    if method not in ("panel", "thin"):
+        raise ValueError("Unknown screening method " + method)
+    profiles = {}
+    for (k, case) in enumerate(cases):
+        if not WingSections.Lofted(case):
+            key = tuple(str(case[name]) for name in PROFILE_INPUTS)
+            profiles.setdefault(key, []).append(k)
+
+    found = [None]*len(cases)
+    for (key, indices) in profiles.items():
+        case = cases[indices[0]]
+        if AirfoilValidation.Validate(case, "Airfoil"):
+            continue
+        (x, y) = AirfoilStages.AirfoilCoordinates(case)
+        angles = [cases[k]["Angle"] for k in indices]
+        if method == "panel":
+            (cl, cm, cp) = PanelSolve(x, y, angles)
+        else:
+            (cl, cm) = [values[0] for values in ThinAirfoil(x, y, angles)]
+        for (column, k) in enumerate(indices):
+            found[k] = {"Cl": float(cl[column]), "Cm": float(cm[column])}
+    return found
+
+# Time the panel method on NACA 4-digit profiles, each at several angles,
+# against thin airfoil theory, and compare them at 4 degrees.
+def Benchmark(airfoils=64, points=101):
+    from AirfoilEngine import Naca4Batch
+    codes = ["%d%d%02d" % (k % 7, 2 + k % 5, 8 + k % 13) for k in range(airfoils)]
+    x = 0.5*(1.0 - np.cos(np.linspace(0.0, math.pi, points)))
+    (xs, ys) = Naca4Batch(codes, x)
+    xs = np.delete(xs, points)
+    ys = np.delete(ys, points, axis=1)
+    angles = np.linspace(-4.0, 12.0, 9)
+
+    start = default_timer()
+    panel = [PanelSolve(xs, ys[k], angles) for k in range(airfoils)]
+    panelTime = default_timer() - start
+    start = default_timer()
+    (thinCl, thinCm) = ThinAirfoil(xs, ys, angles)
+    thinTime = default_timer() - start
+
+    print("airfoils %d, panels %d, angles %d" % (airfoils, len(xs) - 1, len(angles)))
+    print("panel method  %.2f ms per airfoil" % (1e3*panelTime/airfoils))
+    print("thin airfoil  %.3f ms per airfoil" % (1e3*thinTime/airfoils))
+    at = list(angles).index(4.0)
+    for k in range(min(airfoils, 5)):
+        print("NACA %s at %g deg: panel Cl %.3f Cm %.4f, thin Cl %.3f Cm %.4f" %
+              (codes[k], angles[at], panel[k][0][at], panel[k][1][at], thinCl[k, at], thinCm[k, at]))
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,254 @@
+# Background preview builds, debounced and cancellable.
+#
+# A preview is split in two. prepare(check) does the work that does not touch
+# the document, e.g. validating the inputs and computing the coordinates, on
+# a worker thread. apply(prepared) builds the geometry on the thread of the
+# CAD API, through dispatch. Submit returns at once, so the callback that
+# asks for a preview does not block the UI.
+#
+# Requests are debounced: the worker starts on a request only once no newer
+# one came for delay seconds. A newer request cancels the older ones: a
+# running prepare stops at its next check(), and a prepared request that is
+# no longer the newest is never applied, so quick changes build the document
+# once, with the final inputs. Cancel drops all requests, before the document
+# is changed directly.
+#
+# The latency of every applied preview, from Submit to the end of apply, is
+# kept in latencies.
+#
+#     worker = PreviewWorker(dispatch, delay=0.2)
+#     job = worker.Submit(prepare, apply, "Airfoil")
+#
+# Run this file directly to compare previews built in the callback with the
+# worker, over a burst of edits:
+#     python PreviewWorker.py [edits] [interval]
+
+import sys
+import time
+import threading
+from timeit import default_timer
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+# Raised by check() in the prepare of a cancelled request.
+class PreviewCancelled(Exception):
+    pass
+
+# A preview request. Wait for it with Wait.
+class PreviewJob(object):
+    def __init__(self, name, prepare, apply, requested):
+        self.name = name
+        self.prepare = prepare
+        self.apply = apply
+        self.requested = requested
+        self.prepared = None
+        self.error = None
+        self.latency = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    # Raise PreviewCancelled if a newer request superseded this one.
+    def Check(self):
+        if self.cancelled.is_set():
+            raise PreviewCancelled(self.name)
+
+    # True if the request was applied within timeout seconds.
+    def Wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.latency is not None
+
+class PreviewWorker(object):
+    # dispatch(function) runs function on the thread of the CAD API; by
+    # default apply runs on the worker thread.
+    def __init__(self, dispatch=None, delay=0.2, clock=default_timer):
+        self.dispatch = dispatch
+        self.delay = delay
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.newest = None
+        self.pending = None
+        self.thread = None
+        self.closed = False
+        self.latencies = []
+        self.stats = {"submitted": 0, "cancelled": 0, "applied": 0, "failed": 0}
+
+    def _Cancel(self, job):
+        if job is not None and not job.done.is_set():
+            job.cancelled.set()
+            job.done.set()
+            self.stats["cancelled"] += 1
+
+    # Queue a preview, cancelling the older ones.
+    def Submit(self, prepare, apply, name="Preview"):
+        job = PreviewJob(name, prepare, apply, self.clock())
+        with self.condition:
+            self._Cancel(self.newest)
+            self.newest = job
+            self.pending = job
+            self.stats["submitted"] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._Work)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+        return job
+
+    # Drop the queued and running previews.
+    def Cancel(self):
+        with self.condition:
+            self._Cancel(self.newest)
+            self.newest = None
+            self.pending = None
+            self.condition.notify()
+
+    # Next request to prepare, once delay seconds passed without a newer one,
+    # or None when the worker is closed.
+    def _Next(self):
+        with self.condition:
+            while not self.closed:
+                job = self.pending
+                if job is None:
+                    self.condition.wait()
+                    continue
+                remaining = job.requested + self.delay - self.clock()
+                if remaining <= 0.0:
+                    self.pending = None
+                    return job
+                self.condition.wait(remaining)
+        return None
+
+    def _Work(self):
+        while True:
+            job = self._Next()
+            if job is None:
+                return
+            try:
+                job.prepared = job.prepare(job.Check)
+                job.Check()
+            except PreviewCancelled:
+                continue
+            except Exception as error:
+                self._Failed(job, error)
+                continue
+            if self.dispatch is None:
+                self._Apply(job)
+            else:
+                self.dispatch(lambda job=job: self._Apply(job))
+
+    def _Failed(self, job, error):
+        job.error = error
+        with self.condition:
+            self.stats["failed"] += 1
+        print("%s preview failed: %s" % (job.name, error))
+        job.done.set()
+
+    # Apply a prepared request, on the thread of the API, if it is still the
+    # newest one.
+    def _Apply(self, job):
+        with self.condition:
+            if job.cancelled.is_set() or job is not self.newest:
+                return
+        try:
+            job.apply(job.prepared)
+        except Exception as error:
+            self._Failed(job, error)
+            return
+        job.latency = self.clock() - job.requested
+        with self.condition:
+            self.latencies.append(job.latency)
+            self.stats["applied"] += 1
+        job.done.set()
+
+    # Stop the worker. Queued previews are dropped.
+    def Close(self):
+        self.Cancel()
+        with self.condition:
+            self.closed = True
+            thread = self.thread
+            self.thread = None
+            self.condition.notify()
+        if thread is not None:
+            thread.join()
+
+    # Previews submitted, applied and cancelled, and the latency from the
+    # request to the built preview.
+    def Report(self):
+        stats = self.stats
+        text = "%d previews requested, %d applied, %d cancelled, %d failed" % (
+            stats["submitted"], stats["applied"], stats["cancelled"], stats["failed"])
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            text += "; latency to the preview %.0f ms median, %.0f ms max" % (
+                1e3*latencies[len(latencies)//2], 1e3*latencies[-1])
+        return text
+
+# Preview a lofted wing in its enclosure on MemoryBackend over a burst of
+# edits of the angle of attack, interval seconds apart: built in the callback,
+# as the wizard did, and through the worker with the main thread standing in
+# for the UI thread. Reports how long the UI thread was blocked and how many
+# builds ran.
+def Benchmark(edits=20, interval=0.02, delay=0.1):
+    import AirfoilStages
+    import AirfoilValidation
+    import WingSections
+    from MemoryBackend import MemoryBackend
+    cad = MemoryBackend()
+    params = dict(AirfoilStages.DEFAULTS)
+    params["Mode"] = "3D"
+    params["Sections"] = WingSections.TaperedSections(50)
+    builds = []
+
+    def Prepare(inputs, check):
+        problems = AirfoilValidation.Validate(inputs, "Domain")
+        check()
+        return (inputs, problems, AirfoilStages.AirfoilCoordinates(inputs))
+
+    def Apply(prepared):
+        (inputs, problems, coordinates) = prepared
+        AirfoilStages.BuildAirfoil(cad, inputs, coordinates)
+        AirfoilStages.BuildScaleRotatePull(cad, inputs)
+        AirfoilStages.BuildDomainOrEnclosure(cad, inputs)
+        builds.append(inputs["Angle"])
+
+    blocked = 0.0
+    start = default_timer()
+    for k in range(edits):
+        inputs = dict(params, Angle=float(k))
+        edit = default_timer()
+        Apply(Prepare(inputs, lambda: None))
+        blocked += default_timer() - edit
+        time.sleep(max(0.0, interval - (default_timer() - edit)))
+    print("in the callback: UI blocked %.3f s of %.3f s, %d builds, last angle %g" %
+          (blocked, default_timer() - start, len(builds), builds[-1]))
+
+    calls = Queue()
+    worker = PreviewWorker(calls.put, delay)
+    del builds[:]
+    blocked = 0.0
+    longest = 0.0
+    start = default_timer()
+    job = None
+    for k in range(edits + int(1.0/interval)):
+        edit = default_timer()
+        try:
+            while True:
+                calls.get_nowait()()
+        except Empty:
+            pass
+        if k < edits:
+            inputs = dict(params, Angle=float(k))
+            job = worker.Submit(lambda check, inputs=inputs: Prepare(inputs, check), Apply, "Domain")
+        busy = default_timer() - edit
+        (blocked, longest) = (blocked + busy, max(longest, busy))
+        if k >= edits and job.done.is_set():
+            break
+        time.sleep(max(0.0, interval - busy))
+    print("with the worker:  UI blocked %.3f s of %.3f s (longest %.3f s), %d builds, last angle %g" %
+          (blocked, default_timer() - start, longest, len(builds), builds[-1]))
+    print(worker.Report())
+    worker.Close()
+
+if __name__ == "__main__":
+    Benchmark(*[float(a) if "." in a else int(a) for a in sys.argv[1:3]])
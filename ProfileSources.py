@@ -0,0 +1,480 @@
+# Profile sources: NACA codes and .dat coordinate files.
+#
+# The Naca input of the wizard names a profile. Four and five digits are the
+# NACA 4-digit and 5-digit families, from their equations (NacaProfile.py).
+# Any other name is a coordinate file: the path of a .dat file, or the name of
+# one in the profile library, a directory or a .zip/.tar(.gz) archive of .dat
+# files given by the Profiles input (AIRFOIL_PROFILES in the wizard). Library
+# names are matched without case, punctuation and a "naca" prefix, so the
+# 6-series profile 63(2)-415 is naca632415.dat.
+#
+# Files may be in the Selig format (upper surface from the trailing edge to
+# the leading edge, then the lower one back) or the Lednicer format (point
+# counts, then each surface from the leading edge). They are normalized to
+# unit chord, leading edge at the origin and trailing edge on the x axis, and
+# interpolated linearly between their points, so a file profile goes through
+# the chordwise grid, the cut and the later stages as a NACA one does. A
+# blunt trailing edge is kept open.
+#
+# Libraries are read lazily: an index of the file names, then each profile
+# when it is first used, kept in an LRU cache until its file changes. ResampledBatches streams a
+# whole library through the parser in one pass and resamples the profiles
+# onto a shared grid in batches, as arrays. Plain Python, so it runs in the
+# wizard; the batch resampling uses numpy when it is there.
+#
+#     (surfaces, closed) = ProfileSurfaces("63(2)-415", "profiles.zip")
+#     for (names, upper, lower, closed) in ResampledBatches("profiles.zip", x):
+#         ...
+
+import os
+import sys
+import math
+import hashlib
+import zipfile
+import tarfile
+from bisect import bisect_left
+from timeit import default_timer
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from NacaProfile import (Naca4Digits, Naca4Surfaces, Naca5Digits, Naca5Surfaces,
+                         NACA5_STANDARD, NACA5_REFLEXED)
+from GeometryCache import LRUCache
+
+ARCHIVES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2")
+
+# Fewest points of a coordinate file.
+MIN_POINTS = 5
+
+# Kind of the profile name: "naca4", "naca5" or "file".
+def ProfileKind(name):
+    name = name.strip()
+    if name.isdigit() and len(name) in (4, 5):
+        return "naca%d" % len(name)
+    return "file"
+
+# Problems of a NACA 4-digit code.
+def Naca4Problems(naca):
+    problems = []
+    thickness = int(naca[2:])
+    if thickness < 1:
+        problems.append("Thickness is too small (minimum is 01)")
+    if thickness > 30:
+        problems.append("Thickness is too big (maximum is 30)")
+    if naca[0] != "0" and naca[1] == "0":
+        problems.append("Naca %s has camber but no location of maximum camber" % naca)
+    return problems
+
+# Problems of a NACA 5-digit code.
+def Naca5Problems(naca):
+    problems = []
+    if naca[2] not in "01":
+        problems.append("Naca %s: the third digit should be 0 (standard) or 1 (reflexed camber)" % naca)
+    elif int(naca[1]) not in (NACA5_REFLEXED if naca[2] == "1" else NACA5_STANDARD):
+        locations = sorted(NACA5_REFLEXED if naca[2] == "1" else NACA5_STANDARD)
+        problems.append("Naca %s: the location of maximum camber should be %d to %d" %
+                        (naca, locations[0], locations[-1]))
+    thickness = int(naca[3:])
+    if thickness < 1:
+        problems.append("Thickness is too small (minimum is 01)")
+    if thickness > 30:
+        problems.append("Thickness is too big (maximum is 30)")
+    return problems
+
+# Problems of a profile name: an invalid NACA code, or a file that cannot be
+# found or read.
+def SourceProblems(name, library=""):
+    kind = ProfileKind(name)
+    if kind == "naca4":
+        return Naca4Problems(name.strip())
+    if kind == "naca5":
+        return Naca5Problems(name.strip())
+    try:
+        LoadProfile(name, library)
+    except (ValueError, IOError, OSError) as error:
+        return [str(error)]
+    return []
+
+# Library key of a profile or file name.
+def ProfileKey(name):
+    name = os.path.basename(name.strip().replace("\\", "/")).lower()
+    if name.endswith(".dat"):
+        name = name[:-4]
+    key = "".join(c for c in name if c.isalnum())
+    for prefix in ("naca", "n"):
+        if key.startswith(prefix) and key[len(prefix):len(prefix) + 1].isdigit():
+            return key[len(prefix):]
+    return key
+
+# Number of a field of a .dat file, with Fortran exponents.
+def _Number(field):
+    return float(field.replace("D", "E").replace("d", "e"))
+
+# Title and points of a .dat file from its lines (text or bytes), in the
+# Selig order.
+def ParseDat(lines, name="profile"):
+    title = None
+    rows = []
+    for line in lines:
+        if not isinstance(line, str):
+            line = line.decode("latin-1")
+        fields = line.replace(",", " ").split()
+        if not fields:
+            continue
+        try:
+            rows.append((_Number(fields[0]), _Number(fields[1])))
+        except (ValueError, IndexError):
+            if title is None and not rows:
+                title = line.strip()
+                continue
+            raise ValueError("%s: cannot read the line '%s'" % (name, line.strip()))
+    if rows and rows[0][0] > 1.5 and rows[0][1] > 1.5:
+        (upper, lower) = (int(rows[0][0]), int(rows[0][1]))
+        if len(rows) != 1 + upper + lower:
+            raise ValueError("%s: %d points, the Lednicer header gives %d" % (name, len(rows) - 1, upper + lower))
+        rows = rows[upper:0:-1] + rows[upper + 1 + (rows[upper + 1] == rows[1]):]
+    if len(rows) < MIN_POINTS:
+        raise ValueError("%s: %d points, at least %d are needed" % (name, len(rows), MIN_POINTS))
+    return (title or name, rows)
+
+# Points of xs, ys with x strictly increasing, dropping those that go back.
+def _Ascending(points):
+    kept = [points[0]]
+    for point in points[1:]:
+        if point[0] > kept[-1][0]:
+            kept.append(point)
+    return ([p[0] for p in kept], [p[1] for p in kept])
+
+# Value at x of ys over ascending xs, linearly interpolated.
+def _At(xs, ys, x):
+    k = min(max(bisect_left(xs, x), 1), len(xs) - 1)
+    (x0, x1) = (xs[k-1], xs[k])
+    return ys[k-1] + (x - x0)/(x1 - x0)*(ys[k] - ys[k-1])
+
+# Profile of a coordinate file, normalized to unit chord, with its upper and
+# lower surfaces as ascending (xs, ys) from the leading edge.
+class FileProfile(object):
+    def __init__(self, title, points):
+        self.title = title
+        (tx, ty) = (0.5*(points[0][0] + points[-1][0]), 0.5*(points[0][1] + points[-1][1]))
+        distances = [(px - tx)**2 + (py - ty)**2 for (px, py) in points]
+        k = distances.index(max(distances))
+        (lx, ly) = points[k]
+        chord = distances[k]**0.5
+        (c, s) = ((tx - lx)/chord**2, (ty - ly)/chord**2)
+        unit = [((px - lx)*c + (py - ly)*s, (py - ly)*c - (px - lx)*s) for (px, py) in points]
+        (first, second) = (unit[k::-1], unit[k:])
+        if sum(p[1] for p in first)/len(first) < sum(p[1] for p in second)/len(second):
+            (first, second) = (second, first)
+        self.upper = _Ascending(first)
+        self.lower = _Ascending(second)
+        self.closed = abs(unit[0][1] - unit[-1][1]) < 1e-9
+        if min(len(self.upper[0]), len(self.lower[0])) < 2:
+            raise ValueError("%s: a surface has less than two points" % title)
+
+    # Upper and lower ordinates at chord station x.
+    def Surfaces(self, x):
+        return (_At(self.upper[0], self.upper[1], x), _At(self.lower[0], self.lower[1], x))
+
+# Coordinate files of a directory, an archive or a single .dat file, read
+# lazily. Profiles are parsed when they are first used and cached.
+class ProfileLibrary(object):
+    def __init__(self, source, cacheSize=256):
+        self.source = source
+        self.archive = None
+        self.index = None
+        self.cache = LRUCache(cacheSize)
+
+    def _Kind(self):
+        if os.path.isdir(self.source):
+            return "directory"
+        lower = self.source.lower()
+        if lower.endswith(".zip"):
+            return "zip"
+        if lower.endswith(ARCHIVES):
+            return "tar"
+        return "file"
+
+    # Members of the source: library key to file, archive member or path.
+    def Index(self):
+        if self.index is None:
+            kind = self._Kind()
+            self.index = {}
+            if kind == "directory":
+                for (folder, folders, files) in os.walk(self.source):
+                    folders.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(".dat"):
+                            self.index.setdefault(ProfileKey(name), os.path.join(folder, name))
+            elif kind == "zip":
+                self.archive = zipfile.ZipFile(self.source)
+                for name in self.archive.namelist():
+                    if name.lower().endswith(".dat"):
+                        self.index.setdefault(ProfileKey(name), name)
+            elif kind == "tar":
+                self.archive = tarfile.open(self.source)
+                for member in self.archive.getmembers():
+                    if member.isfile() and member.name.lower().endswith(".dat"):
+                        self.index.setdefault(ProfileKey(member.name), member)
+            else:
+                self.index[ProfileKey(self.source)] = self.source
+        return self.index
+
+    def Names(self):
+        return sorted(self.Index())
+
+    def _Read(self, member):
+        if isinstance(member, tarfile.TarInfo):
+            return self.archive.extractfile(member).read().splitlines()
+        if self.archive is not None:
+            return self.archive.read(member).splitlines()
+        with open(member, "rb") as stream:
+            return stream.read().splitlines()
+
+    # Profile of a name, as ProfileKey matches it. A file edited since it was
+    # read is read again.
+    def Profile(self, name):
+        key = ProfileKey(name)
+        member = self.Index().get(key)
+        if member is None:
+            raise ValueError("Profile %s is not in the profile library %s" % (name, self.source))
+        version = key
+        if self.archive is None:
+            version = (key, os.path.getsize(member), os.path.getmtime(member))
+        profile = self.cache.Get(version)
+        if profile is None:
+            label = getattr(member, "name", member)
+            profile = FileProfile(*ParseDat(self._Read(member), label))
+            self.cache.Put(version, profile)
+        return profile
+
+    # Signature of the file of a name, which changes with its contents: the
+    # hash of a file, the size and time of an archive with the member name.
+    # None if the library does not have it.
+    def Signature(self, name):
+        member = self.Index().get(ProfileKey(name))
+        if member is None:
+            return None
+        if self.archive is not None:
+            return [self.source, getattr(member, "name", member), os.path.getsize(self.source),
+                    os.path.getmtime(self.source)]
+        with open(member, "rb") as stream:
+            return hashlib.sha1(stream.read()).hexdigest()
+
+    # All profiles of the source in one pass, as (key, profile), without
+    # indexing or caching them: tar archives are read as a stream. Files that
+    # cannot be read are skipped, and added to errors as (name, message) if
+    # it is a list.
+    def Stream(self, errors=None):
+        if self._Kind() == "tar":
+            archive = tarfile.open(self.source, "r|*")
+            members = ((member.name, archive.extractfile(member).read().splitlines())
+                       for member in archive if member.isfile() and member.name.lower().endswith(".dat"))
+        else:
+            archive = None
+            index = self.Index()
+            members = ((getattr(index[key], "name", index[key]), self._Read(index[key])) for key in sorted(index))
+        try:
+            for (name, lines) in members:
+                try:
+                    profile = FileProfile(*ParseDat(lines, name))
+                except (ValueError, ZeroDivisionError) as error:
+                    if errors is not None:
+                        errors.append((name, str(error)))
+                    continue
+                yield (ProfileKey(name), profile)
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def Close(self):
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        self.index = None
+
+# Libraries opened so far, by source.
+libraries = {}
+
+def Library(source):
+    if source not in libraries:
+        libraries[source] = ProfileLibrary(source)
+    return libraries[source]
+
+# Profile of a file name: a .dat file, or a name in the library.
+def LoadProfile(name, library=""):
+    name = name.strip()
+    if os.path.isfile(name):
+        return Library(name).Profile(name)
+    if not library:
+        raise ValueError("Profile %s is not a NACA 4 or 5-digit code or a .dat file, "
+                         "and there is no profile library" % name)
+    return Library(library).Profile(name)
+
+# Signature of the coordinate file a profile name resolves to, as
+# LoadProfile finds it (ProfileLibrary.Signature). None for NACA codes and
+# names that do not resolve, which LoadProfile rejects.
+def ProfileSignature(name, library=""):
+    if ProfileKind(name) != "file":
+        return None
+    name = name.strip()
+    source = name if os.path.isfile(name) else library
+    if not source:
+        return None
+    try:
+        return Library(source).Signature(name)
+    except (IOError, OSError, zipfile.BadZipfile, tarfile.TarError):
+        return None
+
+# Surfaces function of a profile name, as ChordSpacing takes it, and whether
+# its trailing edge is closed.
+def ProfileSurfaces(name, library=""):
+    kind = ProfileKind(name)
+    if kind == "naca4":
+        (m, p, t) = Naca4Digits(name.strip())
+        return (lambda xi: Naca4Surfaces(m, p, t, xi), True)
+    if kind == "naca5":
+        (k1, r, k21, t) = Naca5Digits(name.strip())
+        return (lambda xi: Naca5Surfaces(k1, r, k21, t, xi), True)
+    profile = LoadProfile(name, library)
+    return (profile.Surfaces, profile.closed)
+
+# Upper and lower ordinates of file profiles at the stations x, as arrays of
+# (profiles, stations) with numpy: the surfaces of all the profiles are laid
+# end to end, each shifted along x, and interpolated in one call.
+def Resample(profiles, x):
+    if numpy is None:
+        upper = [[_At(p.upper[0], p.upper[1], xi) for xi in x] for p in profiles]
+        lower = [[_At(p.lower[0], p.lower[1], xi) for xi in x] for p in profiles]
+        return (upper, lower)
+    grid = numpy.asarray(x, dtype=float)
+    shifts = 4.0*numpy.arange(len(profiles))
+    result = []
+    for side in ("upper", "lower"):
+        surfaces = [getattr(p, side) for p in profiles]
+        xs = numpy.concatenate([numpy.asarray(s[0]) + shift for (s, shift) in zip(surfaces, shifts)])
+        ys = numpy.concatenate([numpy.asarray(s[1]) for s in surfaces])
+        start = numpy.array([s[0][0] for s in surfaces])
+        end = numpy.array([s[0][-1] for s in surfaces])
+        at = numpy.clip(grid[None, :], start[:, None], end[:, None]) + shifts[:, None]
+        result.append(numpy.interp(at.ravel(), xs, ys).reshape(len(profiles), len(grid)))
+    return tuple(result)
+
+# Upper and lower ordinates of the profiles of names at the stations x, as
+# lists, and whether each is closed. NACA 4-digit codes are evaluated
+# together with AirfoilEngine when numpy is there, and files resampled
+# together.
+def ProfileOrdinates(names, x, library=""):
+    upper = [None]*len(names)
+    lower = [None]*len(names)
+    closed = [True]*len(names)
+    naca4 = [k for (k, name) in enumerate(names) if ProfileKind(name) == "naca4"]
+    files = [k for (k, name) in enumerate(names) if ProfileKind(name) == "file"]
+    if naca4 and numpy is not None:
+        from AirfoilEngine import Naca4Parameters, Naca4ThicknessShape, Naca4CamberBatch
+        params = Naca4Parameters([names[k].strip() for k in naca4])
+        grid = numpy.asarray(x, dtype=float)
+        thickness = (params[:, 2]/0.20)[:, None]*Naca4ThicknessShape(grid)
+        camber = Naca4CamberBatch(params[:, 0], params[:, 1], grid)
+        for (k, yu, yl) in zip(naca4, (camber + thickness).tolist(), (camber - thickness).tolist()):
+            (upper[k], lower[k]) = (yu, yl)
+    if files:
+        profiles = [LoadProfile(names[k], library) for k in files]
+        (yu, yl) = Resample(profiles, x)
+        for (j, k) in enumerate(files):
+            (upper[k], lower[k], closed[k]) = (list(yu[j]), list(yl[j]), profiles[j].closed)
+    for (k, name) in enumerate(names):
+        if upper[k] is None:
+            (surfaces, closed[k]) = ProfileSurfaces(name, library)
+            ordinates = [surfaces(xi) for xi in x]
+            upper[k] = [yu for (yu, yl) in ordinates]
+            lower[k] = [yl for (yu, yl) in ordinates]
+    return (upper, lower, closed)
+
+# All profiles of a source resampled onto the stations x, streamed in batches
+# of size: (names, upper, lower, closed) per batch, upper and lower arrays of
+# (profiles, stations) with numpy. Only one batch is held at a time. Files
+# that cannot be read are skipped, as ProfileLibrary.Stream does.
+def ResampledBatches(source, x, size=256, errors=None):
+    library = ProfileLibrary(source, cacheSize=0)
+    names = []
+    profiles = []
+    try:
+        for (name, profile) in library.Stream(errors):
+            names.append(name)
+            profiles.append(profile)
+            if len(profiles) == size:
+                (upper, lower) = Resample(profiles, x)
+                yield (names, upper, lower, [p.closed for p in profiles])
+                (names, profiles) = ([], [])
+        if profiles:
+            (upper, lower) = Resample(profiles, x)
+            yield (names, upper, lower, [p.closed for p in profiles])
+    finally:
+        library.Close()
+
+# Selig (or Lednicer) lines of a NACA profile with points points per surface.
+def DatLines(code, points, lednicer=False):
+    (surfaces, closed) = ProfileSurfaces(code)
+    x = [0.5*(1.0 - math.cos(math.pi*i/(points - 1))) for i in range(points)]
+    ordinates = [surfaces(xi) for xi in x]
+    upper = ["%.6f %.6f" % (xi, yu) for (xi, (yu, yl)) in zip(x, ordinates)]
+    lower = ["%.6f %.6f" % (xi, yl) for (xi, (yu, yl)) in zip(x, ordinates)]
+    if lednicer:
+        return ["NACA %s" % code, "%d. %d." % (points, points), ""] + upper + [""] + lower
+    return ["NACA %s" % code] + upper[::-1] + lower[1:]
+
+# Write a library of NACA profiles as .dat files, every fourth in the
+# Lednicer format, to a directory and a zip, and time streaming it onto a 201
+# point grid against reading the files one by one and interpolating them in
+# Python, and looking profiles up by name. Checks the resampled upper
+# surfaces against the NACA equations.
+def Benchmark(files=2000, folder="benchmark_profiles"):
+    import shutil
+    codes = {}
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+    os.makedirs(folder)
+    archive = zipfile.ZipFile(folder + ".zip", "w", zipfile.ZIP_DEFLATED)
+    for k in range(files):
+        code = "%d%d%02d" % (k % 7, 2 + k % 5, 6 + k % 19) if k % 2 else "%d%d0%02d" % (1 + k % 4, 1 + k % 5, 6 + k % 19)
+        name = "profile%d.dat" % k
+        codes[ProfileKey(name)] = code
+        text = "\n".join(DatLines(code, 61 + k % 100, lednicer=k % 4 == 0)) + "\n"
+        with open(os.path.join(folder, name), "w") as stream:
+            stream.write(text)
+        archive.writestr(name, text)
+    archive.close()
+    x = [0.5*(1.0 - math.cos(math.pi*i/200)) for i in range(201)]
+    for source in (folder, folder + ".zip"):
+        start = default_timer()
+        count = 0
+        for (names, upper, lower, closed) in ResampledBatches(source, x):
+            count += len(names)
+        batched = default_timer() - start
+        error = 0.0
+        for (names, upper, lower, closed) in ResampledBatches(source, x[::10]):
+            for (name, yu) in zip(names, upper):
+                surfaces = ProfileSurfaces(codes[name])[0]
+                error = max(error, max(abs(a - surfaces(xi)[0]) for (a, xi) in zip(yu, x[::10])))
+        print("%-24s %d profiles streamed and resampled in %.2f s (%.0f per s), "
+              "largest error %.1e of the chord" % (source, count, batched, count/batched, error))
+    start = default_timer()
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name)) as stream:
+            profile = FileProfile(*ParseDat(stream.readlines(), name))
+        [profile.Surfaces(xi) for xi in x]
+    single = default_timer() - start
+    print("%-24s %d profiles read and interpolated one by one in %.2f s" % (folder, files, single))
+    start = default_timer()
+    for k in range(1000):
+        ProfileSurfaces("profile%d" % (k % 20), folder + ".zip")
+    print("%-24s 1000 lookups by name of 20 profiles in %.4f s" % (folder + ".zip", default_timer() - start))
+    Library(folder + ".zip").Close()
+    shutil.rmtree(folder)
+    os.remove(folder + ".zip")
+
+if __name__ == "__main__":
+    Benchmark(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,267 @@
+# Compact B-spline representation of a profile.
+#
+# The dense coordinates of a profile are Points+1 values per surface, and the
+# sketch interpolates all of them. FitSpline fits the whole profile instead
+# with one cubic B-spline curve of a small control net, by least squares, and
+# adds control points until the curve is within a tolerance of the profile
+# surfaces. The curve runs over t from the upper to the lower end of the
+# profile with x = t*t, so the parameter clusters at the leading edge like
+# the profile curvature does. x is then exact, the ordinate error is the
+# deviation, and both surfaces meet at t = 0 on a double knot. The ends are
+# interpolated: the trailing edge, or both ends of the cut.
+#
+# ProfileSpline keeps the knots and control points in arrays, with __slots__,
+# in a few hundred bytes where the coordinates take tens of kilobytes, and Key
+# gives a canonical key of its shape for caching and dedup. Plain Python, so it
+# runs in the wizard.
+#
+#     spline = FitSpline(surfaces, tolerance=1e-4)
+#     (x, y) = spline.Coordinates(100)    # CreateAirfoil layout
+#
+# Run this file directly to fit a set of profiles and compare them with their
+# coordinates:
+#     python ProfileSpline.py [tolerance]
+
+import sys
+import math
+import hashlib
+from array import array
+from timeit import default_timer
+
+from GeometryCache import LRUCache
+from ProfileSources import ProfileSurfaces, ProfileSignature
+
+DEGREE = 3
+
+class ProfileSpline(object):
+    __slots__ = ("knots", "xs", "ys", "start", "end", "deviation")
+
+    def __init__(self, knots, xs, ys, deviation=0.0):
+        self.knots = array("d", knots)
+        self.xs = array("d", xs)
+        self.ys = array("d", ys)
+        self.start = self.knots[0]
+        self.end = self.knots[-1]
+        self.deviation = deviation
+
+    # Control points per surface, the leading edge one counted for both.
+    def ControlCount(self):
+        return (len(self.xs) + 1)//2
+
+    # Check if the trailing edge is closed.
+    def Closed(self):
+        return (self.xs[0], self.ys[0]) == (self.xs[-1], self.ys[-1])
+
+    # Point of the curve at parameter t.
+    def Evaluate(self, t):
+        (span, basis) = Basis(self.knots, t)
+        x = 0.0
+        y = 0.0
+        for (k, b) in enumerate(basis):
+            x += b*self.xs[span - DEGREE + k]
+            y += b*self.ys[span - DEGREE + k]
+        return (x, y)
+
+    # Coordinates in the CreateAirfoil layout, the parameter of each surface
+    # cut in points equal intervals.
+    def Coordinates(self, points=100):
+        t = [self.start*(1.0 - float(i)/points) for i in range(points)] + [0.0]
+        t += [-ti for ti in t[-2::-1]]
+        x = []
+        y = []
+        for ti in t:
+            (xi, yi) = self.Evaluate(ti)
+            x.append(xi)
+            y.append(yi)
+        # The leading edge is repeated, as in the CreateAirfoil layout.
+        return (x[:points + 1] + x[points:], y[:points + 1] + y[points:])
+
+    # The spline posed by an AirfoilPose matrix. The curve of the posed
+    # control points is the posed curve.
+    def Posed(self, matrix):
+        ((a, b, tx), (c, d, ty)) = matrix
+        xs = [a*x + b*y + tx for (x, y) in zip(self.xs, self.ys)]
+        ys = [c*x + d*y + ty for (x, y) in zip(self.xs, self.ys)]
+        return ProfileSpline(self.knots, xs, ys, self.deviation)
+
+    # Knots as (value, multiplicity), and the control points, as a NURBS
+    # curve is built from them.
+    def Nurbs(self):
+        knots = []
+        for value in self.knots:
+            if knots and knots[-1][0] == value:
+                knots[-1] = (value, knots[-1][1] + 1)
+            else:
+                knots.append((value, 1))
+        return (DEGREE, knots, list(zip(self.xs, self.ys)))
+
+    # Canonical key of the shape: equal for splines whose knots and control
+    # points agree to digits decimals.
+    def Key(self, digits=9):
+        text = ",".join("%.*f" % (digits, value) for value in
+                        tuple(self.knots) + tuple(self.xs) + tuple(self.ys))
+        return hashlib.sha1(text.encode("ascii")).hexdigest()[:16]
+
+    # Bytes held by the spline: the object and its arrays.
+    def Size(self):
+        return (sys.getsizeof(self) + sys.getsizeof(self.knots) + sys.getsizeof(self.xs) +
+                sys.getsizeof(self.ys))
+
+# Index of the knot span of t and the values of the DEGREE+1 basis functions
+# that are not zero there (Cox-de Boor).
+def Basis(knots, t):
+    last = len(knots) - DEGREE - 2
+    span = DEGREE
+    while span < last and t >= knots[span + 1]:
+        span += 1
+    basis = [1.0]
+    left = [0.0]*(DEGREE + 1)
+    right = [0.0]*(DEGREE + 1)
+    for j in range(1, DEGREE + 1):
+        left[j] = t - knots[span + 1 - j]
+        right[j] = knots[span + j] - t
+        saved = 0.0
+        values = []
+        for r in range(j):
+            term = basis[r]/(right[r + 1] + left[j - r])
+            values.append(saved + right[r + 1]*term)
+            saved = left[j - r]*term
+        values.append(saved)
+        basis = values
+    return (span, basis)
+
+# Clamped knots over -end..end with spans equal intervals per surface and a
+# double knot at the leading edge.
+def SplineKnots(end, spans):
+    upper = [-end*(1.0 - float(i)/spans) for i in range(1, spans)]
+    return [-end]*(DEGREE + 1) + upper + [0.0, 0.0] + [-ti for ti in upper[::-1]] + [end]*(DEGREE + 1)
+
+# Solve the symmetric positive definite system a.x = b in place (Cholesky).
+def SolveSymmetric(a, b):
+    n = len(b)
+    for j in range(n):
+        a[j][j] = math.sqrt(a[j][j] - sum(a[j][k]*a[j][k] for k in range(j)))
+        for i in range(j + 1, n):
+            a[i][j] = (a[i][j] - sum(a[i][k]*a[j][k] for k in range(j)))/a[j][j]
+    for i in range(n):
+        b[i] = (b[i] - sum(a[i][k]*b[k] for k in range(i)))/a[i][i]
+    for i in range(n - 1, -1, -1):
+        b[i] = (b[i] - sum(a[k][i]*b[k] for k in range(i + 1, n)))/a[i][i]
+    return b
+
+# Control values of a least squares fit of values at parameters ts, the
+# first and last control values fixed to the end values.
+def FitControls(knots, ts, values):
+    n = len(knots) - DEGREE - 1
+    rows = [Basis(knots, t) for t in ts]
+    (first, last) = (values[0], values[-1])
+    size = n - 2
+    normal = [[0.0]*size for i in range(size)]
+    rhs = [0.0]*size
+    for ((span, basis), value) in zip(rows, values):
+        target = value
+        for (k, b) in enumerate(basis):
+            index = span - DEGREE + k
+            if index == 0:
+                target -= b*first
+            elif index == n - 1:
+                target -= b*last
+        for (k, b) in enumerate(basis):
+            i = span - DEGREE + k - 1
+            if not 0 <= i < size:
+                continue
+            rhs[i] += b*target
+            for (l, c) in enumerate(basis):
+                j = span - DEGREE + l - 1
+                if 0 <= j <= i:
+                    normal[i][j] += b*c
+    for i in range(size):
+        for j in range(i):
+            normal[j][i] = normal[i][j]
+    return [first] + SolveSymmetric(normal, rhs) + [last]
+
+# Fit a profile given by its surfaces (ChordSpacing), cut at chord station
+# xCut if given, with the fewest control points per surface, from
+# minControls to maxControls, that keep the curve within tolerance of the
+# surfaces. An uncut closed profile ends at y = 0, as CreateAirfoil closes it.
+# Raises ValueError if maxControls is not enough.
+def FitSpline(surfaces, tolerance=1e-4, xCut=None, closed=True, minControls=6, maxControls=20):
+    end = math.sqrt(1.0 if xCut is None else xCut)
+    samples = 8*maxControls
+    check = 4*samples
+    ts = [end*(2.0*i/samples - 1.0) for i in range(samples + 1)]
+    targets = [Ordinate(surfaces, t) for t in ts]
+    if xCut is None and closed:
+        targets[0] = 0.0
+        targets[-1] = 0.0
+    for controls in range(minControls, maxControls + 1):
+        knots = SplineKnots(end, controls - 2)
+        xs = FitControls(knots, ts, [t*t for t in ts])
+        ys = FitControls(knots, ts, targets)
+        spline = ProfileSpline(knots, xs, ys)
+        deviation = 0.0
+        for i in range(1, check):
+            t = end*(2.0*i/check - 1.0)
+            deviation = max(deviation, abs(spline.Evaluate(t)[1] - Ordinate(surfaces, t)))
+            if deviation > tolerance:
+                break
+        if deviation <= tolerance:
+            spline.deviation = deviation
+            return spline
+    raise ValueError("Profile needs more than %d control points per surface to stay within %g of the chord" %
+                     (maxControls, tolerance))
+
+# Ordinate of the profile at parameter t: the upper surface for t < 0, the
+# lower one for t > 0, at x = t*t.
+def Ordinate(surfaces, t):
+    (upper, lower) = surfaces(t*t)
+    return upper if t < 0.0 else lower
+
+# Splines fitted for their inputs, and one instance per shape.
+fits = LRUCache(64)
+shapes = LRUCache(64)
+
+# FitSpline for the profile name of ProfileSources, computed once per input
+# set and coordinate file contents. Fits of the same shape share one
+# ProfileSpline.
+def CachedSpline(name, library="", tolerance=1e-4, xCut=None):
+    key = (name, library, tolerance, xCut, str(ProfileSignature(name, library)))
+    spline = fits.Get(key)
+    if spline is None:
+        (surfaces, closed) = ProfileSurfaces(name, library)
+        spline = FitSpline(surfaces, tolerance, xCut, closed)
+        spline = shapes.Get(spline.Key()) or spline
+        shapes.Put(spline.Key(), spline)
+        fits.Put(key, spline)
+    return spline
+
+# Fit NACA profiles, cut and uncut, and compare the control net with the
+# dense coordinates of the same accuracy.
+def Benchmark(tolerance=1e-4):
+    from ChordSpacing import UniformPointsFor
+    from NacaProfile import ProfileScalar, ProfileTruncated
+    print("tolerance %g" % tolerance)
+    for name in ("0012", "2412", "4415", "23012", "0006"):
+        (surfaces, closed) = ProfileSurfaces(name)
+        for xCut in (None, 0.99):
+            start = default_timer()
+            try:
+                spline = FitSpline(surfaces, tolerance, xCut, closed)
+            except ValueError as error:
+                print("%-6s cut %-4s %s" % (name, xCut or "no", error))
+                continue
+            elapsed = default_timer() - start
+            points = UniformPointsFor(surfaces, tolerance)
+            grid = [i/float(points) for i in range(points + 1)]
+            if xCut is None:
+                (x, y) = ProfileScalar(surfaces, grid, closed)
+            else:
+                (x, y) = ProfileTruncated(surfaces, grid, xCut)
+            dense = sys.getsizeof(x) + sys.getsizeof(y) + sum(sys.getsizeof(v) for v in x + y)
+            print("%-6s cut %-4s %2d control points per surface, deviation %.1e, %4.1f ms; "
+                  "%4d points uniform, %6d bytes, spline %4d bytes, key %s" %
+                  (name, xCut or "no", spline.ControlCount(), spline.deviation, 1e3*elapsed,
+                   len(x), dense, spline.Size(), spline.Key()))
+
+if __name__ == "__main__":
+    Benchmark(*[float(a) for a in sys.argv[1:2]])
@@ -0,0 +1,161 @@
+# Nested span profiler for the wizard callbacks.
+#
+# Profiler extends CallTimer: every "with profiler.Time(name):" block is also a
+# span nested in the spans open around it, with its own and its children's
+# time and the change in memory use. Decorate callbacks with
+# profiler.Instrument and wrap a CAD backend with InstrumentObject to see the
+# time of each callback broken down per CAD operation.
+#
+# The spans are exported as a Chrome trace (chrome://tracing, Perfetto) and in
+# the folded stack format of flamegraph.pl and speedscope. If the profiler has
+# an output directory, Save rewrites both files there when the outermost span
+# open ends, so writing them is not timed and happens only when asked for, not
+# after every callback.
+
+import os
+import json
+from timeit import default_timer
+from CallTimer import CallTimer
+
+TRACE_FILE = "trace.json"
+FOLDED_FILE = "profile.folded"
+
+# Bytes in use by the process: the managed heap under IronPython, the current
+# resident size where /proc gives it (not the peak, which never goes down),
+# none elsewhere.
+STATM = "/proc/self/statm"
+
+def _ManagedMemory():
+    return System.GC.GetTotalMemory(False)
+
+def _ResidentMemory():
+    with open(STATM) as statm:
+        return int(statm.read().split()[1])*_pageSize
+
+def _NoMemory():
+    return 0
+
+try:
+    import System
+    MemoryUsage = _ManagedMemory
+except ImportError:
+    if os.path.exists(STATM):
+        _pageSize = os.sysconf("SC_PAGE_SIZE")
+        MemoryUsage = _ResidentMemory
+    else:
+        MemoryUsage = _NoMemory
+
+class Profiler(CallTimer):
+    def __init__(self, outputDir=None, maxEvents=100000):
+        self.outputDir = outputDir
+        self.maxEvents = maxEvents
+        self.Clear()
+        CallTimer.__init__(self)
+
+    # Forget the spans and the trace, as well as the per-call totals.
+    def Clear(self):
+        self.stack = []
+        self.spans = {}
+        self.events = []
+        self.origin = default_timer()
+        self.pending = False
+
+    # Context manager timing the enclosed block as a span named name.
+    def Time(self, name):
+        return _Span(self, name)
+
+    def _Enter(self, name):
+        self.stack.append([name, default_timer(), MemoryUsage(), 0.0])
+
+    def _Exit(self):
+        (name, start, memory, children) = self.stack.pop()
+        end = default_timer()
+        seconds = end - start
+        memoryDelta = MemoryUsage() - memory
+        path = tuple(frame[0] for frame in self.stack) + (name,)
+        if self.stack:
+            self.stack[-1][3] += seconds
+        self.Record(name, seconds)
+
+        span = self.spans.setdefault(path, [0, 0.0, 0.0, 0])
+        span[0] += 1
+        span[1] += seconds
+        span[2] += seconds - children
+        span[3] += memoryDelta
+
+        if len(self.events) < self.maxEvents:
+            self.events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                                "ts": 1e6*(start - self.origin), "dur": 1e6*seconds,
+                                "args": {"memory": memoryDelta}})
+        if not self.stack and self.pending:
+            self.pending = False
+            self.Write(self.outputDir)
+
+    # Decorator running the function inside a span, named after the function
+    # unless name is given.
+    def Instrument(self, function, name=None):
+        spanName = name or function.__name__
+        def Instrumented(*args, **kwargs):
+            with self.Time(spanName):
+                return function(*args, **kwargs)
+        Instrumented.__name__ = function.__name__
+        return Instrumented
+
+    # Instrument the given methods of an object, in place. The spans are named
+    # prefix + method name.
+    def InstrumentObject(self, instance, names, prefix=""):
+        for name in names:
+            setattr(instance, name, self.Instrument(getattr(instance, name), prefix + name))
+        return instance
+
+    # Chrome trace of the recorded spans.
+    def Trace(self):
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    # Folded stacks: one line per call path with its own time in microseconds.
+    def Folded(self):
+        lines = []
+        for path in sorted(self.spans):
+            lines.append("%s %d" % (";".join(path), int(round(1e6*self.spans[path][2]))))
+        return "\n".join(lines) + "\n"
+
+    # Write the trace and the folded stacks to the output directory, if there is
+    # one, when the outermost span open ends, or now if none is open.
+    def Save(self):
+        if not self.outputDir:
+            return
+        if self.stack:
+            self.pending = True
+        else:
+            self.Write(self.outputDir)
+
+    # Write the trace and the folded stacks to directory.
+    def Write(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, TRACE_FILE), "w") as trace:
+            json.dump(self.Trace(), trace)
+        with open(os.path.join(directory, FOLDED_FILE), "w") as folded:
+            folded.write(self.Folded())
+
+    # Span tree with count, total and own time and memory change per path.
+    def SpanReport(self):
+        lines = ["%-56s %8s %10s %10s %12s" % ("span", "count", "total s", "self s", "memory kB")]
+        for path in sorted(self.spans):
+            (count, total, own, memory) = self.spans[path]
+            label = "  "*(len(path) - 1) + path[-1]
+            lines.append("%-56s %8d %10.4f %10.4f %12.1f" % (label, count, total, own, memory/1024.0))
+        return "\n".join(lines)
+
+class _Span(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._Enter(self.name)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.profiler._Exit()
+        return False
@@ -0,0 +1,110 @@
+# Incremental execution of dependent wizard stages.
+#
+# Each stage declares the stage it builds on and a function returning its own
+# inputs. The key of a stage is its name, its inputs and the key of the stage it
+# builds on, so changing an input dirties that stage and everything downstream
+# of it. Running a stage only re-executes the stages whose key changed: the
+# pipeline restores the deepest up-to-date stage and runs the rest from there.
+#
+# The document holds the output of one stage at a time. store(key) and
+# restore(key) keep and bring back that output; restore returns False if it has
+# nothing for key.
+
+class Stage(object):
+    def __init__(self, name, inputs, run, after=None, snapshot=True):
+        self.name = name
+        self.inputs = inputs
+        self.run = run
+        self.after = after
+        self.snapshot = snapshot
+
+class StagePipeline(object):
+    def __init__(self, store=None, restore=None):
+        self.stages = {}
+        self.store = store
+        self.restore = restore
+        self.current = None
+        self.built = {}
+
+    # Register a stage. inputs(context) and run(context) receive the context
+    # passed to Run.
+    def Add(self, name, inputs, run, after=None, snapshot=True):
+        if after is not None and after not in self.stages:
+            raise KeyError("Unknown stage: " + after)
+        self.stages[name] = Stage(name, inputs, run, after, snapshot)
+
+    # Stages from the first one up to name.
+    def Chain(self, name):
+        chain = []
+        while name is not None:
+            stage = self.stages[name]
+            chain.insert(0, stage)
+            name = stage.after
+        return chain
+
+    # Stages that build on name, directly or indirectly.
+    def Downstream(self, name):
+        names = []
+        for stage in self.stages.values():
+            upstream = stage.after
+            while upstream is not None:
+                if upstream == name:
+                    names.append(stage.name)
+                    break
+                upstream = self.stages[upstream].after
+        return names
+
+    # Keys of the stages from the first one up to name.
+    def Keys(self, name, context):
+        keys = []
+        upstream = None
+        for stage in self.Chain(name):
+            upstream = (stage.name, tuple(stage.inputs(context)), upstream)
+            keys.append(upstream)
+        return keys
+
+    # Key of stage name for the given context.
+    def Key(self, name, context):
+        return self.Keys(name, context)[-1]
+
+    # True if name has to be executed to be up to date with context.
+    def Dirty(self, name, context):
+        return self.built.get(name) != self.Key(name, context)
+
+    # Forget what has been built for name and the stages downstream of it,
+    # or for all stages if name is None. The document is assumed changed.
+    def Invalidate(self, name=None):
+        if name is None:
+            self.built.clear()
+        else:
+            for stageName in [name] + self.Downstream(name):
+                self.built.pop(stageName, None)
+        self.current = None
+
+    # Bring the document up to date with stage name, executing only the stages
+    # whose key changed. Returns the names of the executed stages.
+    def Run(self, name, context):
+        chain = self.Chain(name)
+        keys = self.Keys(name, context)
+
+        start = 0
+        for i in range(len(chain)-1, -1, -1):
+            if self.current == keys[i]:
+                start = i+1
+                break
+            if chain[i].snapshot and self.restore is not None and self.restore(keys[i]):
+                self.current = keys[i]
+                start = i+1
+                break
+
+        executed = []
+        for i in range(start, len(chain), 1):
+            stage = chain[i]
+            self.current = None
+            stage.run(context)
+            self.built[stage.name] = keys[i]
+            self.current = keys[i]
+            if stage.snapshot and self.store is not None:
+                self.store(keys[i])
+            executed.append(stage.name)
+        return executed
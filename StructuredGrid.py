@@ -0,0 +1,452 @@
+# Structured C- and O-grids around the airfoil.
+#
+# A faster alternative to TriMesh for CFD-ready meshes: quadrilaterals in the
+# 2D domain and, in 3D, the same grid stacked along the wing span into
+# hexahedra. Grid lines run around the airfoil (i) and out to the domain or
+# enclosure box (j). Along each j line the first cell is firstHeight thick and
+# the next ones grow by growth per cell up to the far field size, so the
+# boundary layer is resolved with a few wall-normal cells instead of the
+# isotropic triangles TriMesh needs at the same wall spacing.
+#
+# The j lines are marched out of the wall along the normals until the cells are
+# as thick as the wall spacing, and run straight to their point on the box from
+# there (algebraic grid). Gauss-Seidel sweeps of the elliptic grid equations
+# then smooth the straight part. The control functions keep the stretching
+# along j of the algebraic grid and blend the spacing along i from the marched
+# layers to the box (Thomas-Middlecoff).
+#
+# A sharp trailing edge gets a C-grid, with a wake cut from the trailing edge
+# to the outlet, and a cut trailing edge an O-grid. In 3D only the wing span is
+# stacked: the enclosure front cushion (FZ) is left out and the tip plane is a
+# symmetry zone. Plain Python, so it also runs in the wizard.
+#
+# Run this file directly to compare it with TriMesh at equal wall resolution:
+#     python StructuredGrid.py [firstHeight ...]
+
+import sys
+import math
+from timeit import default_timer
+
+from FluentMesh import CellFaces, QUAD_FACES, HEX_FACES
+
+# Largest angle between the chord and the wake, in degrees, for a C-grid.
+WAKE_ANGLE = 25.0
+
+# Cell sizes along a line of length length: first, growing by growth per cell
+# up to a cap, in cells cells. The cap is what fills the length with the cells
+# left after the growing ones. The sizes are uniform when length is too short
+# for first, and grow faster when it is too long for growth.
+def LineSizes(first, growth, cells, length):
+    if first*cells >= length:
+        return [length/cells]*cells
+    grown = 0.0
+    for k in range(cells):
+        cap = (length - grown)/(cells - k)
+        if cap <= first*growth**k:
+            return [first*growth**i for i in range(k)] + [cap]*(cells - k)
+        grown += first*growth**k
+    return StretchedSizes(first, cells, length)
+
+# Cell sizes growing geometrically from first to fill length in cells cells.
+def StretchedSizes(first, cells, length):
+    (low, high) = (1.0, 2.0)
+    while first*(high**cells - 1.0)/(high - 1.0) < length:
+        high *= 2.0
+    for iteration in range(60):
+        ratio = 0.5*(low + high)
+        if first*(ratio**cells - 1.0)/(ratio - 1.0) < length:
+            low = ratio
+        else:
+            high = ratio
+    return [first*high**k for k in range(cells)]
+
+# Number of cells growing from first by growth up to maxSize over length.
+def LineCells(first, growth, maxSize, length):
+    (cells, size, covered) = (0, first, 0.0)
+    while covered < length:
+        covered += size
+        size = min(size*growth, maxSize)
+        cells += 1
+    return max(cells, 1)
+
+# Points at positions along a polyline, as arc lengths from its start.
+def PolylinePoints(run, positions):
+    lengths = [0.0]
+    for k in range(1, len(run)):
+        lengths.append(lengths[-1] + math.hypot(run[k][0] - run[k - 1][0], run[k][1] - run[k - 1][1]))
+    points = []
+    k = 1
+    for s in positions:
+        while k < len(run) - 1 and lengths[k] < s:
+            k += 1
+        span = lengths[k] - lengths[k - 1]
+        t = (s - lengths[k - 1])/span if span > 0 else 0.0
+        t = min(max(t, 0.0), 1.0)
+        points.append((run[k - 1][0] + t*(run[k][0] - run[k - 1][0]),
+                       run[k - 1][1] + t*(run[k][1] - run[k - 1][1])))
+    return points
+
+# Resample a polyline with cells cells, clustered to both ends by a cosine
+# distribution or uniform.
+def Resample(run, cells, cluster=True):
+    length = sum(math.hypot(run[k][0] - run[k - 1][0], run[k][1] - run[k - 1][1])
+                 for k in range(1, len(run)))
+    if cluster:
+        positions = [0.5*length*(1.0 - math.cos(math.pi*k/cells)) for k in range(cells + 1)]
+    else:
+        positions = [length*k/cells for k in range(cells + 1)]
+    return PolylinePoints(run, positions)
+
+# Wall points around the airfoil outline, counter-clockwise from the trailing
+# edge: surfaceCells on each side, clustered to the leading and trailing
+# edges, and teCells across a cut trailing edge. Returns the points and whether
+# the trailing edge is sharp.
+def WallPoints(outline, corners, surfaceCells, teCells):
+    sharp = len(corners) < 2
+    last = len(outline) - 1
+    (tx, ty) = outline[0] if sharp else (0.5*(outline[0][0] + outline[last][0]),
+                                         0.5*(outline[0][1] + outline[last][1]))
+    lead = max(range(len(outline)), key=lambda k: math.hypot(outline[k][0] - tx, outline[k][1] - ty))
+    upper = Resample(outline[:lead + 1], surfaceCells)
+    if sharp:
+        lower = Resample(outline[lead:] + [outline[0]], surfaceCells)
+        return (upper[:-1] + lower[:-1], True)
+    lower = Resample(outline[lead:], surfaceCells)
+    edge = Resample([outline[last], outline[0]], teCells, cluster=False)
+    return (upper[:-1] + lower[:-1] + edge[:-1], False)
+
+# Point at fraction t of the path through the given corners.
+def PathPoint(path, t):
+    lengths = [math.hypot(path[k + 1][0] - path[k][0], path[k + 1][1] - path[k][1])
+               for k in range(len(path) - 1)]
+    s = t*sum(lengths)
+    for (k, length) in enumerate(lengths):
+        if s <= length or k == len(lengths) - 1:
+            u = min(max(s/length, 0.0), 1.0) if length > 0 else 0.0
+            return (path[k][0] + u*(path[k + 1][0] - path[k][0]), path[k][1] + u*(path[k + 1][1] - path[k][1]))
+        s -= length
+
+# Fractions along the far path for the wall points: half by arc length and half
+# by index, with the path corners snapped to the nearest point.
+def PathFractions(points, path, closed):
+    count = len(points) if closed else len(points) - 1
+    lengths = [0.0]
+    for k in range(1, len(points) + (1 if closed else 0)):
+        (a, b) = (points[k - 1], points[k % len(points)])
+        lengths.append(lengths[-1] + math.hypot(b[0] - a[0], b[1] - a[1]))
+    fractions = [0.5*(lengths[k]/lengths[-1] + float(k)/count) for k in range(len(points))]
+    cumulative = [0.0]
+    for k in range(1, len(path)):
+        cumulative.append(cumulative[-1] + math.hypot(path[k][0] - path[k - 1][0], path[k][1] - path[k - 1][1]))
+    for corner in cumulative[1:-1]:
+        corner /= cumulative[-1]
+        nearest = min(range(len(fractions)), key=lambda k: abs(fractions[k] - corner))
+        fractions[nearest] = corner
+    return fractions
+
+# Unit normals of a line of points, to the right of its direction (into the
+# fluid of a counter-clockwise wall), across both neighbours.
+def LineNormals(points, closed=True):
+    count = len(points)
+    normals = []
+    for k in range(count):
+        if closed:
+            (a, b) = (points[k - 1], points[(k + 1) % count])
+        else:
+            (a, b) = (points[max(k - 1, 0)], points[min(k + 1, count - 1)])
+        (dx, dy) = (b[0] - a[0], b[1] - a[1])
+        length = math.hypot(dx, dy) or 1.0
+        normals.append((dy/length, -dx/length))
+    return normals
+
+# Structured grid around the airfoil outline out to the box (left, right,
+# down, up). topology is "C", "O" or "Auto": C for a sharp trailing edge with
+# the chord within WAKE_ANGLE degrees of the wake, which runs along x.
+class StructuredGrid(object):
+    def __init__(self, outline, corners, box, firstHeight, growth=1.15, maxSize=0.08, surfaceCells=80,
+                 teCells=4, topology="Auto", smoothing=40):
+        (self.left, self.right, self.down, self.up) = box
+        self.maxSize = maxSize
+        outline = [(float(x), float(y)) for (x, y) in outline]
+        (wall, sharp) = WallPoints(outline, corners, surfaceCells, teCells)
+        if topology == "Auto":
+            (lx, ly) = wall[len(wall)//2]
+            chord = math.degrees(math.atan2(abs(wall[0][1] - ly), wall[0][0] - lx))
+            topology = "C" if sharp and chord <= WAKE_ANGLE else "O"
+        if topology == "C" and not sharp:
+            raise ValueError("a C-grid needs a sharp trailing edge")
+        self.topology = topology
+        if topology == "C":
+            (inner, far) = self._CLines(wall, growth)
+        else:
+            (inner, far) = self._OLines(wall)
+        self.closed = topology == "O"
+        mean = sum(math.hypot(f[0] - p[0], f[1] - p[1]) for (p, f) in zip(inner, far))/len(inner)
+        self.cells = LineCells(firstHeight, growth, maxSize, mean)
+        self._Algebraic(inner, far, firstHeight, growth)
+        self.Smooth(smoothing)
+
+    # C-grid lines: the upper side of the wake, the airfoil and the lower side of
+    # the wake are the inner line, from the outlet round to the outlet. The far line runs along the
+    # top, inlet and bottom of the box, and straight across from the wake.
+    def _CLines(self, wall, growth):
+        (tx, ty) = wall[0]
+        first = 0.5*(math.hypot(wall[1][0] - tx, wall[1][1] - ty) + math.hypot(wall[-1][0] - tx, wall[-1][1] - ty))
+        length = self.right - tx
+        sizes = LineSizes(first, growth, LineCells(first, growth, self.maxSize, length), length)
+        wake = []
+        x = tx
+        for size in sizes:
+            x += size
+            wake.append((x, ty))
+        wake[-1] = (self.right, ty)
+        self.wakeCells = len(wake)
+        inner = wake[::-1] + wall + [wall[0]] + wake
+        path = [(tx, self.up), (self.left, self.up), (self.left, self.down), (tx, self.down)]
+        loop = wall + [wall[0]]
+        fractions = PathFractions(loop, path, closed=False)
+        far = ([(x, self.up) for (x, y) in wake[::-1]] + [PathPoint(path, t) for t in fractions] +
+               [(x, self.down) for (x, y) in wake])
+        return (inner, far)
+
+    # O-grid lines: the closed airfoil wall and the box, both counter-clockwise
+    # from the trailing edge. The box starts where the ray from the middle of the
+    # airfoil through the trailing edge leaves it.
+    def _OLines(self, wall):
+        self.wakeCells = 0
+        (cx, cy) = (sum(x for (x, y) in wall)/len(wall), sum(y for (x, y) in wall)/len(wall))
+        (dx, dy) = (wall[0][0] - cx, wall[0][1] - cy)
+        hits = []
+        if dx:
+            hits.append(((self.right if dx > 0 else self.left) - cx)/dx)
+        if dy:
+            hits.append(((self.up if dy > 0 else self.down) - cy)/dy)
+        start = (cx + min(hits)*dx, cy + min(hits)*dy)
+        # Box corners counter-clockwise by their distance along the box from
+        # the lower right corner.
+        (width, height) = (self.right - self.left, self.up - self.down)
+        corners = [(0.0, (self.right, self.down)), (height, (self.right, self.up)),
+                   (height + width, (self.left, self.up)), (2.0*height + width, (self.left, self.down))]
+        if start[0] >= self.right:
+            position = start[1] - self.down
+        elif start[1] >= self.up:
+            position = height + self.right - start[0]
+        elif start[0] <= self.left:
+            position = height + width + self.up - start[1]
+        else:
+            position = 2.0*height + width + start[0] - self.left
+        path = ([start] + [corner for (s, corner) in corners if s > position] +
+                [corner for (s, corner) in corners if s <= position] + [start])
+        far = [PathPoint(path, t) for t in PathFractions(wall, path, closed=True)]
+        return (wall, far)
+
+    # Algebraic grid, with the cell sizes of LineSizes along each j line. Near
+    # the wall the layers are marched out along the normals of the layer before,
+    # smoothed a little so that lines do not cross in concave corners, until the
+    # cells are as thick as the wall spacing. From there the j lines run straight
+    # to their far points.
+    def _Algebraic(self, inner, far, firstHeight, growth, spread=0.25):
+        count = len(inner)
+        spacing = min(math.hypot(inner[i][0] - inner[i - 1][0], inner[i][1] - inner[i - 1][1])
+                      for i in range(1, count))
+        distances = [math.hypot(f[0] - p[0], f[1] - p[1]) for (p, f) in zip(inner, far)]
+        sizes = [LineSizes(firstHeight, growth, self.cells, distance) for distance in distances]
+        self.layers = 0
+        while self.layers < self.cells - 1 and max(size[self.layers] for size in sizes) < spacing:
+            self.layers += 1
+        self.x = [[px] for (px, py) in inner]
+        self.y = [[py] for (px, py) in inner]
+        layer = list(inner)
+        lines = range(count) if self.closed else range(1, count - 1)
+        for j in range(self.layers):
+            normals = LineNormals(layer, self.closed)
+            marched = [(px + size[j]*nx, py + size[j]*ny) for ((px, py), (nx, ny), size) in zip(layer, normals, sizes)]
+            layer = list(marched)
+            for i in lines:
+                (a, b) = (marched[i - 1], marched[(i + 1) % count])
+                (dx, dy) = (0.5*(a[0] + b[0]) - marched[i][0], 0.5*(a[1] + b[1]) - marched[i][1])
+                (nx, ny) = normals[i]
+                along = spread*(dx*ny - dy*nx)
+                layer[i] = (marched[i][0] + along*ny, marched[i][1] - along*nx)
+            for i in range(count):
+                self.x[i].append(layer[i][0])
+                self.y[i].append(layer[i][1])
+        for i in range(count):
+            (px, py) = layer[i]
+            (fx, fy) = far[i]
+            first = growth*sizes[i][self.layers - 1] if self.layers else firstHeight
+            rest = LineSizes(first, growth, self.cells - self.layers, math.hypot(fx - px, fy - py))
+            total = sum(rest)
+            d = 0.0
+            for size in rest[:-1]:
+                d += size
+                self.x[i].append(px + d/total*(fx - px))
+                self.y[i].append(py + d/total*(fy - py))
+            self.x[i].append(fx)
+            self.y[i].append(fy)
+
+    # Gauss-Seidel sweeps of the elliptic grid equations outside the marched
+    # layers, which stay as they are.
+    def Smooth(self, iterations, relaxation=0.8):
+        (x, y) = (self.x, self.y)
+        count = len(x)
+        cells = self.cells
+        first = max(self.layers, 1)
+        lines = range(count) if self.closed else range(1, count - 1)
+        psi = [[0.0]*(cells + 1) for i in range(count)]
+        for i in range(count):
+            for j in range(first, cells):
+                (ex, ey) = (0.5*(x[i][j + 1] - x[i][j - 1]), 0.5*(y[i][j + 1] - y[i][j - 1]))
+                (eex, eey) = (x[i][j + 1] - 2.0*x[i][j] + x[i][j - 1], y[i][j + 1] - 2.0*y[i][j] + y[i][j - 1])
+                psi[i][j] = -(ex*eex + ey*eey)/(ex*ex + ey*ey)
+        phi = [[0.0]*(cells + 1) for i in range(count)]
+        for i in lines:
+            (a, b) = ((i - 1) % count, (i + 1) % count)
+            ends = []
+            for j in (first - 1, cells):
+                (sx, sy) = (0.5*(x[b][j] - x[a][j]), 0.5*(y[b][j] - y[a][j]))
+                (ssx, ssy) = (x[b][j] - 2.0*x[i][j] + x[a][j], y[b][j] - 2.0*y[i][j] + y[a][j])
+                ends.append(-(sx*ssx + sy*ssy)/(sx*sx + sy*sy))
+            for j in range(first, cells):
+                t = float(j - first + 1)/(cells - first + 1)
+                phi[i][j] = (1.0 - t)*ends[0] + t*ends[1]
+        for iteration in range(iterations):
+            for i in lines:
+                (xa, ya, xb, yb) = (x[(i - 1) % count], y[(i - 1) % count], x[(i + 1) % count], y[(i + 1) % count])
+                (xi, yi, ps, fs) = (x[i], y[i], psi[i], phi[i])
+                for j in range(first, cells):
+                    (sx, sy) = (0.5*(xb[j] - xa[j]), 0.5*(yb[j] - ya[j]))
+                    (ex, ey) = (0.5*(xi[j + 1] - xi[j - 1]), 0.5*(yi[j + 1] - yi[j - 1]))
+                    alpha = ex*ex + ey*ey
+                    beta = sx*ex + sy*ey
+                    gamma = sx*sx + sy*sy
+                    cx = 0.25*(xb[j + 1] - xb[j - 1] - xa[j + 1] + xa[j - 1])
+                    cy = 0.25*(yb[j + 1] - yb[j - 1] - ya[j + 1] + ya[j - 1])
+                    denominator = 2.0*(alpha + gamma)
+                    nx = (alpha*(xb[j] + xa[j] + fs[j]*sx) - 2.0*beta*cx + gamma*(xi[j + 1] + xi[j - 1] + ps[j]*ex))/denominator
+                    ny = (alpha*(yb[j] + ya[j] + fs[j]*sy) - 2.0*beta*cy + gamma*(yi[j + 1] + yi[j - 1] + ps[j]*ey))/denominator
+                    xi[j] += relaxation*(nx - xi[j])
+                    yi[j] += relaxation*(ny - yi[j])
+
+    # Node index of every grid point, with the two sides of the wake cut of a
+    # C-grid sharing their nodes.
+    def _NodeIndex(self):
+        count = len(self.x)
+        index = [[0]*(self.cells + 1) for i in range(count)]
+        nodes = []
+        for i in range(count):
+            for j in range(self.cells + 1):
+                mirror = count - 1 - i
+                if j == 0 and not self.closed and mirror < i and mirror <= self.wakeCells:
+                    index[i][j] = index[mirror][j]
+                else:
+                    index[i][j] = len(nodes)
+                    nodes.append((self.x[i][j], self.y[i][j]))
+        return (nodes, index)
+
+    # Nodes and counter-clockwise quadrilaterals of the grid.
+    def Quads(self):
+        (nodes, index) = self._NodeIndex()
+        count = len(self.x)
+        quads = []
+        for i in range(count if self.closed else count - 1):
+            a = index[i]
+            b = index[(i + 1) % count]
+            for j in range(self.cells):
+                quads.append([a[j], a[j + 1], b[j + 1], b[j]])
+        return (nodes, quads)
+
+    # Boundary zone of face nodes on the box, or the airfoil.
+    def Zone(self, points):
+        scale = 1e-9*max(abs(self.right - self.left), abs(self.up - self.down))
+        for (name, axis, value) in (("inlet", 0, self.left), ("outlet", 0, self.right),
+                                    ("bottom", 1, self.down), ("top", 1, self.up)):
+            if all(abs(point[axis] - value) <= scale for point in points):
+                return name
+        return "airfoil"
+
+    # Nodes, quadrilaterals and faces per zone of the 2D grid.
+    def Fluid(self):
+        (nodes, quads) = self.Quads()
+        faces = CellFaces(quads, QUAD_FACES, lambda face: self.Zone([nodes[n] for n in face]))
+        return (nodes, quads, faces)
+
+    # Nodes, hexahedra and faces per zone of the grid stacked over span in
+    # layers layers, with the root at z 0 and the tip at z span.
+    def Stack(self, span, layers):
+        (plane, quads) = self.Quads()
+        nodes = [(x, y, span*k/layers) for k in range(layers + 1) for (x, y) in plane]
+        size = len(plane)
+        hexahedra = [[n + k*size for n in quad] + [n + (k + 1)*size for n in quad]
+                     for k in range(layers) for quad in quads]
+        def Zone(face):
+            z = [nodes[n][2] for n in face]
+            if max(z) == 0.0:
+                return "root"
+            if min(z) == nodes[-1][2]:
+                return "tip"
+            return self.Zone([nodes[n] for n in face])
+        faces = CellFaces(hexahedra, HEX_FACES, Zone)
+        return (nodes, hexahedra, faces)
+
+# Signed areas of quadrilaterals, for checks: all positive for a valid grid.
+def QuadAreas(nodes, quads):
+    areas = []
+    for quad in quads:
+        area = 0.0
+        for k in range(4):
+            (a, b) = (nodes[quad[k]], nodes[quad[(k + 1) % 4]])
+            area += a[0]*b[1] - b[0]*a[1]
+        areas.append(0.5*area)
+    return areas
+
+# Grid of the wizard inputs (AirfoilStages parameters): the 2D domain, or the
+# enclosure box around the wing stacked over the span in 3D. Returns nodes,
+# cells and faces per zone.
+def GridAirfoil(params, **options):
+    from TriMesh import AirfoilOutline
+    from WingSections import Lofted
+    if Lofted(params):
+        raise ValueError("Structured grids are stacked along a straight wing, not lofted through sections")
+    (outline, corners) = AirfoilOutline(params)
+    elemSize = params["ElemSize"]
+    if params["Mode"] == "2D":
+        box = params["Domain"]
+    else:
+        (LX, RX, DY, UY, FZ) = params["Enclosure"]
+        box = (min(x for (x, y) in outline) - LX, max(x for (x, y) in outline) + RX,
+               min(y for (x, y) in outline) - DY, max(y for (x, y) in outline) + UY)
+    options.setdefault("growth", params["Growth"])
+    grid = StructuredGrid(outline, corners, box, params["FirstHeight"], maxSize=elemSize, **options)
+    if params["Mode"] == "2D":
+        return grid.Fluid()
+    span = params["WingSpan"]
+    return grid.Stack(span, max(1, int(math.ceil(span/elemSize))))
+
+# Grid the default 2D wizard domain, with a sharp (C-grid) and a cut (O-grid)
+# trailing edge, and mesh it with TriMesh at the same wall resolution: the
+# first cell height as the element size along the airfoil.
+def Benchmark(firstHeights=(0.004, 0.002, 0.001)):
+    import AirfoilStages
+    import TriMesh
+    for firstHeight in firstHeights:
+        params = dict(AirfoilStages.DEFAULTS)
+        params["Naca"] = "2412"
+        params["Angle"] = 5.0
+        params["FirstHeight"] = firstHeight
+        for cut in ("No", "Yes"):
+            params["CutTE"] = cut
+            start = default_timer()
+            (nodes, quads, faces) = GridAirfoil(params)
+            elapsed = default_timer() - start
+            print("first height %.4f, %s-grid: %d cells in %.2f s, min area %.2e" %
+                  (firstHeight, "C" if cut == "No" else "O", len(quads), elapsed, min(QuadAreas(nodes, quads))))
+        (outline, corners) = TriMesh.AirfoilOutline(params)
+        start = default_timer()
+        (nodes, triangles, faces) = TriMesh.MeshDomain(outline, corners, params["Domain"], params["ElemSize"],
+                                                      wallSize=firstHeight)
+        elapsed = default_timer() - start
+        print("first height %.4f, TriMesh: %d cells in %.2f s" % (firstHeight, len(triangles), elapsed))
+
+if __name__ == "__main__":
+    Benchmark(*[[float(a) for a in sys.argv[1:]]] if sys.argv[1:] else [])
@@ -0,0 +1,416 @@
+# Headless parametric sweep over the wizard pipeline.
+#
+# A sweep definition is a JSON object with the wizard inputs. Any input given
+# as a list is swept, and the cases are the cartesian product of all swept
+# inputs. Domain and Enclosure are lists of numbers themselves, so a sweep over
+# them is a list of lists:
+#
+#     {"Mode": "2D", "Naca": ["0012", "2412"], "Chord": 1.0, "Angle": [0, 5],
+#      "Domain": [[-2, 2, -2, 2], [-4, 4, -4, 4]], "ElemSize": 0.08}
+#
+# Naca takes any profile name of ProfileSources, e.g. .dat files of a library
+# given as "Profiles": {"Naca": ["23012", "e387", "63(2)-415"], "Profiles": "uiuc.zip"}.
+#
+# Every case runs the wizard stages of AirfoilStages on a CadBackend, given as
+# "module:Class". The default MemoryBackend builds the same geometry in memory,
+# without the CAD host. With "Mesher": "Native", 2D cases are also meshed by
+# TriMesh, and with "Mesher": "Structured" all cases are gridded by
+# StructuredGrid, and the real cell count is reported instead of an estimate.
+# With "Sizing": "Adaptive", Mechanical cases report the cells MeshSizing
+# predicts for their local sizes, scaled to "CellBudget" if it is given.
+# Cases are checked by AirfoilValidation first: invalid ones are reported with
+# their problems and never reach the CAD stages.
+#
+# Results are appended to a JSON lines file as cases finish. Running the same
+# sweep again skips the cases already completed, so an interrupted sweep
+# resumes where it stopped. With --store, the coordinates, domain and mesh of
+# every case also go to an AirfoilStore file, one record per case id.
+#
+# With --cache, finished cases are kept in an ArtifactCache shared by the
+# workers and by later sweeps, their result and store arrays keyed on all
+# inputs of the case and the code version. A case found there is reported
+# from it, as cached, without running any stage.
+#
+# With --screen, the cases are first screened by their inviscid Cl and Cm at
+# their Angle (PanelSolver, by the panel method or thin airfoil theory), in
+# milliseconds per profile. Only the cases within the --keep limits, and of
+# these the --best ranked by Cl (highest) or Cm (smallest magnitude), are
+# built and meshed. The others are reported as screened, with their
+# coefficients. Lofted wings are not screened.
+#
+#     python SweepRunner.py sweep.json results.jsonl --workers 8 --store sweep.afs
+#     python SweepRunner.py sweep.json results.jsonl --screen panel --keep "Cl>=0.6" --best 20
+#     python SweepRunner.py sweep.json results.jsonl --cache sweep-cache --cache-size 2048
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+import itertools
+import importlib
+import traceback
+
+import AirfoilStages
+import TriMesh
+import StructuredGrid
+import MeshSizing
+import AirfoilStore
+import AirfoilValidation
+import ArtifactCache
+
+# Wizard defaults (AirfoilGenerator.xml), used for inputs a sweep leaves out.
+DEFAULTS = AirfoilStages.DEFAULTS
+
+# Inputs whose single value is itself a list.
+LIST_INPUTS = ("Domain", "Enclosure")
+
+# Values swept for one input: a list of values or a single value.
+def SweptValues(name, value):
+    if name in LIST_INPUTS:
+        if value and isinstance(value[0], (list, tuple)):
+            return [list(v) for v in value]
+        return [list(value)]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+# All cases of a sweep definition, in a stable order. Inputs it leaves out
+# take their value in defaults.
+def SweepCases(definition, defaults=DEFAULTS):
+    unknown = set(definition) - set(DEFAULTS)
+    if unknown:
+        raise ValueError("Unknown sweep inputs: " + ", ".join(sorted(unknown)))
+    names = sorted(DEFAULTS)
+    values = [SweptValues(name, definition.get(name, defaults[name])) for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+# Stable identifier of a case, from its inputs.
+def CaseId(case):
+    text = json.dumps(case, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+# Predicted element count of the fluid region for the global element size
+# (Mesh step): triangles in 2D, prisms over the enclosure span in 3D.
+def EstimatedCells(case, body):
+    size = case["ElemSize"]
+    cells = body.Area()/(math.sqrt(3.0)/4.0*size*size)
+    if body.span is not None:
+        cells = body.Volume()/(math.sqrt(3.0)/4.0*size*size*size)
+    return int(cells)
+
+# Create a backend from "module:Class".
+def LoadBackend(spec):
+    (moduleName, className) = spec.split(":")
+    return getattr(importlib.import_module(moduleName), className)()
+
+_backend = None
+_export = False
+_cache = None
+
+def _InitWorker(spec, export=False, cachePath=None, cacheBytes=1 << 30):
+    global _backend, _export, _cache
+    _backend = LoadBackend(spec)
+    _export = export
+    _cache = ArtifactCache.ArtifactCache(cachePath, cacheBytes) if cachePath is not None else None
+
+# Store arrays of a case: its coordinates, domain and mesh, if it is meshed.
+def CaseArrays(case, mesh=None):
+    arrays = AirfoilStore.CoordinateArrays(*AirfoilStages.AirfoilCoordinates(case))
+    arrays.update(AirfoilStore.DomainArrays(case))
+    if mesh is not None:
+        arrays.update(AirfoilStore.MeshArrays(*mesh))
+    return arrays
+
+# Result of a case from the cache entry of key, with its store arrays in
+# result["arrays"] if export is set, or None if it is not cached.
+def CachedCase(cache, key, export=False):
+    directory = tempfile.mkdtemp()
+    try:
+        names = ["result.json", "arrays.afs"] if export else ["result.json"]
+        if cache.Fetch(key, directory, names) is None:
+            return None
+        with open(os.path.join(directory, "result.json")) as stream:
+            result = json.load(stream)
+        if export:
+            with AirfoilStore.StoreReader(os.path.join(directory, "arrays.afs")) as store:
+                result["arrays"] = store.Tables("case")
+        return result
+    finally:
+        shutil.rmtree(directory, True)
+
+# Keep the result of a finished case and its store arrays as the cache entry
+# of key.
+def CacheCase(cache, key, result, arrays):
+    def Write(entry):
+        with open(os.path.join(entry, "result.json"), "w") as stream:
+            json.dump(result, stream, sort_keys=True)
+        with AirfoilStore.StoreWriter(os.path.join(entry, "arrays.afs")) as store:
+            store.Add("case", result["case"], arrays)
+    cache.Put(key, Write)
+
+# Run all stages of one case and report the fluid body, as MemoryBackend
+# exposes it (Body, selections). Cases that fail AirfoilValidation are
+# reported as invalid without running any stage, and errors are reported in
+# the result, so one bad case does not stop the sweep. With export, the store arrays of the case are
+# returned in result["arrays"]. With a cache, a case found there is returned
+# from it, and a case that runs ok is kept there. Cache errors are reported in
+# result["cache_error"] and the case runs or stays ok without it.
+def RunCase(case, backend=None, export=None, cache=None):
+    backend = backend or _backend
+    export = _export if export is None else export
+    cache = cache or _cache
+    start = time.time()
+    result = {"id": CaseId(case), "case": case}
+    mesh = None
+    arrays = None
+    problems = AirfoilValidation.Validate(case)
+    if problems:
+        result["status"] = "invalid"
+        result["problems"] = problems
+        result["seconds"] = time.time() - start
+        return result
+    key = None
+    if cache is not None:
+        key = ArtifactCache.ArtifactKey(case, "sweep " + type(backend).__name__)
+        try:
+            cached = CachedCase(cache, key, export)
+        except Exception:
+            result["cache_error"] = traceback.format_exc()
+            (cached, key) = (None, None)
+        if cached is not None:
+            result.update(cached)
+            result["cached"] = True
+            result["seconds"] = time.time() - start
+            return result
+    try:
+        backend.DeleteAll()
+        # Sketch the airfoil in its final pose when the stages allow it, so
+        # the case runs no CAD transform.
+        posed = AirfoilStages.SketchPosed(case)
+        AirfoilStages.BuildAirfoil(backend, case, posed=posed)
+        AirfoilStages.BuildScaleRotatePull(backend, case, posed)
+        AirfoilStages.BuildDomainOrEnclosure(backend, case)
+        body = backend.Body()
+        result["status"] = "ok"
+        result["domain"] = {"bounds": [float(b) for b in body.Bounds()],
+                            "area": float(body.Area()), "volume": float(body.Volume()),
+                            "faces": len(body.Faces()),
+                            "selections": [name for (name, faces) in backend.selections]}
+        if case["Mesher"] == "Native" and case["Mode"] == "2D":
+            meshStart = time.time()
+            mesh = (nodes, triangles, faces) = TriMesh.MeshAirfoil(case)
+            result["mesh"] = {"cells": len(triangles), "nodes": len(nodes),
+                              "min_angle": TriMesh.MinimumAngle(nodes, triangles),
+                              "seconds": time.time() - meshStart}
+        elif case["Mesher"] == "Structured":
+            meshStart = time.time()
+            mesh = (nodes, cells, faces) = StructuredGrid.GridAirfoil(case)
+            result["mesh"] = {"cells": len(cells), "nodes": len(nodes), "seconds": time.time() - meshStart}
+        elif case["Sizing"] == "Adaptive":
+            (controls, cells) = MeshSizing.AirfoilSizing(case, case["CellBudget"] or None)
+            result["mesh"] = {"cells": int(cells), "wall": controls["wall"], "far": controls["far"],
+                              "spheres": len(controls["spheres"])}
+        else:
+            result["mesh"] = {"cells": EstimatedCells(case, body)}
+        if export or key is not None:
+            arrays = CaseArrays(case, mesh)
+    except Exception:
+        result["status"] = "error"
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.time() - start
+    if key is not None and result["status"] == "ok":
+        # A cache that fails, e.g. a lock held too long or a full disk, only
+        # costs the case its entry.
+        try:
+            CacheCase(cache, key, result, arrays)
+        except Exception:
+            result["cache_error"] = traceback.format_exc()
+    if export and arrays is not None:
+        result["arrays"] = arrays
+    return result
+
+# Ids of the cases already completed in a results file, with one of the given
+# statuses.
+def CompletedCases(path, statuses=("ok", "invalid")):
+    done = set()
+    try:
+        with open(path) as results:
+            for line in results:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("status") in statuses:
+                    done.add(record["id"])
+    except IOError:
+        pass
+    return done
+
+# Print a one line progress report.
+def PrintProgress(done, total, failed, elapsed):
+    rate = done/elapsed if elapsed > 0 else 0.0
+    remaining = (total - done)/rate if rate > 0 else 0.0
+    sys.stdout.write("\r%d/%d cases, %d failed, %.1f cases/s, %.0f s left " %
+                     (done, total, failed, rate, remaining))
+    sys.stdout.flush()
+
+# Limits of a screen, as "Cl>=0.6" or "Cm>-0.05".
+SCREEN_LIMIT = re.compile(r"^\s*(Cl|Cm)\s*(<=|>=|<|>)\s*([-+.0-9eE]+)\s*$")
+
+# (name, comparison, value) of every screen limit.
+def ScreenLimits(expressions):
+    limits = []
+    for expression in expressions:
+        match = SCREEN_LIMIT.match(expression)
+        if match is None:
+            raise ValueError("Screen limits are given as Cl or Cm, a comparison and a number: " + expression)
+        limits.append((match.group(1), match.group(2), float(match.group(3))))
+    return limits
+
+# Check if coefficients are within a screen limit.
+def WithinLimit(aero, limit):
+    (name, comparison, value) = limit
+    if comparison == "<":
+        return aero[name] < value
+    if comparison == "<=":
+        return aero[name] <= value
+    if comparison == ">":
+        return aero[name] > value
+    return aero[name] >= value
+
+# Indices of the cases that pass a screen, from their coefficients (None for
+# cases that are not screened): within all limits and, with best, among the
+# best ranked by Cl, highest first, or by Cm, smallest magnitude first.
+def ScreenCases(aero, limits=(), best=None, rank="Cl"):
+    passed = [k for (k, found) in enumerate(aero)
+              if found is not None and all(WithinLimit(found, limit) for limit in limits)]
+    if best is not None:
+        if rank == "Cl":
+            passed.sort(key=lambda k: -aero[k]["Cl"])
+        else:
+            passed.sort(key=lambda k: abs(aero[k]["Cm"]))
+        passed = passed[:best]
+    return set(passed) | set(k for (k, found) in enumerate(aero) if found is None)
+
+# Ids of the cases in a store file.
+def StoredCases(path):
+    try:
+        with AirfoilStore.StoreReader(path) as store:
+            return set(store.Names())
+    except (IOError, OSError, ValueError):
+        return set()
+
+# Run a sweep, appending one JSON line per case to resultsPath, and the arrays
+# of the cases to the store at storePath, if given. screen is a dict with the
+# "method" of PanelSolver.SweepAerodynamics and the "limits", "best" and
+# "rank" of ScreenCases; the cases it drops are written as screened, once.
+# With cachePath, the workers share an ArtifactCache of cacheBytes there.
+# Returns the number of cases run and the number that failed.
+def RunSweep(definition, resultsPath, workers=None, backend="MemoryBackend:MemoryBackend",
+             progress=PrintProgress, chunkSize=4, storePath=None, flushEvery=50, screen=None,
+             cachePath=None, cacheBytes=1 << 30):
+    cases = SweepCases(definition)
+    completed = CompletedCases(resultsPath)
+    if storePath is not None:
+        completed = (completed & StoredCases(storePath)) | CompletedCases(resultsPath, ("invalid",))
+    aero = {}
+    screened = []
+    if screen is not None:
+        import PanelSolver
+        found = PanelSolver.SweepAerodynamics(cases, screen.get("method", "panel"))
+        kept = ScreenCases(found, screen.get("limits", ()), screen.get("best"), screen.get("rank", "Cl"))
+        recorded = completed | CompletedCases(resultsPath, ("screened",))
+        for (k, case) in enumerate(cases):
+            if found[k] is not None:
+                aero[CaseId(case)] = found[k]
+            if k not in kept and CaseId(case) not in recorded:
+                screened.append({"id": CaseId(case), "case": case, "status": "screened", "aero": found[k]})
+        if progress is not None:
+            print("%d of %d cases screened out" % (len(cases) - len(kept), len(cases)))
+        cases = [case for (k, case) in enumerate(cases) if k in kept]
+    pending = [case for case in cases if CaseId(case) not in completed]
+
+    if screened:
+        with open(resultsPath, "a") as results:
+            for result in screened:
+                results.write(json.dumps(result, sort_keys=True) + "\n")
+    done = 0
+    failed = 0
+    start = time.time()
+    # The wizard imports this module for SweepCases, and IronPython has no
+    # multiprocessing.
+    import multiprocessing
+    store = AirfoilStore.StoreWriter(storePath) if storePath is not None else None
+    pool = multiprocessing.Pool(workers, _InitWorker, (backend, store is not None, cachePath, cacheBytes))
+    try:
+        with open(resultsPath, "a") as results:
+            for result in pool.imap_unordered(RunCase, pending, chunkSize):
+                if result["id"] in aero:
+                    result["aero"] = aero[result["id"]]
+                arrays = result.pop("arrays", None)
+                if arrays is not None:
+                    store.Add(result["id"], result["case"], arrays)
+                    if (done + 1) % flushEvery == 0:
+                        store.Flush()
+                results.write(json.dumps(result, sort_keys=True) + "\n")
+                results.flush()
+                done += 1
+                if result["status"] != "ok":
+                    failed += 1
+                if progress is not None:
+                    progress(done, len(pending), failed, time.time() - start)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if store is not None:
+            store.Close()
+    if progress is not None:
+        sys.stdout.write("\n")
+    return (done, failed)
+
+def Main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a headless airfoil sweep.")
+    parser.add_argument("sweep", help="sweep definition (JSON)")
+    parser.add_argument("results", help="results file (JSON lines), appended to")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--backend", default="MemoryBackend:MemoryBackend",
+                        help="CAD backend as module:Class")
+    parser.add_argument("--store", default=None,
+                        help="store file for the coordinates, domains and meshes (AirfoilStore)")
+    parser.add_argument("--screen", choices=("panel", "thin"), default=None,
+                        help="screen the cases by their inviscid Cl and Cm first (PanelSolver)")
+    parser.add_argument("--keep", action="append", default=[],
+                        help="limit of the screen, e.g. Cl>=0.6 or Cm>-0.05; repeat for more")
+    parser.add_argument("--best", type=int, default=None, help="run only the best screened cases")
+    parser.add_argument("--rank", choices=("Cl", "Cm"), default="Cl",
+                        help="rank for --best: highest Cl or smallest |Cm|")
+    parser.add_argument("--cache", default=None,
+                        help="directory of a cache of finished cases, shared across sweeps (ArtifactCache)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="cache size bound in MB")
+    args = parser.parse_args(argv)
+
+    screen = None
+    if args.screen is not None:
+        try:
+            limits = ScreenLimits(args.keep)
+        except ValueError as error:
+            parser.error(str(error))
+        screen = {"method": args.screen, "limits": limits, "best": args.best, "rank": args.rank}
+    elif args.keep or args.best is not None:
+        parser.error("--keep and --best need --screen")
+    with open(args.sweep) as sweep:
+        definition = json.load(sweep)
+    (done, failed) = RunSweep(definition, args.results, args.workers, args.backend, storePath=args.store,
+                              screen=screen, cachePath=args.cache, cacheBytes=args.cache_size << 20)
+    print("%d cases run, %d failed" % (done, failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(Main())
@@ -0,0 +1,545 @@
+# Native 2D triangle mesher for the airfoil domain.
+#
+# Meshes the fluid region between the domain rectangle and the airfoil without
+# Mechanical and writes a Fluent mesh file. The boundary is split with sizes
+# graded by curvature (curvatureAngle degrees of turning per element, as
+# Mechanical's Capture Curvature) and by proximity (gapCells elements across
+# the gap between the airfoil and the domain, as Capture Proximity). Inside,
+# the element size grows from the boundary sizes by growth per element length,
+# up to elemSize. FluentMesh.WriteFluentMesh writes the result.
+#
+# The mesh is a constrained Delaunay triangulation, built by Bowyer-Watson
+# insertion and refined by inserting circumcenters of triangles that are too
+# big or too skewed (Ruppert's algorithm, minimum angle about 20 degrees).
+# Plain Python, so it also runs in the wizard.
+#
+# Run this file directly for a cells per second benchmark:
+#     python TriMesh.py [elemSize ...]
+
+import sys
+import math
+from collections import deque
+from timeit import default_timer
+
+from FluentMesh import ZONES
+from WingSections import PoseProfile
+
+FLUID = 1
+OUTSIDE = 0
+
+# Twice the signed area of a,b,c (positive counter-clockwise).
+def Orient(ax, ay, bx, by, cx, cy):
+    return (bx - ax)*(cy - ay) - (by - ay)*(cx - ax)
+
+# Center and squared radius of the circle through a,b,c.
+def Circumcircle(ax, ay, bx, by, cx, cy):
+    d = 2.0*(ax*(by - cy) + bx*(cy - ay) + cx*(ay - by))
+    a2 = ax*ax + ay*ay
+    b2 = bx*bx + by*by
+    c2 = cx*cx + cy*cy
+    ux = (a2*(by - cy) + b2*(cy - ay) + c2*(ay - by))/d
+    uy = (a2*(cx - bx) + b2*(ax - cx) + c2*(bx - ax))/d
+    return (ux, uy, (ax - ux)**2 + (ay - uy)**2)
+
+# Element size at a point: the smallest of the source sizes grown by
+# (growth - 1) per unit distance from the source, and maxSize. Sources are
+# kept in square buckets; a bucket is skipped when no source in it can give a
+# smaller size than the best one found so far.
+class SizeField(object):
+    def __init__(self, sources, maxSize, growth):
+        self.maxSize = maxSize
+        self.slope = growth - 1.0
+        cell = maxSize
+        buckets = {}
+        for (x, y, h) in sources:
+            if h < maxSize:
+                buckets.setdefault((int(math.floor(x/cell)), int(math.floor(y/cell))), []).append((x, y, h))
+        self.buckets = [(i*cell, j*cell, (i + 1)*cell, (j + 1)*cell, min(h for (x, y, h) in inside), inside)
+                        for ((i, j), inside) in buckets.items()]
+
+    def __call__(self, x, y):
+        best = self.maxSize
+        slope = self.slope
+        for (x0, y0, x1, y1, hMin, inside) in self.buckets:
+            dx = x0 - x if x < x0 else (x - x1 if x > x1 else 0.0)
+            dy = y0 - y if y < y0 else (y - y1 if y > y1 else 0.0)
+            if hMin + slope*math.sqrt(dx*dx + dy*dy) >= best:
+                continue
+            for (sx, sy, sh) in inside:
+                h = sh + slope*math.sqrt((x - sx)*(x - sx) + (y - sy)*(y - sy))
+                if h < best:
+                    best = h
+        return best
+
+# Source sizes at the vertices of a closed outline: curvature, proximity to
+# the box and, at corners, the length of the adjacent runs.
+def OutlineSizes(outline, corners, box, elemSize, curvatureAngle, gapCells):
+    (left, right, down, up) = box
+    n = len(outline)
+    angle = math.radians(curvatureAngle)
+    sizes = []
+    for i in range(n):
+        (x0, y0) = outline[i - 1]
+        (x1, y1) = outline[i]
+        (x2, y2) = outline[(i + 1) % n]
+        before = math.hypot(x1 - x0, y1 - y0)
+        after = math.hypot(x2 - x1, y2 - y1)
+        turn = abs(math.atan2(Orient(x0, y0, x1, y1, x2, y2),
+                              (x1 - x0)*(x2 - x1) + (y1 - y0)*(y2 - y1)))
+        h = elemSize
+        if 0.0 < turn < math.radians(45.0):
+            h = min(h, angle*0.5*(before + after)/turn)
+        gap = min(x1 - left, right - x1, y1 - down, up - y1)
+        h = min(h, max(gap, 0.0)/gapCells)
+        sizes.append(h)
+    # A run between two corners is at least one element.
+    for (k, corner) in enumerate(corners):
+        end = corners[(k + 1) % len(corners)]
+        length = 0.0
+        i = corner
+        while True:
+            j = (i + 1) % n
+            length += math.hypot(outline[j][0] - outline[i][0], outline[j][1] - outline[i][1])
+            i = j
+            if i == end:
+                break
+        sizes[corner] = min(sizes[corner], length)
+        sizes[end] = min(sizes[end], length)
+    return sizes
+
+# Points along a polyline, spaced by the size field. The first point is kept,
+# the last one is left out (it starts the next run).
+def ResampleRun(points, size):
+    samples = [points[0]]
+    for (p, q) in zip(points[:-1], points[1:]):
+        length = math.hypot(q[0] - p[0], q[1] - p[1])
+        pieces = max(1, int(math.ceil(length/(0.5*min(size(p[0], p[1]), size(q[0], q[1]))))))
+        for k in range(1, pieces + 1):
+            s = float(k)/pieces
+            samples.append((p[0] + s*(q[0] - p[0]), p[1] + s*(q[1] - p[1])))
+    # Integral of ds/h along the run, by the trapezoidal rule.
+    counts = [0.0]
+    h0 = size(samples[0][0], samples[0][1])
+    for (p, q) in zip(samples[:-1], samples[1:]):
+        h1 = size(q[0], q[1])
+        counts.append(counts[-1] + math.hypot(q[0] - p[0], q[1] - p[1])*0.5*(1.0/h0 + 1.0/h1))
+        h0 = h1
+    n = max(1, int(round(counts[-1])))
+    resampled = [points[0]]
+    k = 1
+    for i in range(1, len(samples)):
+        while k < n and counts[i] >= counts[-1]*k/n:
+            s = (counts[-1]*k/n - counts[i - 1])/(counts[i] - counts[i - 1])
+            (p, q) = (samples[i - 1], samples[i])
+            resampled.append((p[0] + s*(q[0] - p[0]), p[1] + s*(q[1] - p[1])))
+            k += 1
+    return resampled
+
+# Boundary points and zones: the box sides counter-clockwise from the bottom,
+# then the airfoil runs between its corners. Returns the points and a list of
+# (first, count, zone) loops, each closed on its first point.
+def BoundaryPoints(outline, corners, box, size):
+    (left, right, down, up) = box
+    points = []
+    loops = []
+    boxCorners = [(left, down), (right, down), (right, up), (left, up)]
+    zones = []
+    for (k, zone) in enumerate(("bottom", "outlet", "top", "inlet")):
+        run = ResampleRun([boxCorners[k], boxCorners[(k + 1) % 4]], size)
+        points.extend(run)
+        zones.extend([zone]*len(run))
+    loops.append((0, len(points)))
+    first = len(points)
+    n = len(outline)
+    for (k, corner) in enumerate(corners):
+        end = corners[(k + 1) % len(corners)]
+        run = [outline[corner]]
+        i = corner
+        while True:
+            i = (i + 1) % n
+            run.append(outline[i])
+            if i == end:
+                break
+        run = ResampleRun(run, size)
+        points.extend(run)
+        zones.extend(["airfoil"]*len(run))
+    loops.append((first, len(points) - first))
+    return (points, zones, loops)
+
+class TriMesh(object):
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self.x = []
+        self.y = []
+        self.vertexTriangle = []
+        self.tv = []
+        self.tn = []
+        self.tc = []
+        self.region = []
+        self.alive = []
+        self.segments = {}
+        (cx, cy) = (0.5*(xmin + xmax), 0.5*(ymin + ymax))
+        d = 20.0*max(xmax - xmin, ymax - ymin)
+        a = self._AddPoint(cx - d, cy - d)
+        b = self._AddPoint(cx + d, cy - d)
+        c = self._AddPoint(cx, cy + d)
+        self._AddTriangle(a, b, c, OUTSIDE)
+        self.tn[0] = [-1, -1, -1]
+        self.superVertices = 3
+
+    def _AddPoint(self, x, y):
+        self.x.append(x)
+        self.y.append(y)
+        self.vertexTriangle.append(-1)
+        return len(self.x) - 1
+
+    def _AddTriangle(self, a, b, c, region):
+        (x, y) = (self.x, self.y)
+        t = len(self.tv)
+        self.tv.append([a, b, c])
+        self.tn.append([-1, -1, -1])
+        self.tc.append(Circumcircle(x[a], y[a], x[b], y[b], x[c], y[c]))
+        self.region.append(region)
+        self.alive.append(True)
+        self.vertexTriangle[a] = t
+        self.vertexTriangle[b] = t
+        self.vertexTriangle[c] = t
+        return t
+
+    @staticmethod
+    def _Key(a, b):
+        return (a, b) if a < b else (b, a)
+
+    # Triangle containing x,y, walking from triangle t. Also returns the first
+    # segment crossed on the way, if any.
+    def Locate(self, x, y, t):
+        (px, py, tv, tn) = (self.x, self.y, self.tv, self.tn)
+        crossed = None
+        steps = 0
+        while True:
+            v = tv[t]
+            moved = False
+            for k in range(3):
+                i = (k + steps) % 3
+                a = v[(i + 1) % 3]
+                b = v[(i + 2) % 3]
+                if Orient(px[a], py[a], px[b], py[b], x, y) < 0.0:
+                    if crossed is None and self._Key(a, b) in self.segments:
+                        crossed = self._Key(a, b)
+                    t = tn[t][i]
+                    moved = True
+                    break
+            if not moved:
+                return (t, crossed)
+            steps += 1
+
+    # Triangle with the edge a-b on its counter-clockwise side, or None.
+    def FindEdge(self, a, b):
+        start = t = self.vertexTriangle[a]
+        while True:
+            v = self.tv[t]
+            i = v.index(a)
+            if v[(i + 1) % 3] == b:
+                return t
+            if v[(i + 2) % 3] == b:
+                return self.tn[t][(i + 1) % 3]
+            t = self.tn[t][(i + 2) % 3]
+            if t < 0 or t == start:
+                return None
+
+    # Triangles whose circumcircle contains x,y, reached from starts without
+    # crossing a segment other than split, and the edges around them.
+    def _Cavity(self, x, y, starts, split=None):
+        (tv, tn, tc, segments) = (self.tv, self.tn, self.tc, self.segments)
+        cavity = set(starts)
+        stack = list(starts)
+        edges = []
+        while stack:
+            t = stack.pop()
+            v = tv[t]
+            for i in range(3):
+                n = tn[t][i]
+                a = v[(i + 1) % 3]
+                b = v[(i + 2) % 3]
+                if n in cavity:
+                    continue
+                key = (a, b) if a < b else (b, a)
+                if n >= 0 and (key == split or key not in segments):
+                    (ux, uy, r2) = tc[n]
+                    if (x - ux)**2 + (y - uy)**2 < r2:
+                        cavity.add(n)
+                        stack.append(n)
+                        continue
+                edges.append((a, b, n, t))
+        # Edges of triangles added after their neighbour was visited.
+        return (cavity, [e for e in edges if e[2] not in cavity])
+
+    # Check that x,y sees every edge around the cavity.
+    def _StarShaped(self, x, y, edges):
+        (px, py) = (self.x, self.y)
+        for (a, b, n, t) in edges:
+            if Orient(px[a], py[a], px[b], py[b], x, y) <= 0.0:
+                return False
+        return True
+
+    # Replace the cavity by triangles fanning out from a new point x,y.
+    def _Fill(self, x, y, cavity, edges):
+        (tv, tn) = (self.tv, self.tn)
+        p = self._AddPoint(x, y)
+        for t in cavity:
+            self.alive[t] = False
+        startAt = {}
+        endAt = {}
+        for (a, b, n, t) in edges:
+            new = self._AddTriangle(a, b, p, self.region[t])
+            tn[new][2] = n
+            if n >= 0:
+                v = tv[n]
+                for j in range(3):
+                    if v[(j + 1) % 3] == b and v[(j + 2) % 3] == a:
+                        tn[n][j] = new
+            startAt[a] = new
+            endAt[b] = new
+        for (a, b, n, t) in edges:
+            new = startAt[a]
+            tn[new][0] = startAt[b]
+            tn[new][1] = endAt[a]
+        return p
+
+    # Insert a point, starting the search at triangle t. Returns the new
+    # vertex, or None if the point could not be inserted.
+    def Insert(self, x, y, t=None):
+        if t is None:
+            t = len(self.tv) - 1
+            while not self.alive[t]:
+                t -= 1
+        (t, crossed) = self.Locate(x, y, t)
+        (cavity, edges) = self._Cavity(x, y, [t])
+        if not self._StarShaped(x, y, edges):
+            return None
+        return self._Fill(x, y, cavity, edges)
+
+    # Split segment key at its midpoint.
+    def SplitSegment(self, key):
+        (a, b) = key
+        t = self.FindEdge(a, b)
+        v = self.tv[t]
+        i = v.index(a)
+        other = self.tn[t][(i + 2) % 3]
+        x = 0.5*(self.x[a] + self.x[b])
+        y = 0.5*(self.y[a] + self.y[b])
+        (cavity, edges) = self._Cavity(x, y, [t, other], key)
+        if not self._StarShaped(x, y, edges):
+            return None
+        m = self._Fill(x, y, cavity, edges)
+        zone = self.segments.pop(key)
+        self.segments[self._Key(a, m)] = zone
+        self.segments[self._Key(m, b)] = zone
+        return m
+
+    # Make the boundary edges part of the triangulation, splitting the ones
+    # that are missing, and mark the triangles inside the box and outside the
+    # airfoil as fluid.
+    def Constrain(self, boundary):
+        pending = list(boundary)
+        while pending:
+            (a, b, zone) = pending.pop()
+            if self.FindEdge(a, b) is not None:
+                self.segments[self._Key(a, b)] = zone
+                continue
+            m = self.Insert(0.5*(self.x[a] + self.x[b]), 0.5*(self.y[a] + self.y[b]), self.vertexTriangle[a])
+            if m is None:
+                raise RuntimeError("cannot recover boundary edge %d-%d" % (a, b))
+            pending.append((a, m, zone))
+            pending.append((m, b, zone))
+
+        (a, b, zone) = boundary[0]
+        seed = self.FindEdge(a, b)
+        stack = [seed]
+        self.region[seed] = FLUID
+        while stack:
+            t = stack.pop()
+            v = self.tv[t]
+            for i in range(3):
+                n = self.tn[t][i]
+                if n < 0 or self.region[n] == FLUID:
+                    continue
+                if self._Key(v[(i + 1) % 3], v[(i + 2) % 3]) in self.segments:
+                    continue
+                self.region[n] = FLUID
+                stack.append(n)
+
+    # Refine the fluid triangles until their edges are at most the local size
+    # and the circumradius to shortest edge ratio is at most sqrt(2). Sizes
+    # below minSize are not refined further.
+    def Refine(self, size, minSize, maxPoints=1000000):
+        (px, py) = (self.x, self.y)
+        queue = deque(t for t in range(len(self.tv)) if self.alive[t] and self.region[t] == FLUID)
+        while queue:
+            t = queue.popleft()
+            if not self.alive[t] or self.region[t] != FLUID:
+                continue
+            (a, b, c) = self.tv[t]
+            r2 = self.tc[t][2]
+            shortest = min((px[a] - px[b])**2 + (py[a] - py[b])**2,
+                           (px[b] - px[c])**2 + (py[b] - py[c])**2,
+                           (px[c] - px[a])**2 + (py[c] - py[a])**2)
+            if r2 > 2.0*shortest and shortest > minSize*minSize:
+                pass
+            else:
+                h = size((px[a] + px[b] + px[c])/3.0, (py[a] + py[b] + py[c])/3.0)
+                if 3.0*r2 <= h*h:
+                    continue
+            first = len(self.tv)
+            self._RefineTriangle(t, minSize)
+            queue.extend(range(first, len(self.tv)))
+            if len(self.x) > maxPoints:
+                raise RuntimeError("mesh exceeds %d points" % maxPoints)
+
+    # Insert the circumcenter of triangle t, or split the segment it
+    # encroaches on.
+    def _RefineTriangle(self, t, minSize):
+        (x, y, r2) = self.tc[t]
+        (loc, crossed) = self.Locate(x, y, t)
+        if crossed is None and self.region[loc] != FLUID:
+            return None
+        if crossed is None:
+            (cavity, edges) = self._Cavity(x, y, [loc])
+            for (a, b, n, owner) in edges:
+                key = self._Key(a, b)
+                if key in self.segments:
+                    mx = 0.5*(self.x[a] + self.x[b])
+                    my = 0.5*(self.y[a] + self.y[b])
+                    if 4.0*((x - mx)**2 + (y - my)**2) < (self.x[a] - self.x[b])**2 + (self.y[a] - self.y[b])**2:
+                        crossed = key
+                        break
+        if crossed is not None:
+            (a, b) = crossed
+            if math.hypot(self.x[a] - self.x[b], self.y[a] - self.y[b]) < 2.0*minSize:
+                return None
+            return self.SplitSegment(crossed)
+        if not self._StarShaped(x, y, edges):
+            return None
+        return self._Fill(x, y, cavity, edges)
+
+    # Fluid mesh: nodes, triangles (counter-clockwise, 0-based node indices)
+    # and the faces of each zone as (n0, n1, c0, c1), the cell c0 on the right
+    # of n0 -> n1 and c1 = -1 on the boundary, all 0-based.
+    def Fluid(self):
+        cells = [t for t in range(len(self.tv)) if self.alive[t] and self.region[t] == FLUID]
+        nodeIndex = {}
+        nodes = []
+        triangles = []
+        for t in cells:
+            triangle = []
+            for v in self.tv[t]:
+                if v not in nodeIndex:
+                    nodeIndex[v] = len(nodes)
+                    nodes.append((self.x[v], self.y[v]))
+                triangle.append(nodeIndex[v])
+            triangles.append(triangle)
+        cellIndex = dict((t, i) for (i, t) in enumerate(cells))
+        faces = dict((zone[0], []) for zone in ZONES)
+        faces["interior"] = []
+        for t in cells:
+            v = self.tv[t]
+            for i in range(3):
+                a = v[(i + 1) % 3]
+                b = v[(i + 2) % 3]
+                n = self.tn[t][i]
+                if n in cellIndex:
+                    if t < n:
+                        faces["interior"].append((nodeIndex[b], nodeIndex[a], cellIndex[t], cellIndex[n]))
+                else:
+                    zone = self.segments.get(self._Key(a, b), "airfoil")
+                    faces[zone].append((nodeIndex[b], nodeIndex[a], cellIndex[t], -1))
+        return (nodes, triangles, faces)
+
+# Smallest angle in degrees of the triangles.
+def MinimumAngle(nodes, triangles):
+    smallest = 180.0
+    for (a, b, c) in triangles:
+        for (p, q, r) in ((a, b, c), (b, c, a), (c, a, b)):
+            (ux, uy) = (nodes[q][0] - nodes[p][0], nodes[q][1] - nodes[p][1])
+            (vx, vy) = (nodes[r][0] - nodes[p][0], nodes[r][1] - nodes[p][1])
+            angle = math.degrees(abs(math.atan2(ux*vy - uy*vx, ux*vx + uy*vy)))
+            smallest = min(smallest, angle)
+    return smallest
+
+# Mesh the fluid between the box (left, right, down, up) and the closed airfoil
+# outline, whose corners are the indices where one edge ends and the next one
+# starts. wallSize, if given, caps the element size along the outline. Returns
+# nodes, triangles and faces per zone, as TriMesh.Fluid.
+def MeshDomain(outline, corners, box, elemSize, growth=1.2, curvatureAngle=18.0, gapCells=3,
+               maxPoints=1000000, wallSize=None):
+    (left, right, down, up) = box
+    outline = [(float(x), float(y)) for (x, y) in outline]
+    corners = sorted(corners) or [0]
+    sizes = OutlineSizes(outline, corners, box, elemSize, curvatureAngle, gapCells)
+    if wallSize is not None:
+        sizes = [min(h, wallSize) for h in sizes]
+    size = SizeField([(x, y, h) for ((x, y), h) in zip(outline, sizes)], elemSize, growth)
+    (points, zones, loops) = BoundaryPoints(outline, corners, box, size)
+
+    # Points are inserted along the loops, each walk starting next to the point
+    # before.
+    mesh = TriMesh(left, down, right, up)
+    vertices = [None]*len(points)
+    start = None
+    for i in range(len(points)):
+        vertices[i] = mesh.Insert(points[i][0], points[i][1], start)
+        if vertices[i] is not None:
+            start = mesh.vertexTriangle[vertices[i]]
+        if vertices[i] is None:
+            raise RuntimeError("cannot insert boundary point %r" % (points[i],))
+    boundary = []
+    for (first, count) in loops:
+        for k in range(count):
+            i = first + k
+            j = first + (k + 1) % count
+            boundary.append((vertices[i], vertices[j], zones[i]))
+    mesh.Constrain(boundary)
+    mesh.Refine(size, 0.25*min(sizes), maxPoints)
+    return mesh.Fluid()
+
+# Airfoil outline and its corners in the pose of the Extra Definitions step,
+# for AirfoilStages parameters.
+def AirfoilOutline(params):
+    import AirfoilStages
+    params = dict(params)
+    if params["CutTE"] == "Yes":
+        params["CutMethod"] = "Analytic"
+    (x, y) = AirfoilStages.AirfoilCoordinates(params)
+    outline = []
+    for point in zip(x, y):
+        if not outline or point != outline[-1]:
+            outline.append(point)
+    corners = [0]
+    if outline[0] == outline[-1]:
+        outline.pop()
+    else:
+        corners.append(len(outline) - 1)
+    (x, y) = zip(*outline)
+    return (PoseProfile(x, y, params["Chord"], params["Angle"]), corners)
+
+# Mesh the 2D domain of the wizard inputs (AirfoilStages parameters).
+def MeshAirfoil(params, **options):
+    (outline, corners) = AirfoilOutline(params)
+    return MeshDomain(outline, corners, params["Domain"], params["ElemSize"], **options)
+
+# Mesh the default 2D wizard domain at the given element sizes.
+def Benchmark(elemSizes=(0.16, 0.08, 0.04)):
+    import AirfoilStages
+    for elemSize in elemSizes:
+        params = dict(AirfoilStages.DEFAULTS)
+        params["Naca"] = "2412"
+        params["Angle"] = 5.0
+        params["ElemSize"] = elemSize
+        start = default_timer()
+        (nodes, triangles, faces) = MeshAirfoil(params)
+        elapsed = default_timer() - start
+        print("elemSize %.3f: %d cells, %d nodes, %d airfoil faces in %.2f s, %.0f cells/s, "
+              "min angle %.1f deg" % (elemSize, len(triangles), len(nodes), len(faces["airfoil"]),
+                                      elapsed, len(triangles)/elapsed, MinimumAngle(nodes, triangles)))
+
+if __name__ == "__main__":
+    Benchmark(*[[float(a) for a in sys.argv[1:]]] if sys.argv[1:] else [])
@@ -0,0 +1,158 @@
+# Multi-section wings for 3D mode.
+#
+# A wing is given by spanwise stations, each with its own profile (a NACA code
+# or a .dat file, as ProfileSources names them), chord, twist and sweep, and is
+# lofted through them. Sections is a text input of the Extra Definitions step
+# with one station per ";"-separated entry:
+#
+#     span profile chord twist sweep
+#     0 2412 1 0 0; 0.5 23012 0.8 -1 0.05; 1 0009 0.5 -3 0.15
+#
+# span is the spanwise position as a fraction of WingSpan, from 0 (root) to 1
+# (tip), chord a factor of Chord, twist in degrees, added to the angle of
+# attack about the quarter chord of the station, and sweep the offset of the
+# station along x, in meters. An empty Sections pulls the Geometry step profile
+# straight to WingSpan, as before.
+#
+# The profiles of all stations are evaluated together on the chordwise grid of
+# the Geometry step (with numpy when it is there) and posed in place, so the
+# CAD only builds the section curves and one loft. Plain Python, so it runs in
+# the wizard.
+
+import sys
+from timeit import default_timer
+
+from NacaProfile import Naca4Digits
+from ChordSpacing import ChordwiseGrid
+from AirfoilPose import PoseMatrix, PosePoints
+from ProfileSources import ProfileKind, Naca4Problems, Naca5Problems, ProfileSurfaces, ProfileOrdinates
+
+# Check if the wing of the inputs is lofted through sections.
+def Lofted(params):
+    return params["Mode"] != "2D" and bool(params.get("Sections", "").strip())
+
+# Stations of a Sections text, as (span, naca, chord, twist, sweep) tuples
+# from root to tip. Profile files are only looked up when they are used.
+def ParseSections(text):
+    stations = []
+    for entry in text.split(";"):
+        fields = entry.split()
+        if not fields:
+            continue
+        if len(fields) != 5:
+            raise ValueError("Section '%s' should be: span profile chord twist sweep" % entry.strip())
+        (span, naca, chord, twist, sweep) = fields
+        kind = ProfileKind(naca)
+        if (kind == "naca4" and Naca4Problems(naca)) or (kind == "naca5" and Naca5Problems(naca)):
+            raise ValueError("Invalid Naca code %s in section '%s'" % (naca, entry.strip()))
+        try:
+            station = (float(span), naca, float(chord), float(twist), float(sweep))
+        except ValueError:
+            raise ValueError("Invalid number in section '%s'" % entry.strip())
+        if station[2] <= 0.0:
+            raise ValueError("Chord should be positive in section '%s'" % entry.strip())
+        stations.append(station)
+    if len(stations) < 2:
+        raise ValueError("A wing needs at least two sections")
+    spans = [station[0] for station in stations]
+    if spans[0] != 0.0 or spans[-1] != 1.0 or any(b <= a for (a, b) in zip(spans, spans[1:])):
+        raise ValueError("Section spans should increase from 0 (root) to 1 (tip)")
+    return stations
+
+# Profiles of all codes on the chordwise grid x, in the layout of Naca4Scalar,
+# or of Naca4Truncated when cut at chord station xCut. Profile files come
+# from the library, as ProfileSources finds them.
+def SectionProfiles(codes, x, xCut=None, library=""):
+    if xCut is not None:
+        x = [xi for xi in x if xi < xCut - 1e-12] + [xCut]
+    (upper, lower, closed) = ProfileOrdinates(codes, x, library)
+    profiles = []
+    for (yUpper, yLower, isClosed) in zip(upper, lower, closed):
+        y = yUpper[::-1] + yLower
+        if xCut is None and isClosed:
+            y[0] = 0.0
+            y[-1] = 0.0
+        profiles.append((list(x[::-1]) + list(x), y))
+    return profiles
+
+# Profile x,y of unit chord scaled to chord, rotated by the angle of attack
+# about its quarter chord and moved by offset along x, as (x, y) points.
+def PoseProfile(x, y, chord, angle, offset=0.0):
+    return list(zip(*PosePoints(x, y, PoseMatrix(chord, angle, (offset, 0.0)))))
+
+# Chordwise grid of the sections, the one of the Geometry step profile, and
+# the chord station of the trailing edge cut, None without a cut.
+def SectionGrid(params):
+    surfaces = ProfileSurfaces(params["Naca"], params.get("Profiles", ""))[0]
+    x = ChordwiseGrid(params["Spacing"], params["Points"], surfaces, params["Tolerance"])
+    xCut = None
+    if params["CutTE"] == "Yes":
+        xCut = 1.0 - params["CutValue"]/100.0
+    return (x, xCut)
+
+# Posed sections of the wing of the inputs, root first, as lists of (x, y, z)
+# points. The trailing edge is cut analytically, at the same chord fraction
+# for every station.
+def SectionOutlines(params):
+    stations = ParseSections(params["Sections"])
+    (x, xCut) = SectionGrid(params)
+    profiles = SectionProfiles([station[1] for station in stations], x, xCut, params.get("Profiles", ""))
+    sections = []
+    for ((span, naca, chord, twist, sweep), (px, py)) in zip(stations, profiles):
+        z = span*params["WingSpan"]
+        posed = PoseProfile(px, py, chord*params["Chord"], params["Angle"] + twist, sweep)
+        sections.append([(sx, sy, z) for (sx, sy) in posed])
+    return sections
+
+# xmin, xmax, ymin, ymax of the sections.
+def SectionBounds(sections):
+    xs = [point[0] for section in sections for point in section]
+    ys = [point[1] for section in sections for point in section]
+    return (min(xs), max(xs), min(ys), max(ys))
+
+# Sections text of a tapered, twisted and swept wing with the given number of
+# stations, the thickness going from the root code to the tip code.
+def TaperedSections(stations, root="2412", tip="2408", taper=0.5, twist=-3.0, sweep=0.2):
+    (m, p, t0) = Naca4Digits(root)
+    t1 = Naca4Digits(tip)[2]
+    entries = []
+    for k in range(stations):
+        f = k/float(stations - 1)
+        naca = root[:2] + "%02d" % int(round(100.0*(t0 + f*(t1 - t0))))
+        entries.append("%g %s %g %g %g" % (f, naca, 1.0 + f*(taper - 1.0), f*twist, f*sweep))
+    return "; ".join(entries)
+
+# Build lofted wings in their enclosure on MemoryBackend from 2 to 200
+# stations, timing the batched profile pass against evaluating every station
+# on its own, and the CAD stages.
+def Benchmark(counts=(2, 5, 20, 50, 200)):
+    import AirfoilStages
+    from NacaProfile import Naca4Truncated
+    from MemoryBackend import MemoryBackend
+    SectionProfiles(["0012"], [0.0, 1.0])
+    for count in counts:
+        params = dict(AirfoilStages.DEFAULTS)
+        params["Mode"] = "3D"
+        params["Sections"] = TaperedSections(count)
+        stations = ParseSections(params["Sections"])
+        x = ChordwiseGrid(params["Spacing"], params["Points"], None, params["Tolerance"])
+        start = default_timer()
+        for station in stations:
+            (m, p, t) = Naca4Digits(station[1])
+            Naca4Truncated(m, p, t, x, 0.99)
+        single = default_timer() - start
+        start = default_timer()
+        SectionProfiles([station[1] for station in stations], x, 0.99)
+        batched = default_timer() - start
+        cad = MemoryBackend()
+        start = default_timer()
+        AirfoilStages.BuildAirfoil(cad, params)
+        AirfoilStages.BuildScaleRotatePull(cad, params)
+        AirfoilStages.BuildDomainOrEnclosure(cad, params)
+        build = default_timer() - start
+        print("%3d stations: profiles %.4f s batched, %.4f s one by one; wing and enclosure %.4f s, "
+              "fluid volume %.4f, CAD calls %s" % (count, batched, single, build, cad.Body().Volume(),
+                                             sorted(cad.calls.items())))
+
+if __name__ == "__main__":
+    Benchmark(*[[int(a) for a in sys.argv[1:]]] if sys.argv[1:] else [])
@@ -0,0 +1,15 @@
+import numpy as np
+
+from AirfoilEngine import Naca4Batch, Naca4Parameters
+from NacaProfile import CreateAirfoil, Naca4Scalar
+
+CODES = ["0012", "2412", "4415", "6409", "9912", "0006"]
+
+def test_batch_matches_create_airfoil():
+    x = [0.5 - 0.5*np.cos(np.pi*i/100) for i in range(101)]
+    (xs, ys) = Naca4Batch(CODES, x)
+    for (row, (m, p, t)) in zip(ys, Naca4Parameters(CODES)):
+        (wizardX, wizardY) = CreateAirfoil(m, p, t, x)
+        assert np.allclose(xs, wizardX, rtol=0.0, atol=1e-15)
+        assert np.allclose(row, wizardY, rtol=0.0, atol=1e-15)
+        assert Naca4Scalar(m, p, t, x) == (wizardX, wizardY)
@@ -0,0 +1,18 @@
+import math
+from AirfoilPose import PoseMatrix, PosePoints, ComposePoses, Identity
+
+def test_positive_angle_is_nose_up_about_quarter_chord():
+    (xs, ys) = PosePoints([0.0, 0.25, 1.0], [0.0, 0.0, 0.0], PoseMatrix(1.0, 10.0))
+    assert ys[0] > 0.0 and ys[2] < 0.0
+    assert abs(xs[1] - 0.25) < 1e-15 and abs(ys[1]) < 1e-15
+    assert abs(ys[2] + 0.75*math.sin(math.radians(10.0))) < 1e-15
+
+def test_chord_and_offset_keep_quarter_chord_pivot():
+    (xs, ys) = PosePoints([0.0, 0.25, 1.0], [0.0, 0.0, 0.0], PoseMatrix(2.0, 90.0, (1.0, 0.5)))
+    assert abs(xs[1] - 1.5) < 1e-12 and abs(ys[1] - 0.5) < 1e-12
+    assert abs(xs[2] - 1.5) < 1e-12 and abs(ys[2] + 1.0) < 1e-12
+
+def test_compose_and_identity():
+    assert Identity(PoseMatrix())
+    assert Identity(ComposePoses(PoseMatrix(1.0, 5.0), PoseMatrix(1.0, -5.0)))
+    assert not Identity(PoseMatrix(1.0, 1e-3))
@@ -0,0 +1,34 @@
+import os
+from AirfoilStore import StoreWriter, StoreReader, Table
+
+def Arrays(k):
+    return {"x": Table("d", [k, 1.0, 2.0]), "cells": Table("i", [[k, 2, 3]])}
+
+def WriteSweep(path, records, flushEvery):
+    with StoreWriter(path) as store:
+        for k in range(records):
+            store.Add("case%d" % k, {"Case": k}, Arrays(k))
+            if (k + 1) % flushEvery == 0:
+                store.Flush()
+    return os.path.getsize(path)
+
+def test_repeated_flushes_do_not_grow_the_file(tmp_path):
+    once = WriteSweep(str(tmp_path / "once.afs"), 2000, 2000)
+    often = WriteSweep(str(tmp_path / "often.afs"), 2000, 50)
+    assert often < 2*once
+    with StoreReader(str(tmp_path / "often.afs")) as store:
+        assert len(store.Names()) == 2000
+        assert [store.Array("case%d" % k, "x")[0] for k in (0, 999, 1999)] == [0, 999, 1999]
+
+def test_exporting_a_record_again_does_not_grow_the_file(tmp_path):
+    path = str(tmp_path / "Airfoil.afs")
+    size = WriteSweep(path, 200, 200)
+    for k in range(100):
+        with StoreWriter(path) as store:
+            store.Add("case7", {"Export": k}, {"x": Table("d", [k]*50)})
+    assert os.path.getsize(path) < 2*size
+    with StoreReader(path) as store:
+        assert list(store.Array("case7", "x"))[:2] == [99, 99]
+        assert list(store.Array("case7", "cells").ravel()) == [7, 2, 3]
+        assert store.Inputs("case7") == {"Case": 7, "Export": 99}
+        assert store.Array("case8", "x")[0] == 8
@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+
+import pytest
+
+import AirfoilStages
+from ArtifactCache import ArtifactCache, ArtifactKey, CacheLock, CacheTimeout
+from SweepRunner import RunCase
+from MemoryBackend import MemoryBackend
+
+DAT = "Test profile\n1.0 0.001\n0.5 0.06\n0.0 0.0\n0.5 -0.04\n1.0 -0.001\n"
+
+# Write text to path, dated age seconds ago.
+def WriteFile(path, text, age=0.0):
+    with open(path, "w") as stream:
+        stream.write(text)
+    then = time.time() - age
+    os.utime(path, (then, then))
+
+def test_key_follows_a_dat_file_named_directly(tmp_path):
+    path = str(tmp_path/"test.dat")
+    WriteFile(path, DAT)
+    params = dict(AirfoilStages.DEFAULTS, Naca=path)
+    before = ArtifactKey(params, "mesh")
+    WriteFile(path, DAT.replace("0.06", "0.07"))
+    assert ArtifactKey(params, "mesh") != before
+
+def test_key_follows_a_file_of_a_directory_library(tmp_path):
+    library = tmp_path/"profiles"
+    library.mkdir()
+    path = str(library/"test.dat")
+    WriteFile(path, DAT)
+    params = dict(AirfoilStages.DEFAULTS, Naca="test", Profiles=str(library))
+    before = ArtifactKey(params, "mesh")
+    directoryTime = os.path.getmtime(str(library))
+    WriteFile(path, DAT.replace("0.06", "0.07"))
+    os.utime(str(library), (directoryTime, directoryTime))
+    assert ArtifactKey(params, "mesh") != before
+
+def test_stale_lock_broken_once(tmp_path):
+    path = str(tmp_path/"lock")
+    WriteFile(path, "dead", age=10.0)
+    holders = []
+    most = []
+    def Take():
+        with CacheLock(path, timeout=5.0, stale=1.0):
+            holders.append(1)
+            most.append(len(holders))
+            time.sleep(0.05)
+            holders.pop()
+    threads = [threading.Thread(target=Take) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert most == [1, 1, 1, 1]
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".break")
+
+def test_fresh_lock_not_broken(tmp_path):
+    path = str(tmp_path/"lock")
+    WriteFile(path, "live")
+    with pytest.raises(CacheTimeout):
+        with CacheLock(path, timeout=0.05, stale=60.0):
+            pass
+    assert os.path.exists(path)
+
+def test_failing_cache_does_not_fail_the_case(tmp_path):
+    cache = ArtifactCache(str(tmp_path/"cache"))
+    def Fail(key, write):
+        raise CacheTimeout("held")
+    cache.Put = Fail
+    result = RunCase(dict(AirfoilStages.DEFAULTS, CutValue=0.9), MemoryBackend(), False, cache)
+    assert result["status"] == "ok"
+    assert "CacheTimeout" in result["cache_error"]
+
+def test_cached_case_served_again(tmp_path):
+    cache = ArtifactCache(str(tmp_path/"cache"))
+    case = dict(AirfoilStages.DEFAULTS, CutValue=0.9)
+    first = RunCase(case, MemoryBackend(), False, cache)
+    second = RunCase(case, MemoryBackend(), False, cache)
+    assert "cached" not in first
+    assert second["cached"]
+    assert second["domain"] == first["domain"]
@@ -0,0 +1,29 @@
+from ChordSpacing import ChordwiseGrid, UniformGrid, MaxDeviation, UniformPointsFor
+from ProfileSources import ProfileSurfaces
+
+# Smallest uniform point count whose whole grid is within deviation.
+def SearchUniformPoints(surfaces, deviation):
+    (low, high) = (1, 2)
+    while MaxDeviation(surfaces, UniformGrid(high), deviation) > deviation:
+        (low, high) = (high, 2*high)
+    while high - low > 1:
+        middle = (low + high)//2
+        if MaxDeviation(surfaces, UniformGrid(middle), deviation) > deviation:
+            low = middle
+        else:
+            high = middle
+    return high
+
+def test_uniform_points_close_to_search():
+    for naca in ("0012", "2412", "6409"):
+        surfaces = ProfileSurfaces(naca)[0]
+        for mode in ("Cosine", "Half-Cosine", "Adaptive"):
+            deviation = MaxDeviation(surfaces, ChordwiseGrid(mode, 101, surfaces, 1e-4))
+            searched = SearchUniformPoints(surfaces, deviation)
+            estimated = UniformPointsFor(surfaces, deviation)
+            assert abs(estimated/float(searched) - 1.0) < 0.06
+
+def test_uniform_points_capped():
+    surfaces = ProfileSurfaces("0012")[0]
+    assert UniformPointsFor(surfaces, 0.0) == 1000000
+    assert UniformPointsFor(surfaces, 1e-12) == 1000000
@@ -0,0 +1,25 @@
+import pytest
+
+import AirfoilStages
+from DesignPoints import DesignPointProject, FakeProject, RegisterCases
+from SweepRunner import SweepCases
+
+def test_constant_inputs_pushed_when_they_differ_from_the_system():
+    project = FakeProject()
+    system = project.CreateSystem("FFF", {})
+    cases = SweepCases({"Chord": [2.0], "Angle": [0, 4]})
+    RegisterCases(project, cases, system=system, current=AirfoilStages.DEFAULTS)
+    assert [point["values"] for point in system["points"]] == [{"Angle": 0.0, "Chord": 2.0},
+                                                              {"Angle": 4.0, "Chord": 2.0}]
+
+def test_new_system_gets_all_numeric_inputs():
+    project = FakeProject()
+    RegisterCases(project, SweepCases({"Chord": 2.0}))
+    values = project.systems[0]["points"][0]["values"]
+    assert values["Chord"] == 2.0
+    assert values["Angle"] == AirfoilStages.DEFAULTS["Angle"]
+    assert len(values) == 18
+
+def test_project_without_system_settings_takes_one_group():
+    with pytest.raises(ValueError):
+        RegisterCases(DesignPointProject(), SweepCases({"Naca": ["0012", "2412"]}))
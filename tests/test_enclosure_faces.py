@@ -0,0 +1,27 @@
+import pytest
+from AirfoilStages import ClassifyEnclosureFaces
+
+# Box from x -5..10, y -5..5, z 0..3 around a wing ending at z = 2, with a
+# truncated trailing edge facing +X and the tip facing +Z inside the box.
+BOX = [((-5.0, 0.0, 1.5), (-1.0, 0.0, 0.0)), ((10.0, 0.0, 1.5), (1.0, 0.0, 0.0)),
+       ((2.5, 5.0, 1.5), (0.0, 1.0, 0.0)), ((2.5, -5.0, 1.5), (0.0, -1.0, 0.0)),
+       ((2.5, 0.0, 0.0), (0.0, 0.0, -1.0)), ((2.5, 0.0, 3.0), (0.0, 0.0, 1.0))]
+WING = [((0.5, 0.05, 1.0), (0.1, 0.995, 0.0)), ((0.5, -0.05, 1.0), (0.1, -0.995, 0.0)),
+        ((0.95, 0.0, 1.0), (1.0, 0.0, 0.0)), ((0.5, 0.0, 2.0), (0.0, 0.0, 1.0))]
+
+def test_sides_by_position_and_wing_faces_by_exclusion():
+    groups = ClassifyEnclosureFaces(BOX + WING)
+    assert groups["Inlet"] == [0] and groups["Outlet"] == [1]
+    assert groups["Symmetry1"] == [2] and groups["Symmetry2"] == [3]
+    assert groups["Symmetry3"] == [4] and groups["Symmetry4"] == [5]
+    assert groups["Airfoil"] == [6, 7, 8, 9]
+
+def test_order_of_faces_does_not_matter():
+    frames = list(reversed(BOX + WING))
+    groups = ClassifyEnclosureFaces(frames)
+    assert [frames[k] for k in groups["Inlet"]] == [BOX[0]]
+    assert sorted(frames[k] for k in groups["Airfoil"]) == sorted(WING)
+
+def test_missing_side_raises():
+    with pytest.raises(ValueError):
+        ClassifyEnclosureFaces(BOX[1:] + WING)
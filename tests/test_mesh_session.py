@@ -0,0 +1,118 @@
+import time
+import threading
+
+import pytest
+
+from MeshSession import SessionPool, FakeMechanicalSession, MeshSession, MeshTimeout
+
+COMMANDS = "ExtAPI.DataModel.Project.Model.Mesh.Update()\n"
+
+# Wait until condition() holds. False if it does not within timeout seconds.
+def WaitFor(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_idle_session_closed_without_another_job():
+    pool = SessionPool(lambda key: FakeMechanicalSession(), idleTimeout=0.1)
+    try:
+        pool.Run(COMMANDS, "FFF")
+        assert pool.stats["opened"] == 1
+        assert len(pool.idle) == 1
+        assert WaitFor(lambda: pool.stats["closed"] == 1)
+        assert pool.idle == []
+        assert pool.count == 0
+    finally:
+        pool.Close()
+
+def test_reused_session_not_evicted_early():
+    pool = SessionPool(lambda key: FakeMechanicalSession(), idleTimeout=0.3)
+    try:
+        for k in range(3):
+            pool.Run(COMMANDS, "FFF")
+            time.sleep(0.1)
+        assert pool.stats == dict(pool.stats, opened=1, closed=0, jobs=3)
+        assert WaitFor(lambda: pool.stats["closed"] == 1)
+    finally:
+        pool.Close()
+
+def test_eviction_dispatched():
+    calls = []
+    def Dispatch(function):
+        calls.append(threading.current_thread())
+        function()
+    pool = SessionPool(lambda key: FakeMechanicalSession(), idleTimeout=0.05, dispatch=Dispatch)
+    try:
+        pool.Run(COMMANDS, "FFF")
+        assert WaitFor(lambda: pool.stats["closed"] == 1)
+        assert calls
+    finally:
+        pool.Close()
+
+# Session whose Send hangs until release is set, or until it is closed, as
+# Mechanical ends a SendCommand when it exits.
+class HungSession(MeshSession):
+    def __init__(self):
+        self.release = threading.Event()
+        self.closed = False
+        self.threads = []
+
+    def Open(self):
+        pass
+
+    def Send(self, commands):
+        self.threads.append(threading.current_thread())
+        self.release.wait()
+        if self.closed:
+            raise RuntimeError("session closed")
+        return "late"
+
+    def Close(self):
+        self.threads.append(threading.current_thread())
+        self.closed = True
+        self.release.set()
+
+def test_hung_job_closed_through_dispatch():
+    dispatched = []
+    def Dispatch(function):
+        dispatched.append(function)
+        function()
+    sessions = []
+    def Factory(key):
+        sessions.append(HungSession())
+        return sessions[-1]
+    pool = SessionPool(Factory, size=1, runTimeout=0.1, dispatch=Dispatch)
+    try:
+        with pytest.raises(MeshTimeout):
+            pool.Run(COMMANDS, "FFF")
+        assert sessions[0].closed
+        assert sessions[0].threads[0] is threading.current_thread()
+        assert len(dispatched) == 1
+        assert pool.stats == dict(pool.stats, timeouts=1, failed=1, closed=1)
+        assert pool.count == 0
+    finally:
+        pool.Close()
+
+def test_hung_job_frees_the_pool_and_closes_when_it_returns():
+    session = HungSession()
+    pool = SessionPool(lambda key: session, size=1, runTimeout=0.1)
+    counts = []
+    def Release():
+        WaitFor(lambda: pool.stats["timeouts"] == 1)
+        counts.append(pool.count)
+        session.release.set()
+    releaser = threading.Thread(target=Release)
+    releaser.start()
+    try:
+        with pytest.raises(MeshTimeout):
+            pool.Run(COMMANDS, "FFF")
+        releaser.join()
+        assert counts == [0]
+        assert session.closed
+        assert session.threads == [threading.current_thread()]*2
+        assert pool.stats["closed"] == 1
+    finally:
+        pool.Close()
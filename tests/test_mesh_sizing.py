@@ -0,0 +1,17 @@
+import AirfoilStages
+from MeshSizing import AirfoilSizing, PredictCells
+from TriMesh import AirfoilOutline, MeshDomain
+
+def test_prediction_within_ten_percent_of_trimesh():
+    params = dict(AirfoilStages.DEFAULTS, Naca="2412", Angle=4.0, CutValue=0.95, ElemSize=0.16)
+    (controls, cells) = AirfoilSizing(params)
+    plain = dict(controls, spheres=[])
+    corners = AirfoilOutline(params)[1]
+    (nodes, triangles, faces) = MeshDomain(controls["outline"], corners, controls["box"], controls["far"],
+                                           controls["growth"], wallSize=controls["wall"])
+    assert abs(PredictCells(plain)/len(triangles) - 1.0) < 0.1
+
+def test_budget_met():
+    params = dict(AirfoilStages.DEFAULTS, Naca="0012")
+    (controls, cells) = AirfoilSizing(params, budget=20000)
+    assert abs(cells/20000.0 - 1.0) < 0.05
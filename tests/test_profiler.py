@@ -0,0 +1,30 @@
+import pytest
+
+import Profiler
+
+@pytest.mark.skipif(Profiler.MemoryUsage is Profiler._NoMemory, reason="no memory use on this platform")
+def test_memory_change_follows_frees():
+    profiler = Profiler.Profiler()
+    with profiler.Time("alloc"):
+        values = [0.0]*5000000
+    with profiler.Time("free"):
+        del values
+    assert profiler.spans[("alloc",)][3] > 20000000
+    assert profiler.spans[("free",)][3] < -20000000
+
+def test_files_written_only_when_saved(tmp_path):
+    profiler = Profiler.Profiler(str(tmp_path))
+    for k in range(3):
+        with profiler.Time("isvisible"):
+            pass
+    assert not (tmp_path / Profiler.TRACE_FILE).exists()
+    with profiler.Time("build"):
+        with profiler.Time("stage"):
+            profiler.Save()
+        assert not (tmp_path / Profiler.TRACE_FILE).exists()
+    folded = (tmp_path / Profiler.FOLDED_FILE).read_text().splitlines()
+    assert [line.split(" ")[0] for line in folded] == ["build", "build;stage", "isvisible"]
+    (tmp_path / Profiler.TRACE_FILE).unlink()
+    with profiler.Time("isvisible"):
+        pass
+    assert not (tmp_path / Profiler.TRACE_FILE).exists()
@@ -0,0 +1,53 @@
+from StagePipeline import StagePipeline
+
+# Document recording the stages run on it, with snapshots by stage key.
+class Document(object):
+    def __init__(self):
+        self.stages = []
+        self.snapshots = {}
+
+    def Store(self, key):
+        self.snapshots[key] = list(self.stages)
+
+    def Restore(self, key):
+        if key not in self.snapshots:
+            return False
+        self.stages = list(self.snapshots[key])
+        return True
+
+def MakePipeline(document):
+    pipeline = StagePipeline(document.Store, document.Restore)
+    for (name, after) in (("Profile", None), ("Extrude", "Profile"), ("Mesh", "Extrude")):
+        pipeline.Add(name, lambda context, name=name: [context[name]],
+                     lambda context, name=name: document.stages.append((name, context[name])), after)
+    return pipeline
+
+def test_changed_input_reruns_its_stage_and_downstream():
+    document = Document()
+    pipeline = MakePipeline(document)
+    context = {"Profile": "0012", "Extrude": 1.0, "Mesh": 0.1}
+    assert pipeline.Run("Mesh", context) == ["Profile", "Extrude", "Mesh"]
+    assert pipeline.Run("Mesh", context) == []
+    context["Extrude"] = 2.0
+    assert pipeline.Dirty("Extrude", context) and not pipeline.Dirty("Profile", context)
+    assert pipeline.Run("Mesh", context) == ["Extrude", "Mesh"]
+    assert document.stages[-2:] == [("Extrude", 2.0), ("Mesh", 0.1)]
+
+def test_snapshot_restored_instead_of_rerun():
+    document = Document()
+    pipeline = MakePipeline(document)
+    context = {"Profile": "0012", "Extrude": 1.0, "Mesh": 0.1}
+    pipeline.Run("Mesh", context)
+    document.stages = ["edited"]
+    pipeline.Invalidate("Extrude")
+    assert pipeline.Run("Mesh", dict(context, Mesh=0.2)) == ["Mesh"]
+    assert document.stages == [("Profile", "0012"), ("Extrude", 1.0), ("Mesh", 0.2)]
+
+def test_invalidate_without_snapshots_reruns_downstream():
+    pipeline = MakePipeline(Document())
+    pipeline.restore = None
+    context = {"Profile": "0012", "Extrude": 1.0, "Mesh": 0.1}
+    pipeline.Run("Mesh", context)
+    pipeline.Invalidate("Extrude")
+    assert sorted(pipeline.built) == ["Profile"]
+    assert pipeline.Run("Mesh", context) == ["Profile", "Extrude", "Mesh"]